@@ -1,23 +1,40 @@
 # auto_monitor.py
 import ctypes
+import subprocess
+import threading
 from ctypes import wintypes
 
-import win32gui
-from pynput import mouse, keyboard
-from PySide6.QtCore import QObject, QThread, Signal, QTimer
+from PySide6.QtCore import QObject, QThread, Signal
 import win_api
+import win_backend
+import event_ring
+import echo_guard
+import tracing
 from logger import logger
 
+# pynput 在没有桌面环境时无法导入，延迟到监听线程真正启动时再导入
+mouse = None
+keyboard = None
+
 
 # === 键盘监控 === #
 class _KeyboardWatcher(QObject):
     """
     内部类：负责监听键盘事件 (用于捕获输入法上屏操作)
     """
-    # 发送请求重排信号
-    input_committed = Signal()
+    # 发送请求重排信号（附带追踪记录，未启用追踪时为 None）
+    input_committed = Signal(object)
+
+    def __init__(self, echo):
+        super().__init__()
+        # 由主线程根据前台窗口维护：只有前台是 rank > 1 的受管窗口时才需要处理按键
+        self.armed = True
+        self.echo = echo
 
     def start_monitoring(self):
+        global keyboard
+        from pynput import keyboard
+
         # 监听释放事件即可
         self.listener = keyboard.Listener(on_release=self.on_release)
         self.listener.start()
@@ -31,6 +48,13 @@ class _KeyboardWatcher(QObject):
         核心逻辑：过滤按键。
         只有按下“确认类”按键（空格、回车、数字键）时，才触发检查。
         """
+        # 任何按键都是真实输入：之后的前台变化不再当作重排的回声
+        self.echo.note_input()
+
+        # 前台不是需要重排的受管窗口：在钩子线程直接返回，在其他程序里打字没有额外开销
+        if not self.armed:
+            return
+
         try:
             should_trigger = False
 
@@ -44,30 +68,177 @@ class _KeyboardWatcher(QObject):
                     should_trigger = True
 
             if should_trigger:
-                self.input_committed.emit()
+                trace = tracing.get_tracer().start()
+                if trace:
+                    trace.stamp('hook')
+                self.input_committed.emit(trace)
 
         except Exception:
             pass
 
 
+# === 点击预过滤 === #
+# 受管窗口位置 / 状态变化的事件：移动与缩放、最小化与还原、显示与隐藏。
+# LOCATIONCHANGE 在全系统范围内非常频繁（任何窗口移动、光标和插入符移动），
+# 所以这些钩子按受管窗口所属的进程分别安装，由系统过滤掉其他进程的事件
+_FILTER_HOOK_RANGES = (
+    (win_backend.EVENT_OBJECT_LOCATIONCHANGE, win_backend.EVENT_OBJECT_LOCATIONCHANGE),
+    (win_backend.EVENT_SYSTEM_MINIMIZESTART, win_backend.EVENT_SYSTEM_MINIMIZEEND),
+    (win_backend.EVENT_OBJECT_SHOW, win_backend.EVENT_OBJECT_HIDE),
+)
+
+
+class ClickFilter:
+    """
+    钩子线程一侧的点击预过滤：只有可能落在受管窗口上的点击才跨线程发给主线程。
+
+    - 主线程维护受管窗口的矩形（移动 / 缩放 / 最小化事件时更新），
+      每次更新都整体替换成新的元组，钩子线程只读取引用，不需要加锁
+    - 落在受管窗口矩形内、且不在它右上角关闭按钮区域 (is_click_on_close_button) 的点击才转发
+    - 矩形只是必要条件（受管窗口可能被其他窗口挡住），主线程仍会做精确判断
+    - enabled=False 时全部转发（事件钩子不可用、矩形无法及时更新时）
+    - 钩子进程模式下矩形同时发布到事件环 (attach_ring)，由钩子进程按同样的规则过滤
+    """
+
+    CLOSE_ZONE_WIDTH = event_ring.CLOSE_ZONE_WIDTH
+    CLOSE_ZONE_HEIGHT = event_ring.CLOSE_ZONE_HEIGHT
+
+    def __init__(self):
+        self._enabled = True
+        self._rects = {}   # hwnd -> (left, top, right, bottom)，仅主线程访问
+        self._zones = ()   # 钩子线程读取的不可变快照
+        self._ring = None
+
+        # 计数器（只由钩子线程写）
+        self.seen = 0
+        self.forwarded = 0
+        self.dropped_outside = 0
+        self.dropped_close = 0
+
+    # === 钩子线程 === #
+    def accept(self, x, y):
+        """这次点击是否需要转发给主线程"""
+        self.seen += 1
+        if not self._enabled:
+            self.forwarded += 1
+            return True
+
+        result = event_ring.classify_click(self._zones, x, y)
+        if result == event_ring.CLICK_HIT:
+            self.forwarded += 1
+            return True
+        if result == event_ring.CLICK_CLOSE:
+            self.dropped_close += 1
+        else:
+            self.dropped_outside += 1
+        return False
+
+    # === 主线程 === #
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+        self._publish_ring()
+
+    def attach_ring(self, ring):
+        """钩子进程模式：把矩形发布到事件环（None 时停止发布，钩子进程丢弃的点击并入本地计数）"""
+        if self._ring is not None:
+            outside, close = self._ring.dropped_clicks
+            self.seen += outside + close
+            self.dropped_outside += outside
+            self.dropped_close += close
+        self._ring = ring
+        self._publish_ring()
+
+    def forwarded_from_ring(self):
+        """钩子进程模式：钩子进程已经过滤过的一次点击"""
+        self.seen += 1
+        self.forwarded += 1
+
+    def set_targets(self, hwnds):
+        """受管窗口集合变化：只查询新加入的窗口"""
+        hwnds = set(hwnds)
+        if hwnds == self._rects.keys():
+            return
+        rects = {hwnd: rect for hwnd, rect in self._rects.items() if hwnd in hwnds}
+        for hwnd in hwnds - rects.keys():
+            rects[hwnd] = self._probe(hwnd)
+        self._publish(rects)
+
+    def update_window(self, hwnd):
+        """受管窗口移动 / 缩放 / 最小化 / 显示隐藏后重新读取它的矩形"""
+        if hwnd in self._rects:
+            rects = dict(self._rects)
+            rects[hwnd] = self._probe(hwnd)
+            self._publish(rects)
+
+    def stats(self):
+        outside, close = self._ring.dropped_clicks if self._ring is not None else (0, 0)
+        return {
+            "seen": self.seen + outside + close,
+            "forwarded": self.forwarded,
+            "dropped_outside": self.dropped_outside + outside,
+            "dropped_close": self.dropped_close + close,
+        }
+
+    def _probe(self, hwnd):
+        """可点击窗口的矩形；隐藏、最小化或已关闭时为 None"""
+        try:
+            if not win_api.is_window_visible(hwnd) or win_api.is_minimized(hwnd):
+                return None
+        except Exception:
+            return None
+        return win_api.get_window_rect(hwnd)
+
+    def _publish(self, rects):
+        self._rects = rects
+        self._zones = tuple(rect for rect in rects.values() if rect is not None)
+        self._publish_ring()
+
+    def _publish_ring(self):
+        if self._ring is not None:
+            self._ring.set_zones(self._zones if self._enabled else None)
+
+
 # === 鼠标监控 === #
 class _MouseWatcher(QObject):
     """
     内部类：负责运行 pynput 监听器。
     """
-    # 发送鼠标释放时的坐标
-    left_released = Signal(int, int)
-    right_released = Signal(int, int)
+    # 发送鼠标释放时的坐标（附带追踪记录，未启用追踪时为 None）
+    left_released = Signal(int, int, object)
+    right_released = Signal(int, int, object)
     any_clicked = Signal()
+
+    def __init__(self, click_filter, echo):
+        super().__init__()
+        self.click_filter = click_filter
+        self.echo = echo
+
     def start_monitoring(self):
+        global mouse
+        from pynput import mouse
+
         self.listener = mouse.Listener(on_click=self.on_click)
         self.listener.start()
 
     def on_click(self, x, y, button, pressed):
-        if button == mouse.Button.left and not pressed:
-            self.left_released.emit(x, y)
-        if button == mouse.Button.right and not pressed:
-            self.left_released.emit(x, y)
+        if pressed:
+            return
+        self.echo.note_input()
+        trace = tracing.get_tracer().start()
+        # 不可能点中受管窗口的点击在钩子线程就丢掉，不再跨线程
+        if button == mouse.Button.left and self.click_filter.accept(x, y):
+            if trace:
+                trace.stamp('hook')
+            self.left_released.emit(x, y, trace)
+        if button == mouse.Button.right and self.click_filter.accept(x, y):
+            if trace:
+                trace.stamp('hook')
+            self.left_released.emit(x, y, trace)
 
     def stop_monitoring(self):
         if hasattr(self, 'listener'):
@@ -80,24 +251,52 @@ class WindowWatcher(QObject):
     1. 接收鼠标释放信号。
     2. 判断是否点击了“目标窗口”。
     3. 如果是，立即请求重排。
+
+    use_hook_service=True 时鼠标 / 键盘钩子运行在独立进程 (hook_service)，
+    事件经共享内存环 (event_ring) 传回；钩子进程每写入一条事件经管道发一个字节，
+    读取线程收到后通知主线程取出处理（不定时轮询）。
     """
 
-    # 核心信号：请求执行重排
-    request_rearrange = Signal()
+    # 核心信号：请求执行重排（附带触发的受管窗口，只重排它所在的栈）
+    request_rearrange = Signal(int)
     # 状态信号：(文本, 样式)
     status_changed = Signal(str, str)
+    # 钩子进程模式：读取线程 -> 主线程，事件环有新事件 / 钩子进程已退出（附带进程对象）
+    _ring_ready = Signal()
+    _service_exited = Signal(object)
 
-    def __init__(self):
+    def __init__(self, use_hook_service=False, echo=None):
+        """echo: 回声抑制器（默认全局的 echo_guard.get_guard()，与重排引擎共用）"""
         super().__init__()
-        self._targets = []
+        self.use_hook_service = use_hook_service
+        self.echo = echo or echo_guard.get_guard()
+        self._ring = None
+        self._service = None
+        self._ring_inputs = None
+        self._ring_ready.connect(self._drain_ring)
+        self._service_exited.connect(self._on_service_exited)
+
+        # 受管窗口 hwnd -> rank 的只读快照（由 WindowRankEngine.rank_snapshot 提供）
+        self._targets = {}
         self.known_hwnds = set()
+        self.click_filter = ClickFilter()
+        self._hooks = []
+        # 按进程安装的位置变化钩子：pid -> [钩子句柄]；hwnd -> pid 缓存（窗口的 pid 不会变）
+        self._hooking = False
+        self._process_hooks = {}
+        self._pids = {}
+        # 位置变化钩子收到的事件数 / 其中属于受管窗口、用来更新矩形的事件数
+        self.win_events = 0
+        self.win_events_used = 0
+        # 前台窗口由 EVENT_SYSTEM_FOREGROUND 维护；钩子不可用时为 None，每次按键再查询
+        self._foreground = None
         # 配置后台线程
         self.thread = QThread()
-        self.mouse_worker = _MouseWatcher()
+        self.mouse_worker = _MouseWatcher(self.click_filter, self.echo)
         self.mouse_worker.moveToThread(self.thread)
 
         # 2. 键盘工作者
-        self.keyboard_worker = _KeyboardWatcher()
+        self.keyboard_worker = _KeyboardWatcher(self.echo)
         self.keyboard_worker.moveToThread(self.thread)
 
         # 连接线程生命周期
@@ -115,23 +314,205 @@ class WindowWatcher(QObject):
         self.mouse_worker.any_clicked.connect(self._handle_input_action)
 
     def start(self):
+        if self.use_hook_service:
+            if self._service is None:
+                self._install_hooks()
+                self._start_hook_service()
+            return
+
         if not self.thread.isRunning():
+            self._install_hooks()
             self.thread.start()
 
     def stop(self):
         """停止监控线程"""
+        backend = win_api.get_backend()
+        for handle in self._hooks:
+            backend.remove_win_event_hook(handle)
+        self._hooks = []
+        self._hooking = False
+        self._sync_process_hooks()
+
+        if self._service is not None:
+            self._stop_hook_service()
+            return
+
         self.mouse_worker.stop_monitoring()
         self.thread.quit()
         self.thread.wait()
 
-    def update_monitored_hwnds(self, item_data_list):
-        self._targets = item_data_list
+    def update_monitored_hwnds(self, rank_snapshot):
+        self._targets = rank_snapshot
+        self.click_filter.set_targets(rank_snapshot.keys())
+        self._sync_process_hooks()
+        self._update_keyboard_armed()
+
+    def stats(self):
+        """
+        点击统计：钩子收到的点击数、转发到主线程的点击数、被预过滤丢弃的点击数，
+        位置变化钩子收到 / 用到的事件数和钩住的进程数（钩子进程模式下另有事件环丢弃数）
+        """
+        stats = self.click_filter.stats()
+        stats["win_events"] = self.win_events
+        stats["win_events_used"] = self.win_events_used
+        stats["hooked_processes"] = len(self._process_hooks)
+        if self._ring is not None:
+            stats["ring_dropped"] = self._ring.dropped
+        return stats
+
+    # === 钩子进程 === #
+    def _start_hook_service(self):
+        import hook_service
+
+        self._ring = event_ring.EventRing.create()
+        self._ring.armed = self.keyboard_worker.armed
+        self.click_filter.attach_ring(self._ring)
+        # 钩子进程看到的每次点击 / 按键（包括没有写入事件环的）都算真实输入
+        ring = self._ring
+        self._ring_inputs = lambda: ring.inputs
+        self.echo.add_input_source(self._ring_inputs)
+        # 通过精简入口启动，而不是 multiprocessing 的 spawn：spawn 会在子进程里重新导入主模块
+        # （PySide6 和全部顶层导入），并且再挂一个写同一日志文件的处理器
+        self._service = subprocess.Popen(
+            hook_service.command(self._ring.name), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0),
+        )
+        threading.Thread(target=self._wait_for_events, args=(self._service,),
+                         name="HookServiceReader", daemon=True).start()
+        logger.info("[钩子进程] 已启动 (PID: %s)", self._service.pid)
+
+    def _stop_hook_service(self):
+        service, self._service = self._service, None
+        # 关闭标准输入，钩子进程读到结尾后自行退出
+        service.stdin.close()
+        try:
+            service.wait(2)
+        except subprocess.TimeoutExpired:
+            service.kill()
+            service.wait()
+        self.echo.remove_input_source(self._ring_inputs)
+        self._ring_inputs = None
+        self.click_filter.attach_ring(None)
+        self._ring.close()
+        self._ring = None
+
+    def _wait_for_events(self, service):
+        """读取线程：钩子进程每写入一条事件发来一个字节，读到就通知主线程；读到结尾说明钩子进程已退出"""
+        stream = service.stdout
+        try:
+            while stream.read1(4096):
+                self._ring_ready.emit()
+        except (OSError, ValueError):
+            pass
+        self._service_exited.emit(service)
+
+    def _on_service_exited(self, service):
+        if service is not self._service:
+            return  # 主动停止
+        # 钩子进程意外退出：回退到进程内钩子
+        logger.error("[钩子进程] 已退出 (code: %s)，改用进程内钩子", service.poll())
+        self._stop_hook_service()
+        self.thread.start()
+
+    def _drain_ring(self):
+        """取出钩子进程写入的事件；点击已在钩子进程按同样的矩形预过滤"""
+        if self._ring is None:
+            return
+
+        tracer = tracing.get_tracer()
+        for kind, x, y, timestamp_ns in self._ring.pop_all():
+            # 钩子进程与本进程的 perf_counter_ns 是同一个时钟
+            trace = tracer.start(timestamp_ns)
+            if trace:
+                trace.stamp('ring')
+            if kind == event_ring.KEY_COMMIT:
+                self._handle_input_action(trace)
+            else:
+                # 钩子进程写入前已按发布的矩形预过滤
+                self.click_filter.forwarded_from_ring()
+                self._handle_mouse_release(x, y, trace)
+
+    # === 受管窗口位置变化 === #
+    def _install_hooks(self):
+        backend = win_api.get_backend()
+        self._hooking = True
+        self._sync_process_hooks()
+
+        handle = backend.add_win_event_hook(
+            win_backend.EVENT_SYSTEM_FOREGROUND, win_backend.EVENT_SYSTEM_FOREGROUND, self._on_foreground_changed
+        )
+        if handle is None:
+            logger.warning("[按键监控] 前台窗口事件钩子安装失败，每次按键查询前台窗口")
+        else:
+            self._hooks.append(handle)
+            self._foreground = win_api.get_foreground_window()
+            self._update_keyboard_armed()
+
+    def _sync_process_hooks(self):
+        """受管窗口所属的进程变化后，增删按进程安装的位置变化钩子"""
+        pids = set()
+        if self._hooking:
+            cached = self._pids
+            self._pids = {}
+            for hwnd in self._targets:
+                pid = cached.get(hwnd)
+                if pid is None:
+                    try:
+                        pid = win_api.get_window_pid(hwnd)
+                    except Exception:
+                        continue
+                self._pids[hwnd] = pid
+            pids = set(self._pids.values())
+
+        backend = win_api.get_backend()
+        for pid in self._process_hooks.keys() - pids:
+            for handle in self._process_hooks.pop(pid):
+                backend.remove_win_event_hook(handle)
+
+        for pid in pids - self._process_hooks.keys():
+            handles = []
+            for event_min, event_max in _FILTER_HOOK_RANGES:
+                handle = backend.add_win_event_hook(event_min, event_max, self._on_win_event, pid=pid)
+                if handle is not None:
+                    handles.append(handle)
+            self._process_hooks[pid] = handles
+
+            # 收不到移动事件时矩形会过期，宁可全部转发也不能漏掉点击
+            if len(handles) != len(_FILTER_HOOK_RANGES) and self.click_filter.enabled:
+                logger.warning("[点击过滤] 事件钩子安装失败 (PID: %s)，停用点击预过滤", pid)
+                self.click_filter.enabled = False
+
+    def _on_win_event(self, event, hwnd, id_object, id_child):
+        self.win_events += 1
+        if id_object == win_backend.OBJID_WINDOW and hwnd in self._targets:
+            self.win_events_used += 1
+            self.click_filter.update_window(hwnd)
+
+    # === 前台窗口跟踪 === #
+    def _on_foreground_changed(self, event, hwnd, id_object, id_child):
+        # 重排刚移动过的窗口自己抢到前台：不是用户切换，保持原来的前台窗口，按键不会因此再触发重排
+        if self.echo.is_echo(hwnd):
+            return
+        self._foreground = hwnd
+        self._update_keyboard_armed()
+
+    def _update_keyboard_armed(self):
+        """前台窗口或 rank 变化后，重新决定键盘钩子是否需要处理按键"""
+        if self._foreground is None:
+            armed = True
+        else:
+            armed = self._targets.get(self._foreground, 0) > 1
+        self.keyboard_worker.armed = armed
+        if self._ring is not None:
+            self._ring.armed = armed
 
     # === 处理鼠标释放/操作完成 === #
-    def _handle_mouse_release(self, x, y):
+    def _handle_mouse_release(self, x, y, trace=None):
         """
         处理鼠标释放事件（在主线程运行）
         """
+        if trace:
+            trace.stamp('signal')
         if not self._targets:
             return
 
@@ -140,14 +521,15 @@ class WindowWatcher(QObject):
             self.status_changed.emit(f"检测到右上角点击 -> 忽略重排", "color: orange;")
             return
 
-        hwnd_clicked = win_api.get_root_window_at(x, y)
-        for target in self._targets:
-            if hwnd_clicked == target.hwnd:
-                self.status_changed.emit(f"捕捉操作：{hwnd_clicked} -> 立即重排", "color: green; font-weight: bold;")
-                self.request_rearrange.emit()
+        if hwnd_clicked in self._targets:
+            self.status_changed.emit(f"捕捉操作：{hwnd_clicked} -> 立即重排", "color: green; font-weight: bold;")
+            if trace:
+                trace.stamp('handle')
+                tracing.get_tracer().queue(trace)
+            self.request_rearrange.emit(hwnd_clicked)
 
     # === 处理输入法/操作完成 === #
-    def _handle_input_action(self):
+    def _handle_input_action(self, trace=None):
         """
         当检测到 1-9, Space, Enter 或 鼠标点击 时触发。
         逻辑：
@@ -155,26 +537,26 @@ class WindowWatcher(QObject):
         2. 如果活动窗口在我们的管理列表中，且不是 Rank 1（即正在操作底层窗口）。
         3. 延迟一小会儿（等输入法窗口消失），然后执行重排。
         """
+        if trace:
+            trace.stamp('signal')
         if not self._targets:
             return
 
-        # 获取前台窗口
-        foreground_hwnd = win32gui.GetForegroundWindow()
-
-        # 检查是否是受管窗口
-        is_managed = False
-        target_rank = 0
+        # 获取前台窗口（有前台事件钩子时直接用缓存）
+        foreground_hwnd = self._foreground
+        if foreground_hwnd is None:
+            foreground_hwnd = win_api.get_foreground_window()
 
-        for target in self._targets:
-            if target.hwnd == foreground_hwnd:
-                is_managed = True
-                target_rank = target.rank
-                break
+        # 检查是否是受管窗口（非受管窗口 rank 为 0）
+        target_rank = self._targets.get(foreground_hwnd, 0)
 
         # 只有当：
         # 1. 活动窗口是我们管理的
         # 2. 活动窗口不是 Rank 1 (即我们在操作下面的窗口，导致它浮上来了)
         # 才触发重排
-        if is_managed and target_rank > 1:
+        if target_rank > 1:
             # logger.debug(f"捕捉到输入操作 (Rank {target_rank}) -> 请求重排")
-            self.request_rearrange.emit()
+            if trace:
+                trace.stamp('handle')
+                tracing.get_tracer().queue(trace)
+            self.request_rearrange.emit(foreground_hwnd)
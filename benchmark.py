@@ -0,0 +1,1229 @@
+# benchmark.py
+"""
+性能基准：在内存模拟桌面 (sim_backend) 上无界面运行，Linux 下也可以执行。
+
+    python benchmark.py            # 运行全部基准
+    python benchmark.py watcher    # 只运行名字中包含 watcher 的基准
+    python benchmark.py --latency 0.00002   # 引擎 / 全量同步基准中模拟桌面每次调用的耗时
+
+基线与回归检查（CI）：各基准用 record() 记录的指标（单次耗时、原生调用次数，越小越好）
+保存在 benchmark_baseline.json，--check 时任一指标比基线差超过阈值即以返回码 1 退出。
+
+    python benchmark.py --save-baseline     # 在 CI 机器上生成 / 更新基线
+    python benchmark.py --check --threshold 0.3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import logging
+from PySide6.QtCore import QCoreApplication
+from PySide6.QtGui import QGuiApplication
+
+import win_api
+from sim_backend import SimulatedDesktop
+
+BENCHMARKS = []
+# 本次运行记录的指标：名称 -> 数值（秒 或 .calls 结尾的调用次数）
+RESULTS = {}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# 耗时差异小于此值时不算回归（纳秒级指标的抖动）
+MIN_TIME_DELTA = 1e-6
+# 引擎 / 全量同步基准的模拟调用耗时，由 --latency 设置
+LATENCY = 0.0
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def record(name, value):
+    """记录一项指标用于基线对比，返回原值"""
+    RESULTS[name] = value
+    return value
+
+
+def measure(func, number=1000, rounds=5):
+    """多轮执行取最快的一轮，返回单次调用耗时（秒）"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def make_engine(desktop, count):
+    """在模拟桌面上创建 count 个窗口并全部加入引擎，返回 (engine, hwnds)"""
+    from rank_engine import WindowRankEngine
+    from window_records import WindowRecord
+
+    hwnds = [desktop.add_window(f"Managed {i}", rect=(0, 0, 800, 600)) for i in range(count)]
+    engine = WindowRankEngine()
+    for hwnd in hwnds:
+        engine.add_window(WindowRecord(hwnd, desktop.window(hwnd).title))
+    return engine, hwnds
+
+
+def per_call(func, args_list):
+    """对每组参数调用一次 func，返回平均单次耗时（秒）"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+# === 重排引擎 === #
+@benchmark
+def bench_rank_engine():
+    """WindowRankEngine 各操作随受管窗口数的耗时与原生调用次数（--latency 设置模拟调用耗时）"""
+    from window_records import WindowRecord
+
+    for count in (10, 100, 1000):
+        desktop = SimulatedDesktop(latency=LATENCY)
+        win_api.set_backend(desktop)
+        engine, hwnds = make_engine(desktop, count)
+        middle = engine.get(hwnds[count // 2])
+        row = {}
+
+        # 追加 / 挂载工具窗口（测完移除，引擎规模不变）
+        extras = [WindowRecord(desktop.add_window(f"Extra {i}"), f"Extra {i}") for i in range(50)]
+        row['add_window'] = per_call(engine.add_window, [(item,) for item in extras])
+        for item in extras:
+            engine.remove_window(item)
+
+        children = [(desktop.add_window(f"Child {i}", owner=middle.hwnd), f"Child {i}", middle.hwnd) for i in range(50)]
+        row['insert_derived_window'] = per_call(engine.insert_derived_window, children)
+        for child_hwnd, _, _ in children:
+            engine.remove_window(engine.get(child_hwnd))
+
+        # 移除嵌套的工具窗口：它的子窗口原位接到祖父窗口下，记录的 parent 随之更新
+        tool = desktop.add_window("Tool", owner=middle.hwnd)
+        nested = [desktop.add_window(f"Nested {i}", owner=tool) for i in range(2)]
+        engine.insert_derived_window(tool, "Tool", middle.hwnd)
+        for nested_hwnd in nested:
+            engine.insert_derived_window(nested_hwnd, "Nested", tool)
+        engine.remove_window(engine.get(tool))
+        order = list(engine.hwnds())
+        position = order.index(middle.hwnd)
+        assert order[position - 2:position] == nested, order[position - 3:position + 1]
+        assert all(engine.get(nested_hwnd).parent == middle.hwnd for nested_hwnd in nested)
+        for nested_hwnd in nested:
+            engine.remove_window(engine.get(nested_hwnd))
+
+        row['move_item'] = measure(lambda: engine.move_item(middle, 'up') and engine.move_item(middle, 'down'),
+                                   number=20, rounds=3) / 2
+
+        # 没有失效窗口时的定时清理（最常见的情况）
+        desktop.reset_calls()
+        engine.clean_invalid_windows()
+        record(f"engine.clean_invalid_windows[{count}].calls", sum(desktop.calls.values()))
+        row['clean_invalid_windows'] = measure(engine.clean_invalid_windows, number=3, rounds=3)
+
+        # 点中一个窗口使它浮到最上面后的增量重排，以及全量重排
+        def click_and_reorder():
+            desktop.activate(hwnds[0])
+            engine.execute_reorder()
+
+        desktop.reset_calls()
+        click_and_reorder()
+        record(f"engine.execute_reorder[{count}].calls", sum(desktop.calls.values()))
+        row['execute_reorder'] = measure(click_and_reorder, number=3, rounds=3)
+        row['execute_reorder(full)'] = measure(lambda: engine.execute_reorder(full=True), number=3, rounds=3)
+
+        for name, value in row.items():
+            record(f"engine.{name}[{count}]", value)
+        print(f"  {count:>5} 个受管窗口 | " + " | ".join(f"{name} {value * 1e6:9.1f} µs" for name, value in row.items()))
+
+
+@benchmark
+def bench_reorder_planner():
+    """最少移动规划：随机栈上校验结果顺序正确、移动次数最少（小栈与穷举搜索对比），以及规划耗时"""
+    import random
+    from collections import deque
+    from itertools import permutations
+    from reorder_planner import plan_moves, apply_moves, longest_increasing_subsequence
+
+    def fewest_moves(start, goal):
+        """广度优先搜索：每一步把一个元素移到任意位置，最少几步从 start 变成 goal"""
+        seen = {start: 0}
+        queue = deque([start])
+        while queue:
+            order = queue.popleft()
+            if order == goal:
+                return seen[order]
+            for i in range(len(order)):
+                rest = order[:i] + order[i + 1:]
+                for j in range(len(order)):
+                    nxt = rest[:j] + (order[i],) + rest[j:]
+                    if nxt not in seen:
+                        seen[nxt] = seen[order] + 1
+                        queue.append(nxt)
+
+    # 小栈：全部排列，移动次数与穷举的最少步数一致
+    for n in range(1, 6):
+        desired = list(range(n))
+        for current in permutations(desired):
+            moves = plan_moves(desired, current)
+            assert apply_moves(current, moves) == desired, (current, moves)
+            assert len(moves) == fewest_moves(tuple(current), tuple(desired)), (current, moves)
+
+    # 随机栈：夹杂非受管窗口、部分受管窗口不在 Z 序中（已关闭）、强制移动的窗口
+    rng = random.Random(0)
+    for _ in range(500):
+        n = rng.randint(0, 60)
+        desired = rng.sample(range(1000), n)
+        alive = [hwnd for hwnd in desired if rng.random() > 0.05]
+        stack = alive + rng.sample(range(1000, 1100), rng.randint(0, 20))
+        rng.shuffle(stack)
+        forced = {hwnd for hwnd in alive if rng.random() < 0.05}
+        alive_order = [hwnd for hwnd in desired if hwnd in set(alive)]
+
+        moves = plan_moves(alive_order, stack, force_move=forced)
+        result = apply_moves(stack, moves)
+        assert [hwnd for hwnd in result if hwnd in set(alive)] == alive_order
+        assert forced <= {hwnd for hwnd, _ in moves}
+        if not forced:
+            position = {hwnd: i for i, hwnd in enumerate(alive_order)}
+            ranked = [position[hwnd] for hwnd in stack if hwnd in position]
+            assert len(moves) == len(alive_order) - len(longest_increasing_subsequence(ranked))
+        # 规划结果执行后再规划一次不需要任何移动
+        assert plan_moves(alive_order, result) == []
+
+    # 1000 个窗口，其中一个被点到最上面
+    desired = list(range(1000))
+    current = [500] + desired[:500] + desired[501:]
+    elapsed = measure(lambda: plan_moves(desired, current), number=20, rounds=3)
+    assert plan_moves(desired, current) == [(500, 499)]
+    record("planner.plan_moves[1000]", elapsed)
+    print(f"  全部排列 (n <= 5) 与穷举一致 | 500 个随机栈通过 | 1000 个窗口规划 {elapsed * 1e3:.3f} ms")
+
+
+@benchmark
+def bench_stacks():
+    """多个独立栈：点击只重排被点窗口所在的栈，每次触发触及的窗口数、原生调用次数和耗时与单栈对比"""
+    from rank_engine import WindowRankEngine
+    from window_records import WindowRecord
+
+    total, rounds = 200, 60
+    for stack_count in (1, 10):
+        desktop = SimulatedDesktop(latency=0.00002)
+        win_api.set_backend(desktop)
+        engine = WindowRankEngine()
+        size = total // stack_count
+        stacks = []
+        for s in range(stack_count):
+            hwnds = [desktop.add_window(f"Stack {s} / {i}", rect=(0, 0, 800, 600)) for i in range(size)]
+            for hwnd in hwnds:
+                engine.add_window(WindowRecord(hwnd, desktop.window(hwnd).title), stack=f"S{s}")
+            stacks.append(hwnds)
+        engine.execute_reorder(full=True)
+
+        # 轮流点中各栈最底下的窗口，触发只带被点的窗口（与 WindowWatcher -> TriggerScheduler 相同）
+        def click(i):
+            hwnd = stacks[i % stack_count][-1]
+            desktop.activate(hwnd)
+            engine.execute_reorder(stacks=engine.stacks_of((hwnd,)))
+
+        before = engine.reorder_stats()
+        desktop.reset_calls()
+        elapsed = per_call(click, [(i,) for i in range(rounds)])
+        calls = sum(desktop.calls.values()) / rounds
+        after = engine.reorder_stats()
+        touched = (after["touched"] - before["touched"]) / rounds
+        moved = (after["moved"] - before["moved"]) / rounds
+
+        assert touched == size, touched
+        for hwnds in stacks:
+            assert win_api.get_relative_z_order(hwnds) == hwnds
+        record(f"stacks.trigger[{stack_count}]", elapsed)
+        record(f"stacks.trigger[{stack_count}].calls", calls)
+        print(f"  {stack_count:>3} 个栈 × {size:>3} 个窗口 | 每次触发 {elapsed * 1e3:7.3f} ms | "
+              f"触及 {touched:5.1f} 个窗口 | 移动 {moved:4.1f} 个 | 原生调用 {calls:7.1f} 次")
+
+
+@benchmark
+def bench_refresh_window_list():
+    """“刷新列表”（全量同步 + 清理失效目标）随桌面窗口数的耗时与原生调用次数"""
+    from window_inventory import WindowInventory
+
+    for count in (100, 1000, 5000):
+        desktop = SimulatedDesktop(latency=LATENCY)
+        win_api.set_backend(desktop)
+        desktop.populate(count)
+        engine, _ = make_engine(desktop, 20)
+        inventory = WindowInventory()
+        inventory.resync()
+
+        def refresh_window_list():
+            inventory.resync()
+            engine.clean_invalid_windows()
+
+        desktop.reset_calls()
+        refresh_window_list()
+        calls = record(f"refresh_window_list[{count}].calls", sum(desktop.calls.values()))
+        elapsed = record(f"refresh_window_list[{count}]", measure(refresh_window_list, number=3, rounds=3))
+        print(f"  {count:>5} 个桌面窗口 | 每次刷新 {elapsed * 1e3:7.2f} ms | 原生调用 {calls} 次")
+
+
+@benchmark
+def bench_records():
+    """窗口记录：原来的 QObject ItemData 与 __slots__ WindowRecord 的创建耗时、Python 侧内存；引擎操作的变化通知次数"""
+    import tracemalloc
+    from PySide6.QtCore import QObject, Signal
+    from window_records import WindowRecord
+
+    class QtItem(QObject):
+        """原来的 ui_widgets.ItemData（两个信号，rank 变化时发信号）"""
+        rank_updated = Signal(int)
+        title_updated = Signal(str)
+
+        def __init__(self, hwnd, title, rank=None, window_type='STANDARD'):
+            super().__init__()
+            self._hwnd = hwnd
+            self._title = title
+            self._rank = rank
+            self._window_type = window_type
+
+    count = 3000
+    for label, cls in (("QObject ItemData", QtItem), ("WindowRecord", WindowRecord)):
+        tracemalloc.start()
+        items = [cls(0x10000 + i, f"Window {i}") for i in range(count)]
+        size = tracemalloc.get_traced_memory()[0] / count
+        tracemalloc.stop()
+        create = measure(lambda: cls(0x10000, "Window"), number=10000)
+        record(f"records.create.{cls.__name__}", create)
+        del items
+        print(f"  {label:>16} | 创建 {create * 1e6:5.2f} µs/条 | Python 侧 {size:6.0f} 字节/条（不含 Qt C++ 对象）")
+
+    # 一次清理关闭 50 个目标只通知一次
+    desktop = SimulatedDesktop()
+    win_api.set_backend(desktop)
+    engine, hwnds = make_engine(desktop, 200)
+    changes = []
+    engine.subscribe(changes.append)
+    for hwnd in hwnds[::4]:
+        desktop.close_window(hwnd)
+    engine.clean_invalid_windows()
+    engine.move_item(engine.get(hwnds[2]), 'up')
+    assert len(changes) == 2 and len(changes[0].removed) == 50 and changes[1].reordered
+    print(f"  清理 50 个已关闭目标 + 一次上移 | 变化通知 {len(changes)} 次")
+
+
+# === 监控热路径 === #
+@benchmark
+def bench_watcher_lookup():
+    """每次点击 / 每次按键的判定开销随受管窗口数的变化（应保持平稳）"""
+    from auto_monitor import WindowWatcher
+
+    for count in (5, 50, 500, 5000):
+        desktop = SimulatedDesktop()
+        win_api.set_backend(desktop)
+        engine, hwnds = make_engine(desktop, count)
+
+        watcher = WindowWatcher()
+        watcher.update_monitored_hwnds(engine.rank_snapshot())
+
+        # 最后加入的窗口在 Z 序最顶层、rank 最大：点击和按键都会命中它
+        desktop.activate(hwnds[-1])
+        click = record(f"watcher.click[{count}]", measure(lambda: watcher._handle_mouse_release(400, 300)))
+        key = record(f"watcher.key[{count}]", measure(watcher._handle_input_action))
+
+        print(f"  {count:>5} 个受管窗口 | 每次点击 {click * 1e6:7.2f} µs | 每次按键 {key * 1e6:7.2f} µs")
+
+
+@benchmark
+def bench_keyboard_path():
+    """在非受管程序里打字：钩子线程每次按键的开销（前台窗口由事件维护）与原来主线程每次按键的开销"""
+    from auto_monitor import WindowWatcher
+
+    desktop = SimulatedDesktop(latency=0.000001)
+    win_api.set_backend(desktop)
+    engine, hwnds = make_engine(desktop, 50)
+
+    watcher = WindowWatcher()
+    watcher._install_hooks()
+    watcher.update_monitored_hwnds(engine.rank_snapshot())
+    keyboard = watcher.keyboard_worker
+
+    editor = desktop.add_window("Editor")
+    desktop.activate(editor)
+    assert not keyboard.armed
+
+    desktop.reset_calls()
+    hook = record("keyboard.disarmed", measure(lambda: keyboard.on_release(None), number=100000))
+    hook_calls = record("keyboard.disarmed.calls", sum(desktop.calls.values()))
+
+    # 原来的路径：每次按键都跨线程发信号，主线程再 GetForegroundWindow 并查 rank（此处不含信号本身）
+    tracked, watcher._foreground = watcher._foreground, None
+    desktop.reset_calls()
+    legacy = measure(watcher._handle_input_action, number=100000)
+    legacy_calls = desktop.calls['get_foreground_window'] // (100000 * 5)
+    watcher._foreground = tracked
+
+    # 切到 rank > 1 的受管窗口时钩子重新处理按键
+    desktop.activate(hwnds[-1])
+    assert keyboard.armed
+
+    print(f"  非受管前台 | 钩子线程 {hook * 1e9:6.0f} ns/键，原生调用 {hook_calls} 次 | "
+          f"原来主线程 {legacy * 1e9:6.0f} ns/键，原生调用 {legacy_calls} 次/键")
+
+
+@benchmark
+def bench_echo_guard():
+    """重排的回声：被移动后自己抢前台的窗口造成的“按键 -> 重排 -> 抢前台 -> 按键又触发重排”循环，以及没有输入的失控重排的退避"""
+    from auto_monitor import WindowWatcher
+    from echo_guard import EchoGuard
+    from rank_engine import WindowRankEngine
+    from window_records import WindowRecord
+
+    keys = 200
+    for name, window in (("无回声抑制", 0.0), ("回声抑制", EchoGuard.MAX_WINDOW)):
+        desktop = SimulatedDesktop()
+        win_api.set_backend(desktop)
+        guard = EchoGuard()
+        guard.MAX_WINDOW = window
+        hwnds = [desktop.add_window(f"Managed {i}", rect=(0, 0, 800, 600)) for i in range(20)]
+        engine = WindowRankEngine(echo=guard)
+        for hwnd in hwnds:
+            engine.add_window(WindowRecord(hwnd, desktop.window(hwnd).title))
+
+        watcher = WindowWatcher(echo=guard)
+        watcher._install_hooks()
+        watcher.update_monitored_hwnds(engine.rank_snapshot())
+        requests = []
+        watcher.request_rearrange.connect(requests.append)
+
+        # 用户在 rank 1 的窗口里打字；rank 10 的窗口每次被移动后都把自己激活
+        pushy = hwnds[9]
+        desktop.set_pushy(pushy, True)
+        desktop.activate(hwnds[0])
+        guard.note_input()
+        engine.execute_reorder(full=True)
+
+        before = engine.reorders
+        for _ in range(keys):
+            guard.note_input()
+            del requests[:]
+            watcher._handle_input_action()
+            if requests:
+                engine.execute_reorder(stacks=engine.stacks_of(requests))
+        per_key = record(f"echo.reorders_per_key[{'guard' if window else 'none'}]", (engine.reorders - before) / keys)
+
+        # 用户真的切到这个窗口时不能被当作回声
+        guard.note_input()
+        desktop.activate(pushy)
+        assert watcher._foreground == pushy
+        watcher.stop()
+        stats = guard.stats()
+        print(f"  {name:<6} | 每次按键触发重排 {per_key:4.2f} 次 | 丢弃回声 {stats['dropped']:>3} 次 | "
+              f"回声窗口 {stats['window_ms']:6.2f} ms")
+        if window:
+            assert per_key == 0
+
+    # 失控保护：模拟时钟下每秒 100 次触发，持续 10 秒
+    for name, with_input in (("没有输入", False), ("每次都有输入", True)):
+        now = [0.0]
+        guard = EchoGuard(clock=lambda: now[0])
+        allowed = 0
+        for i in range(1000):
+            now[0] = i * 0.01
+            if with_input:
+                guard.note_input()
+            allowed += guard.allow_reorder()
+        stats = guard.stats()
+        print(f"  {name:<6} | 1000 次触发执行 {allowed:>4} 次 | 失控 {stats['runaways']:>2} 次 | "
+              f"跳过 {stats['suppressed']:>4} 次")
+        if with_input:
+            assert allowed == 1000
+        else:
+            record("echo.runaway.allowed", allowed)
+            assert allowed < 100
+
+    # 输入计数：多个钩子线程同时累加不丢失；钩子进程的输入序号（事件环头部）同样算真实输入
+    import threading
+    import event_ring
+
+    guard = EchoGuard()
+    threads = [threading.Thread(target=lambda: [guard.note_input() for _ in range(20000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert guard.inputs == 4 * 20000, guard.inputs
+    note = record("echo.note_input", measure(guard.note_input, number=100000))
+
+    ring = event_ring.EventRing.create(capacity=16)
+    source = lambda: ring.inputs
+    guard.add_input_source(source)
+    hwnd = 1
+    guard.expect([hwnd])
+    assert guard.is_echo(hwnd)
+    # 钩子进程看到一次按键（前台不是受管窗口，没有写入事件）：之后的前台事件不再是回声
+    ring.note_input()
+    assert not ring.pop_all() and not guard.is_echo(hwnd)
+    before = guard.inputs
+    guard.remove_input_source(source)
+    assert guard.inputs == before
+    ring.close()
+    print(f"  输入计数 | 4 线程 × 20000 次不丢失 | note_input {note * 1e6:.2f} µs/次 | 钩子进程输入序号生效")
+
+
+def _click_stream(desktop, managed, count, seed=0):
+    """
+    生成一段可重放的点击记录：[(x, y)] 或 ('move', hwnd, rect)。
+    大部分点击落在桌面任意位置，一部分瞄准受管窗口（含关闭按钮区域），中间穿插受管窗口的移动。
+    """
+    import random
+    rnd = random.Random(seed)
+    stream = []
+    for _ in range(count):
+        roll = rnd.random()
+        if roll < 0.01:
+            x, y = rnd.randrange(0, 1600), rnd.randrange(0, 900)
+            stream.append(('move', rnd.choice(managed), (x, y, x + 640, y + 480)))
+        elif roll < 0.1:
+            left, top, right, bottom = desktop.window(rnd.choice(managed)).rect
+            stream.append((rnd.randrange(left, right), rnd.randrange(top, top + 60)))
+        else:
+            stream.append((rnd.randrange(0, 2560), rnd.randrange(0, 1440)))
+    return stream
+
+
+@benchmark
+def bench_click_filter():
+    """重放点击记录：钩子线程预过滤后转发的比例、过滤耗时；被丢弃的点击不能是本应触发重排的点击"""
+    import event_ring
+    from auto_monitor import WindowWatcher
+    from win_backend import EVENT_OBJECT_LOCATIONCHANGE, OBJID_CURSOR
+
+    for managed_count in (5, 50):
+        desktop = SimulatedDesktop()
+        win_api.set_backend(desktop)
+        desktop.populate(1000)
+        engine, managed = make_engine(desktop, managed_count)
+        for i, hwnd in enumerate(managed):
+            x, y = (i * 97) % 1600, (i * 53) % 900
+            desktop.move_window(hwnd, (x, y, x + 640, y + 480))
+        for hwnd in desktop.populate(200, seed=1):
+            desktop.activate(hwnd)
+
+        watcher = WindowWatcher()
+        watcher._install_hooks()
+        watcher.update_monitored_hwnds(engine.rank_snapshot())
+        requests = []
+        watcher.request_rearrange.connect(requests.append)
+        # 钩子进程模式下同一份矩形发布到事件环，钩子进程按它过滤
+        ring = event_ring.EventRing.create(capacity=16)
+        watcher.click_filter.attach_ring(ring)
+
+        stream = _click_stream(desktop, managed, 20000)
+        others = [hwnd for hwnd in desktop.enum_windows() if hwnd not in set(managed)]
+        missed = 0
+        filter_time = 0.0
+        for i, event in enumerate(stream):
+            # 其他程序的窗口移动、光标移动：位置变化钩子只按受管窗口的进程安装，不应收到这些事件
+            other = others[i % len(others)]
+            desktop.fire_event(EVENT_OBJECT_LOCATIONCHANGE, other, id_object=OBJID_CURSOR)
+            if i % 10 == 0:
+                desktop.move_window(other, desktop.window(other).rect)
+            if event[0] == 'move':
+                desktop.move_window(event[1], event[2])
+                continue
+            x, y = event
+            start = time.perf_counter()
+            forwarded = watcher.click_filter.accept(x, y)
+            filter_time += time.perf_counter() - start
+
+            # 不经过滤时主线程的判定结果
+            before = len(requests)
+            watcher._handle_mouse_release(x, y)
+            if len(requests) > before and not forwarded:
+                missed += 1
+
+        assert ring.zones() == watcher.click_filter._zones
+        watcher.click_filter.enabled = False
+        assert ring.zones() is None
+        watcher.click_filter.enabled = True
+        watcher.click_filter.attach_ring(None)
+        ring.close()
+
+        stats = watcher.stats()
+        assert stats['hooked_processes'] == managed_count
+        assert stats['win_events'] == stats['win_events_used'], "收到了非受管进程的位置变化事件"
+        record(f"click_filter.accept[{managed_count}]", filter_time / stats['seen'])
+        record(f"click_filter.win_events[{managed_count}].calls", stats['win_events'])
+        record(f"click_filter.forwarded[{managed_count}].calls", stats['forwarded'])
+        assert missed == 0, f"预过滤丢掉了 {missed} 次本应触发重排的点击"
+        print(f"  {managed_count:>3} 个受管窗口 | 点击 {stats['seen']} 次 | 转发 {stats['forwarded']} 次 "
+              f"({stats['forwarded'] / stats['seen']:.0%}) | 每次过滤 {filter_time / stats['seen'] * 1e6:.2f} µs | "
+              f"窗口事件 收到 {stats['win_events']} / 使用 {stats['win_events_used']}")
+
+
+# === 全量同步 === #
+@benchmark
+def bench_window_snapshot():
+    """全量同步：逐窗口 probe_window 与列式快照 (WindowSnapshot) 的调用次数和耗时"""
+    from window_snapshot import WindowSnapshot, REAL_FIELDS
+
+    for count in (500, 3000):
+        desktop = SimulatedDesktop(latency=0.000002)
+        desktop.populate(count)
+        win_api.set_backend(desktop)
+
+        def probe_each():
+            return [(hwnd, *info) for hwnd in desktop.enum_windows()
+                    if (info := win_api.probe_window(hwnd)) is not None]
+
+        snapshot = WindowSnapshot()
+
+        def columnar():
+            snapshot.capture(fields=REAL_FIELDS)
+            return snapshot.real_windows(filter=False)
+
+        assert probe_each() == columnar()
+        results = []
+        for func in (probe_each, columnar):
+            desktop.reset_calls()
+            func()
+            results.append((sum(desktop.calls.values()), measure(func, number=3, rounds=3)))
+
+        (old_calls, old_time), (new_calls, new_time) = results
+        # 快照读标题代替 GetWindowTextLength，每个真实窗口少一次调用
+        assert new_calls < old_calls, (old_calls, new_calls)
+        assert win_api.get_all_windows(filter=False) == [(hwnd, title) for hwnd, title, _ in probe_each()]
+        record(f"snapshot.capture[{count}]", new_time)
+        record(f"snapshot.capture[{count}].calls", new_calls)
+        print(f"  {count:>5} 个窗口 | 逐窗口检查 {old_calls:>6} 次调用 {old_time * 1e3:6.1f} ms | "
+              f"列式快照 {new_calls:>6} 次调用 {new_time * 1e3:6.1f} ms")
+
+
+# === 子窗口归属 === #
+def _scan_one_by_one(engine, new_windows):
+    """原来的做法：每个新窗口对每个目标调用一次 is_son_window"""
+    targets = engine.snapshot().targets
+    for new_hwnd, new_title in new_windows:
+        if new_hwnd in engine:
+            continue
+        for target in targets:
+            if win_api.is_son_window(target.hwnd, new_hwnd):
+                engine.insert_derived_window(new_hwnd, new_title, target.hwnd)
+                targets = engine.snapshot().targets
+                break
+
+
+@benchmark
+def bench_child_attribution():
+    """新窗口归属：逐个 is_son_window 与按 owner / pid 索引一次解析的调用次数和耗时（结果必须一致）"""
+    import random
+    from child_attribution import ChildAttributor
+    from rank_engine import WindowRankEngine
+    from window_records import WindowRecord
+    from win_backend import WS_EX_TOOLWINDOW, WS_EX_APPWINDOW
+
+    for target_count, new_count in ((10, 50), (100, 200), (500, 500)):
+        rnd = random.Random(target_count)
+        desktop = SimulatedDesktop(latency=0.00001)
+        win_api.set_backend(desktop)
+        engine, targets = make_engine(desktop, target_count)
+        engines = [engine, WindowRankEngine()]
+        for hwnd in targets:
+            engines[1].add_window(WindowRecord(hwnd, desktop.window(hwnd).title))
+        target_pids = [desktop.window(hwnd).pid for hwnd in targets]
+
+        # 新窗口：同进程工具窗口 / 有 Owner 的对话框（所有者可能是同一批里更早的对话框）/ 同进程任务栏窗口 / 无关窗口
+        new_windows = []
+        owners = list(targets)
+        for i in range(new_count):
+            roll = rnd.random()
+            if roll < 0.25:
+                hwnd = desktop.add_window(f"Tool {i}", pid=rnd.choice(target_pids), ex_style=WS_EX_TOOLWINDOW)
+            elif roll < 0.5:
+                hwnd = desktop.add_window(f"Dialog {i}", owner=rnd.choice(owners))
+                owners.append(hwnd)
+            elif roll < 0.6:
+                hwnd = desktop.add_window(f"App {i}", pid=rnd.choice(target_pids), ex_style=WS_EX_APPWINDOW)
+            else:
+                hwnd = desktop.add_window(f"Other {i}")
+            new_windows.append((hwnd, f"New {i}"))
+
+        results = []
+        for engine, scan in ((engines[0], _scan_one_by_one), (engines[1], ChildAttributor().scan)):
+            desktop.reset_calls()
+            start = time.perf_counter()
+            scan(engine, new_windows)
+            elapsed = time.perf_counter() - start
+            results.append((sum(desktop.calls.values()), elapsed, [t.hwnd for t in engine.snapshot().targets]))
+
+        (old_calls, old_time, old_order), (new_calls, new_time, new_order) = results
+        assert old_order == new_order, "索引解析结果与 is_son_window 不一致"
+        record(f"child_attribution.scan[{target_count}x{new_count}].calls", new_calls)
+        record(f"child_attribution.scan[{target_count}x{new_count}]", new_time)
+        print(f"  {target_count:>4} 个目标 × {new_count:>4} 个新窗口 | "
+              f"逐个判定 {old_calls:>7} 次调用 {old_time * 1e3:8.1f} ms | "
+              f"索引解析 {new_calls:>5} 次调用 {new_time * 1e3:6.1f} ms")
+
+
+# === 图标管线 === #
+@benchmark
+def bench_icon_cache():
+    """图标异步加载：界面线程每次取图的耗时，以及按 (进程路径, 内容) 去重后的缓存大小"""
+    from icon_loader import IconLoader
+
+    for count in (500, 3000):
+        desktop = SimulatedDesktop(latency_overrides={'get_window_icon': 0.0005})
+        win_api.set_backend(desktop)
+        hwnds = desktop.populate(count)
+
+        loader = IconLoader()
+        ready = []
+        loader.icon_ready.connect(ready.append)
+
+        start = time.perf_counter()
+        for hwnd in hwnds:
+            loader.pixmap(hwnd)
+        schedule = (time.perf_counter() - start) / len(hwnds)
+        while len(ready) < len(hwnds):
+            QCoreApplication.processEvents()
+        loaded = time.perf_counter() - start
+
+        hit = record(f"icon.hit[{count}]", measure(lambda: loader.pixmap(hwnds[0]), number=10000))
+        stats = loader.stats()
+        loader.shutdown()
+        print(f"  {len(hwnds):>5} 个窗口 | 首次取图 {schedule * 1e6:6.2f} µs | 全部加载 {loaded * 1e3:7.1f} ms | "
+              f"命中 {hit * 1e6:5.2f} µs | 缓存 {stats['entries']} 张图")
+
+    # 隔离期满后重新加载：源列表里不受管的窗口没有其他地方会重新探测
+    import window_health
+
+    now = [0.0]
+    saved, window_health._health = window_health._health, window_health.WindowHealth(clock=lambda: now[0])
+    try:
+        desktop = SimulatedDesktop()
+        win_api.set_backend(desktop)
+        hwnd = desktop.populate(1)[0]
+        loader = IconLoader()
+        window_health.get_health().report_timeout(hwnd, 1.0)
+        loader.pixmap(hwnd)
+        assert loader.stats()["misses"] == 0
+        now[0] += 1000
+        loader.pixmap(hwnd)
+        assert loader.stats()["misses"] == 1
+        while loader._pending:
+            QCoreApplication.processEvents()
+        assert not window_health.get_health().is_quarantined(hwnd) and loader.stats()["windows"] == 1
+        loader.shutdown()
+    finally:
+        window_health._health = saved
+    print("  隔离期满的窗口 | 下次绘制重新探测并加载图标")
+
+
+# === 日志 === #
+@benchmark
+def bench_logging():
+    """调用线程上的日志开销：单条日志、每次子窗口扫描（新窗口进入清单 + 归属挂载）；同步写文件与队列 + 后台线程 + 限流对比"""
+    # 单核机器上后台线程和调用线程抢同一个 CPU，队列模式的收益会被部分抵消
+    import tempfile
+    import logger as log_setup
+    from child_attribution import ChildAttributor
+    from window_inventory import WindowInventory
+    from win_backend import WS_EX_TOOLWINDOW
+
+    def scan_once():
+        desktop = SimulatedDesktop()
+        win_api.set_backend(desktop)
+        engine, targets = make_engine(desktop, 100)
+        inventory = WindowInventory()
+        inventory.resync()
+        inventory.take_new_windows()
+        log_setup.flush()
+        for i in range(300):
+            if i % 2:
+                desktop.add_window(f"Tool {i}", pid=desktop.window(targets[i % 100]).pid, ex_style=WS_EX_TOOLWINDOW)
+            else:
+                desktop.add_window(f"Other {i}")
+
+        start = time.perf_counter()
+        inventory.resync()
+        ChildAttributor().scan(engine, inventory.take_new_windows())
+        return time.perf_counter() - start
+
+    log = logging.getLogger("benchmark")
+    root = logging.getLogger()
+    modes = (("关闭日志", "off"), ("同步写入", "sync"), ("队列", "queue"), ("队列+限流", "limited"))
+    results = {}
+    try:
+        for label, mode in modes:
+            with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+                log_setup.shutdown()
+                handlers = []
+                if mode == "sync":
+                    # 原来的配置：控制台和文件 Handler 直接挂在根 logger 上，在调用线程写入
+                    handlers = log_setup.create_handlers(log_dir, console_stream=devnull)
+                    for handler in handlers:
+                        root.addHandler(handler)
+                elif mode != "off":
+                    log_setup.setup_logger(log_dir=log_dir, console_stream=devnull,
+                                           rate_limit=None if mode == "queue" else log_setup.RATE_LIMIT)
+                logging.disable(logging.CRITICAL if mode == "off" else logging.NOTSET)
+
+                per_line = measure(lambda: log.info("[基准] 发现新窗口: [%s] (HWND: %s)", "title", 0x10000),
+                                   number=500, rounds=3)
+                log_setup.flush()
+                scan = min(scan_once() for _ in range(5))
+                results[mode] = scan
+
+                suppressed = log_setup.stats()["suppressed"]
+                log_setup.shutdown()
+                for handler in handlers:
+                    root.removeHandler(handler)
+                    handler.close()
+                record(f"logging.line.{mode}", per_line)
+                print(f"  {label:>6} | 每条日志 {per_line * 1e6:6.2f} µs | 每次扫描 {scan * 1e3:6.2f} ms | "
+                      f"限流省略 {suppressed:>5} 条")
+    finally:
+        logging.disable(logging.CRITICAL)
+        log_setup.setup_logger()
+
+    print("  每次扫描的日志开销 | " + " | ".join(
+        f"{label} {(results[mode] - results['off']) * 1e3:+6.2f} ms" for label, mode in modes[1:]))
+
+
+# === 延迟追踪 === #
+@benchmark
+def bench_tracing():
+    """触发到稳定的分阶段延迟：按 main.py 的连接方式驱动 监控器 -> 调度器 -> 重排线程 -> 刷新；另测关闭追踪时的开销"""
+    import json
+    import tempfile
+    import tracing
+    from auto_monitor import WindowWatcher
+    from reorder_worker import ReorderWorker, ReorderCommand
+    from trigger_scheduler import TriggerScheduler
+
+    tracer = tracing.get_tracer()
+
+    # 关闭追踪时钩子回调多出的开销：一次 start() 和一次判空
+    tracer.enabled = False
+    disabled = record("tracing.disabled", measure(lambda: tracer.start() and None, number=100000))
+    tracer.enabled = True
+    enabled = measure(lambda: tracer.start().stamp('hook'), number=100000)
+    print(f"  每次触发的打点开销 | 关闭 {disabled * 1e9:5.0f} ns | 开启 {enabled * 1e9:5.0f} ns（start + 一次打点）")
+
+    desktop = SimulatedDesktop(latency=0.00002)
+    win_api.set_backend(desktop)
+    engine, hwnds = make_engine(desktop, 50)
+
+    watcher = WindowWatcher()
+    watcher.update_monitored_hwnds(engine.rank_snapshot())
+    scheduler = TriggerScheduler()
+    worker = ReorderWorker(engine)
+    watcher.request_rearrange.connect(scheduler.request)
+
+    def scan_and_reorder(hwnds):
+        trace = tracer.take_queued()
+        if trace:
+            trace.stamp('delay')
+        worker.submit(ReorderCommand(reorder=True, stacks=engine.stacks_of(hwnds), trace=trace))
+
+    settled = []
+
+    def refresh(snapshot, trace):
+        if trace:
+            trace.stamp('deliver')
+        watcher.update_monitored_hwnds(snapshot.ranks)
+        if trace:
+            trace.stamp('refresh')
+            tracer.finish(trace)
+        settled.append(trace)
+
+    scheduler.fired.connect(scan_and_reorder)
+    worker.finished.connect(refresh)
+    worker.start()
+
+    tracer.reset()
+    rounds = 30
+    for i in range(rounds):
+        # 点中 rank 最大的窗口，使它浮到最上面，重排再把顺序纠正回来
+        desktop.activate(hwnds[i % len(hwnds)])
+        trace = tracer.start()
+        trace.stamp('hook')
+        watcher.mouse_worker.left_released.emit(400, 300, trace)
+        while len(settled) <= i:
+            QCoreApplication.processEvents()
+    worker.stop()
+
+    for stage, (count, p50, p95, p99) in tracer.percentiles().items():
+        print(f"  {stage:>8} | {count:>3} 次 | p50 {p50:7.3f} ms | p95 {p95:7.3f} ms | p99 {p99:7.3f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.json")
+        exported = tracer.export_chrome_trace(path)
+        with open(path, encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+    assert exported == rounds and events
+    print(f"  Chrome Trace: {exported} 次触发，{len(events)} 个事件")
+    tracer.enabled = False
+    tracer.reset()
+
+
+# === 钩子进程事件环 === #
+@benchmark
+def bench_event_ring():
+    """钩子进程 -> 主程序的共享内存事件环：假生产者进程写入，主进程取出（吞吐、端到端延迟、丢弃数）"""
+    import subprocess
+    import event_ring
+    import hook_service
+
+    def start_producer(ring, count, interval_s=0.0):
+        # 与 WindowWatcher 相同：精简入口 + 标准输入 / 输出管道
+        return subprocess.Popen(hook_service.command(ring.name) + ["--fake", str(count), str(interval_s)],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    # 吞吐：生产者尽快写入，环满时等待消费者；消费者与 WindowWatcher 一样读到唤醒字节后取出事件
+    count = 50000
+    ring = event_ring.EventRing.create(capacity=4096)
+    producer = start_producer(ring, count)
+    received = 0
+    first = None
+    while received < count and producer.stdout.read1(65536):
+        events = ring.pop_all()
+        if events and first is None:
+            first = time.perf_counter()
+        received += len(events)
+    elapsed = time.perf_counter() - first
+    producer.stdout.read()
+    producer.wait()
+    assert received == count, received
+    print(f"  突发 {count} 条 | 吞吐 {count / elapsed / 1e6:5.2f} M 条/s | 丢弃 {ring.dropped}")
+    ring.close()
+
+    # 延迟：每 1 ms 一条（远高于真实输入频率）。
+    # 管道唤醒（WindowWatcher 的做法）：阻塞读取唤醒字节，读到后取出事件；对比原来 5 ms 定时轮询
+    for poll_ms in (None, 5):
+        count = 1000
+        ring = event_ring.EventRing.create(capacity=4096)
+        producer = start_producer(ring, count, 0.001)
+        latencies = []
+        wakeups = 0
+        while len(latencies) < count:
+            if poll_ms is None:
+                producer.stdout.read1(4096)
+            else:
+                time.sleep(poll_ms / 1000)
+            wakeups += 1
+            now = time.perf_counter_ns()
+            latencies.extend(now - event[3] for event in ring.pop_all())
+        producer.stdout.read()
+        producer.wait()
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] / 1e3
+        p99 = latencies[len(latencies) * 99 // 100] / 1e3
+        mode = "管道唤醒" if poll_ms is None else f"轮询 {poll_ms} ms"
+        if poll_ms is None:
+            record("event_ring.latency_p50", p50 / 1e6)
+            record("event_ring.latency_p99", p99 / 1e6)
+            assert p99 < 2000, f"管道唤醒的 p99 延迟 {p99:.0f} µs"
+        print(f"  {mode:>8} | 延迟 p50 {p50:8.1f} µs | p99 {p99:8.1f} µs | 唤醒 {wakeups} 次 | 丢弃 {ring.dropped}")
+        ring.close()
+
+    # 点击预过滤：主程序发布受管窗口矩形，钩子进程只写入可能点中它们的点击（规则与进程内的 ClickFilter 相同）
+    zones = [(100, 100, 500, 400), (1200, 600, 1800, 1000)]
+    ring = event_ring.EventRing.create(capacity=4096)
+    assert ring.zones() is None
+    ring.set_zones([(0, 0, 1, 1)] * (event_ring.MAX_ZONES + 1))
+    assert ring.zones() is None
+    ring.set_zones(zones)
+    assert ring.zones() == tuple(zones)
+    count = 30000
+    clicks = [(i % 1920, i % 1080) for i in range(count) if i % 3 != 2]
+    results = [event_ring.classify_click(zones, x, y) for x, y in clicks]
+    expected = results.count(event_ring.CLICK_HIT)
+    producer = start_producer(ring, count)
+    received = 0
+    while producer.stdout.read1(65536):
+        received += sum(kind != event_ring.KEY_COMMIT for kind, *_ in ring.pop_all())
+    producer.wait()
+    received += sum(kind != event_ring.KEY_COMMIT for kind, *_ in ring.pop_all())
+    outside, close = ring.dropped_clicks
+    assert received == expected, (received, expected)
+    assert (outside, close) == (results.count(event_ring.CLICK_OUTSIDE), results.count(event_ring.CLICK_CLOSE))
+    record("event_ring.prefilter.forwarded_ratio", received / len(clicks))
+    print(f"  点击预过滤 | {len(clicks)} 次点击跨进程 {received} 次 ({received / len(clicks):.0%}) | "
+          f"矩形外丢弃 {outside} | 关闭按钮丢弃 {close}")
+    ring.close()
+
+    # 钩子进程只导入钩子模块：不加载 PySide6，也不配置日志
+    probe = ("import sys, runpy; sys.argv = ['hook_service.py', '-']; "
+             "import hook_service; print(sorted(m for m in ('PySide6', 'logger', 'main') if m in sys.modules))")
+    imported = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(hook_service.__file__))).stdout.strip()
+    assert imported == "[]", imported
+    print(f"  钩子进程额外导入的重模块: {imported}")
+
+
+# === 配置重新挂载 === #
+@benchmark
+def bench_profile_matcher():
+    """配置规则匹配：数百到数千条规则对数千个新窗口，预编译索引（exe / class 分桶 + 标题字面量 3-gram）与逐条匹配对比"""
+    import random
+    import profiles
+
+    rnd = random.Random(0)
+    apps = [f"app{i}.exe" for i in range(200)]
+    classes = [f"Class{i}" for i in range(50)]
+    words = ["report", "draft", "invoice", "chart", "notes", "review", "build", "log", "mail", "todo"]
+    windows = [(rnd.choice(apps), rnd.choice(classes), f"{rnd.choice(words)} {rnd.randrange(1000)} - Editor")
+               for _ in range(5000)]
+
+    for profile_count in (5, 25, 100):
+        # 每个配置 20 块：exe + class、exe + 标题、只有 class、只有标题 四种规则混合
+        stacks = []
+        for p in range(profile_count):
+            blocks = []
+            for b in range(20):
+                kind = rnd.randrange(4)
+                exe = rnd.choice(apps) if kind in (0, 1) else None
+                class_name = rnd.choice(classes) if kind in (0, 2) else None
+                title = f"{rnd.choice(words)} {rnd.randrange(1000)}" if kind in (1, 3) else None
+                blocks.append((profiles.Rule(exe, class_name, title, f"p{p}", b), []))
+            stacks.append(profiles.Profile(f"p{p}", blocks))
+        index = profiles.MatcherIndex(stacks)
+        # 约三分之一的规则已经挂载了窗口
+        taken = {rule.key for rule in index.rules if rnd.random() < 0.3}
+
+        def linear(exe, class_name, title):
+            return next((rule for rule in index.rules
+                         if rule.key not in taken and rule.matches(exe, class_name, title)), None)
+
+        def indexed(exe, class_name, title):
+            return index.match(exe, class_name, title, taken)
+
+        # 两种方式结果必须一致
+        assert all(indexed(*window) is linear(*window) for window in windows)
+        matched = sum(indexed(*window) is not None for window in windows)
+
+        fast = record(f"profiles.match.indexed.{len(index)}", per_call(indexed, windows))
+        slow = record(f"profiles.match.linear.{len(index)}", per_call(linear, windows))
+        print(f"  {len(index):>5} 条规则 × {len(windows)} 个窗口（命中 {matched:>4}）| "
+              f"索引 {fast * 1e6:6.2f} µs/窗口 | 逐条 {slow * 1e6:7.2f} µs/窗口 | {slow / fast:5.1f}x")
+
+    # 重新挂载：工具窗口先于主窗口出现时只记入等待，不算已挂载；主窗口出现后一起挂上
+    from rank_engine import WindowRankEngine
+
+    desktop = SimulatedDesktop()
+    win_api.set_backend(desktop)
+    store = profiles.ProfileStore(os.devnull)
+    store.profiles["p"] = profiles.Profile("p", [(profiles.Rule(class_name="Main", profile="p"),
+                                                  [profiles.Rule(class_name="Tool", profile="p", tool=0)])])
+    manager = profiles.ProfileManager(WindowRankEngine(), store)
+    manager.rebuild()
+    main_hwnd = desktop.add_window("Main", class_name="Main")
+    tool_hwnd = desktop.add_window("Tool", class_name="Tool", owner=main_hwnd)
+    assert not manager.on_window(tool_hwnd, "Tool")
+    assert manager.stats() == {"rules": 2, "matched": 0, "pending": 1}, manager.stats()
+    assert manager.on_window(main_hwnd, "Main")
+    assert manager.stats() == {"rules": 2, "matched": 2, "pending": 0}, manager.stats()
+    assert manager.engine.get(tool_hwnd).parent == main_hwnd
+    print(f"  先出现的工具窗口 | 等待 1 个 -> 主窗口出现后挂载 {manager.matched} 个")
+
+
+# === 启动 === #
+# 核心引擎模块（守护进程 / 无界面客户端也会用到）冷导入的耗时上限，以及它们不应连带导入的重量级模块
+CORE_MODULES = ("window_records", "window_blocks", "reorder_planner", "rank_engine", "ipc")
+CORE_IMPORT_BUDGET = 0.3
+HEAVY_MODULES = ("PySide6", "numpy", "qdarktheme", "pynput", "win32gui")
+
+
+def _cold_import(module, rounds=3):
+    """在新的解释器里导入 module，返回 (最快一次的导入耗时, 连带导入的重量级模块)"""
+    import subprocess
+
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        f"print(time.perf_counter() - start, ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, heavy = float("inf"), ""
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        elapsed, _, heavy = output.stdout.splitlines()[-1].partition(" ")
+        best = min(best, float(elapsed))
+    return best, heavy
+
+
+@benchmark
+def bench_import_time():
+    """冷导入耗时：核心引擎模块不能连带导入 Qt / NumPy 等重量级模块，且不超过 CORE_IMPORT_BUDGET；main 的顶层导入作对比"""
+    for module in CORE_MODULES + ("main",):
+        elapsed, heavy = _cold_import(module)
+        # 亚毫秒级的导入抖动太大，不进基线
+        if elapsed >= 0.005:
+            record(f"startup.import.{module}", elapsed)
+        print(f"  {module:>16} | {elapsed * 1000:7.1f} ms | 连带导入 {heavy or '-'}")
+        if module in CORE_MODULES:
+            assert not heavy, f"{module} 连带导入了 {heavy}"
+            assert elapsed < CORE_IMPORT_BUDGET, f"{module} 导入耗时 {elapsed:.3f}s 超过 {CORE_IMPORT_BUDGET}s"
+
+
+# === 守护进程 IPC === #
+@benchmark
+def bench_ipc():
+    """守护进程控制接口：单条 JSON-RPC 往返、批量命令的单条耗时与变化通知次数"""
+    import tempfile
+    import ipc
+
+    desktop = SimulatedDesktop()
+    win_api.set_backend(desktop)
+    engine, hwnds = make_engine(desktop, 100)
+    changes = []
+    engine.subscribe(changes.append)
+    api = ipc.ControlApi(engine)
+
+    if sys.platform == 'win32':
+        address = r'\\.\pipe\window_stack_bench'
+    else:
+        address = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    server = ipc.Server(api.handlers(), address, batch=engine.batch)
+    server.start()
+    try:
+        # 访问控制：socket 只有本用户可访问，密钥不对的客户端连不上
+        from multiprocessing import AuthenticationError
+        if sys.platform != 'win32':
+            assert os.stat(address).st_mode & 0o777 == 0o600
+            assert os.stat(ipc.runtime_dir()).st_mode & 0o077 == 0
+        try:
+            ipc.Client(address, authkey=b"wrong key").close()
+        except (AuthenticationError, ConnectionError, EOFError, OSError):
+            pass
+        else:
+            raise AssertionError("密钥错误的客户端连接成功")
+
+        with ipc.Client(address) as client:
+            single = record("ipc.call.list_since", measure(lambda: client.call("list", {"since": api.version}), number=500))
+            # 逐条执行后 hwnds[0] 沉到最底，批量把它一步步移回最上面
+            moves = [("move", {"hwnd": hwnds[i], "direction": "up"}) for i in range(1, 100)]
+            batch_moves = [("move", {"hwnd": hwnds[0], "direction": "up"})] * 99
+            one_by_one = record("ipc.move.single", per_call(lambda c: client.call(*c), [(c,) for c in moves]))
+            del changes[:]
+            start = time.perf_counter()
+            results = client.batch(batch_moves)
+            batched = record("ipc.move.batched", (time.perf_counter() - start) / len(batch_moves))
+            assert all(results) and len(changes) == 1
+            notified = len(changes)
+
+        # 界面客户端：查询只读缓存，界面线程上修改只有一次往返，列表由拉取线程同步
+        import threading
+        with ipc.Client(address) as client:
+            calls = []
+            call = client.call
+            client.call = lambda method, params=None: calls.append(method) or call(method, params)
+            remote = ipc.RemoteEngine(client)
+            synced = threading.Event()
+            remote.subscribe(lambda change: synced.set())
+            remote.start_polling(60)
+            assert synced.wait(5)
+            synced.clear()
+            del calls[:]
+            snapshot = remote.snapshot()
+            assert not calls and len(snapshot.targets) == 100
+            assert remote.move_item(snapshot.targets[0], "down") and calls == ["move"]
+            assert synced.wait(5) and remote.snapshot().targets[1].hwnd == snapshot.targets[0].hwnd
+            remote.stop_polling()
+    finally:
+        server.stop()
+    print(f"  list(since) 往返 {single * 1e6:7.1f} µs")
+    print(f"  移动 99 次 | 逐条 {one_by_one * 1e6:7.1f} µs/条 | 批量 {batched * 1e6:7.1f} µs/条，变化通知 {notified} 次")
+    print("  界面客户端 | 查询 0 次往返 | 修改 1 次往返，列表由拉取线程同步")
+
+
+# === 基线 === #
+def load_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, latency):
+    """合并写入：只运行部分基准时，其他指标保留原基线"""
+    baseline = load_baseline(path) or {"latency": latency, "results": {}}
+    if baseline.get("latency") != latency:
+        baseline = {"latency": latency, "results": {}}
+    baseline["results"].update(RESULTS)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    print(f"[基线] 已保存 {len(RESULTS)} 项指标 -> {path}")
+
+
+def check_baseline(path, latency, threshold):
+    """与基线对比，返回回归的指标列表 [(名称, 基线, 本次)]"""
+    baseline = load_baseline(path)
+    if baseline is None:
+        raise FileNotFoundError(f"没有基线文件 {path}，先运行 --save-baseline")
+    if baseline.get("latency") != latency:
+        raise ValueError(f"基线的 --latency 为 {baseline.get('latency')}，本次为 {latency}")
+
+    regressions = []
+    for name, value in sorted(RESULTS.items()):
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        if not name.endswith(".calls") and value - old < MIN_TIME_DELTA:
+            continue
+        if value > old * (1 + threshold):
+            regressions.append((name, old, value))
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="性能基准")
+    parser.add_argument("pattern", nargs="?", default="", help="只运行名字中包含该字符串的基准")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="SECONDS",
+                        help="引擎 / 全量同步基准中模拟桌面每次调用的耗时（秒）")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线")
+    parser.add_argument("--check", action="store_true", help="与基线对比，回归超过阈值时返回 1")
+    parser.add_argument("--threshold", type=float, default=0.3, help="允许的变差比例（默认 0.3 即 30%%）")
+    return parser.parse_args(argv[1:])
+
+
+def main(argv):
+    global LATENCY
+    args = parse_args(argv)
+    LATENCY = args.latency
+
+    # QPixmap 需要 QGuiApplication（offscreen 平台即可）
+    app = QCoreApplication.instance() or QGuiApplication(argv[:1])
+    logging.disable(logging.CRITICAL)
+
+    for func in BENCHMARKS:
+        if args.pattern in func.__name__:
+            print(f"[{func.__name__}] {func.__doc__}")
+            func()
+
+    if args.save_baseline:
+        save_baseline(args.baseline, LATENCY)
+    if args.check:
+        try:
+            regressions = check_baseline(args.baseline, LATENCY, args.threshold)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[基线] {e}")
+            return 2
+        for name, old, new in regressions:
+            print(f"[回归] {name}: {old:.6g} -> {new:.6g} ({new / old - 1:+.0%})")
+        print(f"[基线] 对比 {len(RESULTS)} 项指标，回归 {len(regressions)} 项（阈值 {args.threshold:.0%}）")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,118 @@
+# child_attribution.py
+"""
+子窗口归属：为一批新窗口找到它们所属的受管窗口。
+
+结果与逐个调用 win_api.is_son_window(target, new) 相同——按目标列表顺序，
+第一个满足以下任一条件的目标就是父窗口：
+- 新窗口的 Owner 就是该目标
+- 新窗口与该目标属于同一进程，且样式判定为子窗口 (win_api.is_son_style)
+
+区别在于每个新窗口的 Owner / PID 只采集一次（列式快照），样式只在需要时读取，
+再通过 owner -> 位置、pid -> 第一个目标两个索引定位父窗口，
+原生调用次数从 O(新窗口 × 目标) 降到 O(新窗口 + 目标)；一批新窗口只建一次索引，挂载后增量更新。
+"""
+import numpy as np
+
+import win_api
+from logger import logger
+from window_snapshot import WindowSnapshot, hwnd_array
+
+
+class ChildAttributor:
+    def __init__(self, api=win_api):
+        self._api = api
+        self._pids = {}  # 目标 hwnd -> pid（窗口的 pid 不会变，跨扫描复用）
+        self._snapshot = WindowSnapshot()
+
+    def scan(self, engine, new_windows):
+        """把 new_windows [(hwnd, title)] 中属于受管窗口的挂载到引擎，返回挂载数量"""
+        hwnds = engine.hwnds()
+        if not hwnds:
+            return 0
+
+        self._prune(hwnds)
+        positions, first_by_pid = self._build_index(hwnds)
+        # 挂载后紧贴在父窗口之前的窗口的位置（没有记录时为父窗口位置 - 1，即建索引时的前一个窗口）
+        before = {}
+        attached = 0
+
+        # 已受管的窗口不再检测，其余新窗口一次采集 Owner / PID
+        fresh = ~np.isin(hwnd_array(hwnd for hwnd, _ in new_windows), hwnd_array(hwnds))
+        new_windows = [window for window, f in zip(new_windows, fresh.tolist()) if f]
+        rows = self._snapshot.capture([hwnd for hwnd, _ in new_windows], fields=('owner', 'pid'))
+        owners, pids, valid = rows['owner'].tolist(), rows['pid'].tolist(), rows['valid'].tolist()
+
+        for i, (new_hwnd, new_title) in enumerate(new_windows):
+            # 窗口可能已关闭；同一批里重复出现的窗口第一次就已挂载
+            if not valid[i] or new_hwnd in engine:
+                continue
+
+            parent = self._resolve(new_hwnd, owners[i], pids[i], positions, first_by_pid)
+            if parent is None or not engine.insert_derived_window(new_hwnd, new_title, parent):
+                continue
+            attached += 1
+
+            # 刚挂载的工具窗口也可能是后面新窗口的所有者 / 同进程的第一个目标。
+            # 它在展开列表中紧贴在父窗口之前：取两者之间的位置增量更新索引，不重建；
+            # 同一处插入太多次、浮点位置分不开时才按引擎当前列表重建
+            high = positions[parent]
+            low = before.get(parent, high - 1)
+            position = (low + high) / 2
+            if low < position < high:
+                positions[new_hwnd] = position
+                before[new_hwnd] = low
+                before[parent] = position
+                first = first_by_pid.get(pids[i])
+                if first is None or position < first[0]:
+                    first_by_pid[pids[i]] = (position, new_hwnd)
+            else:
+                positions, first_by_pid = self._build_index(engine.hwnds())
+                before = {}
+
+        return attached
+
+    # === 内部 === #
+    def _resolve(self, hwnd, owner, pid, positions, first_by_pid):
+        """父窗口的 hwnd，不属于任何目标时返回 None"""
+        api = self._api
+        owner_pos = positions.get(owner)
+        self._pids[hwnd] = pid
+        first = first_by_pid.get(pid)
+
+        # 同进程的目标排在 Owner 目标之前时，才需要看样式
+        if first is not None and (owner_pos is None or first[0] < owner_pos):
+            try:
+                style, ex_style = api.get_window_styles(hwnd)
+            except Exception as e:
+                logger.error("[检测窗口] HWND: %s 获取窗口样式失败: %s", hwnd, e)
+                return owner if owner_pos is not None else None
+            if api.is_son_style(style, ex_style):
+                return first[1]
+
+        return owner if owner_pos is not None else None
+
+    def _build_index(self, hwnds):
+        """hwnd -> 位置、pid -> (第一个目标的位置, hwnd)"""
+        positions = {}
+        first_by_pid = {}
+        for i, hwnd in enumerate(hwnds):
+            positions[hwnd] = i
+            pid = self._pid_of(hwnd)
+            if pid is not None and pid not in first_by_pid:
+                first_by_pid[pid] = (i, hwnd)
+        return positions, first_by_pid
+
+    def _pid_of(self, hwnd):
+        pid = self._pids.get(hwnd)
+        if pid is None:
+            try:
+                pid = self._api.get_window_pid(hwnd)
+            except Exception:
+                return None
+            self._pids[hwnd] = pid
+        return pid
+
+    def _prune(self, hwnds):
+        """缓存只保留当前目标，已关闭窗口的 hwnd 可能被系统复用"""
+        alive = set(hwnds)
+        self._pids = {hwnd: pid for hwnd, pid in self._pids.items() if hwnd in alive}
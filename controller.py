@@ -0,0 +1,101 @@
+# controller.py
+"""
+界面 (main.WindowManager) 与守护进程 (daemon.Daemon) 共用的监控 / 重排流程：
+点击 / 按键监控 -> 触发合并 -> 重排线程，窗口清单和配置重新挂载。
+界面和守护进程只在外面接自己的部分（列表刷新、IPC 服务）。
+"""
+from PySide6.QtCore import QObject, Signal
+
+import window_health
+import echo_guard
+import tracing
+import logger as log_setup
+from auto_monitor import WindowWatcher
+from trigger_scheduler import TriggerScheduler
+from reorder_worker import ReorderWorker, ReorderCommand
+
+
+class ReorderController(QObject):
+    """
+    engine: WindowRankEngine，或客户端模式下的 ipc.RemoteEngine（这时不启动钩子、不加载配置）。
+    构造时只创建监控器、调度器和重排线程；窗口清单由 create_inventory() 创建，调用方接好自己的信号后再 start。
+    """
+
+    # 引擎变化通知 (EngineChange)；引擎可能在其他线程里被修改，经信号转回主线程
+    engine_changed = Signal(object)
+
+    def __init__(self, engine, use_hook_service=False, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.engine.subscribe(self.engine_changed.emit)
+
+        self.watcher = WindowWatcher(use_hook_service=use_hook_service)
+
+        # 重排请求合并：连续触发只执行一次，并限制执行频率
+        self.scheduler = TriggerScheduler(parent=self)
+        self.watcher.request_rearrange.connect(self.scheduler.request)
+        self.scheduler.fired.connect(self.scan_and_reorder)
+
+        # 重排线程：子窗口扫描和 SetWindowPos 不在主线程执行，结果经 worker.finished 以快照形式发回
+        self.worker = ReorderWorker(self.engine)
+
+        self.inventory = None
+        self.profiles = None
+
+    # === 窗口清单 / 配置 === #
+    def create_inventory(self, parent=None, profiles=True):
+        """创建窗口清单并接上受管窗口清理；profiles=True 时加载配置，窗口出现时按规则重新挂载"""
+        from window_inventory import WindowInventory
+
+        self.inventory = WindowInventory(parent or self)
+        self.inventory.window_destroyed.connect(self._on_window_destroyed)
+        self.inventory.resync_timer.timeout.connect(self.engine.clean_invalid_windows)
+
+        if profiles:
+            from profiles import ProfileManager
+            self.profiles = ProfileManager(self.engine).load()
+            self.inventory.window_added.connect(self.profiles.on_window)
+            self.inventory.tool_window_added.connect(self.profiles.on_window)
+            self.inventory.window_destroyed.connect(self.profiles.forget)
+        return self.inventory
+
+    def _on_window_destroyed(self, hwnd):
+        window_health.get_health().forget(hwnd)
+        if hwnd in self.engine:
+            self.engine.clean_invalid_windows()
+
+    # === 生命周期 === #
+    def stop(self):
+        if self.inventory is not None:
+            self.inventory.stop()
+        self.watcher.stop()
+        self.worker.stop()
+
+    # === 重排 === #
+    def submit_reorder(self, full=False, stacks=None):
+        """线程安全：submit 本身可以在任意线程调用"""
+        self.worker.submit(ReorderCommand(reorder=True, full=full, stacks=stacks))
+
+    def scan_and_reorder(self, hwnds=None):
+        """hwnds: 这次合并的触发窗口，只重排它们所在的栈；None 时重排全部栈"""
+        trace = tracing.get_tracer().take_queued()
+        if trace:
+            trace.stamp('delay')
+        # 新窗口在主线程取走，连同重排请求一起交给重排线程；失控退避中只扫描新窗口，不重排
+        stacks = None if hwnds is None else self.engine.stacks_of(hwnds)
+        reorder = echo_guard.get_guard().allow_reorder()
+        self.worker.submit(ReorderCommand(self.inventory.take_new_windows(), reorder=reorder, stacks=stacks,
+                                          trace=trace))
+
+    # === 统计 === #
+    def stats(self):
+        stats = {
+            "scheduler": self.scheduler.stats(),
+            "clicks": self.watcher.stats(),
+            "health": window_health.get_health().stats(),
+            "echo": echo_guard.get_guard().stats(),
+            "log": log_setup.stats(),
+        }
+        if self.profiles is not None:
+            stats["profiles"] = self.profiles.stats()
+        return stats
@@ -0,0 +1,117 @@
+# daemon.py
+"""
+无界面守护进程：只运行重排引擎、点击 / 按键监控、窗口清单和重排线程，不创建任何窗口部件，
+不加载 QtWidgets / qdarktheme。通过本地 JSON-RPC 接口 (ipc.py) 控制：
+
+    python daemon.py                       # 真实窗口系统（Windows）
+    python daemon.py --simulate 50         # 模拟桌面（Linux 上调试）
+    python ipc.py add '{"hwnd": 1234}'     # 命令行客户端
+    python main.py --connect               # 界面作为客户端连接
+"""
+import argparse
+import signal
+import sys
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer
+
+import ipc
+import win_api
+import tracing
+from logger import logger, setup_logger
+from rank_engine import WindowRankEngine
+from controller import ReorderController
+
+
+class Daemon(QObject):
+    """与 main.WindowManager 相同的监控 / 重排流程 (ReorderController)，受管窗口列表由 IPC 客户端维护"""
+
+    def __init__(self, address=None, use_hook_service=False, authkey=None):
+        super().__init__()
+        self.engine = WindowRankEngine()
+        self.controller = ReorderController(self.engine, use_hook_service=use_hook_service, parent=self)
+        self.controller.engine_changed.connect(self._on_engine_changed)
+        self.controller.worker.finished.connect(self._on_reordered)
+        self.inventory = self.controller.create_inventory(self)
+        self.watcher = self.controller.watcher
+        self.profiles = self.controller.profiles
+
+        self.api = ipc.ControlApi(self.engine, reorder=self.controller.submit_reorder, stats=self._stats,
+                                  profiles=self.profiles)
+        self.server = ipc.Server(self.api.handlers(), address, batch=self.engine.batch, authkey=authkey)
+
+    # === 生命周期 === #
+    def start(self):
+        self.watcher.start()
+        self.controller.worker.start()
+        self.inventory.start()
+        self.server.start()
+
+    def stop(self):
+        self.server.stop()
+        self.controller.stop()
+
+    # === 重排 / 引擎变化 === #
+    def _on_reordered(self, snapshot, trace):
+        if trace:
+            trace.stamp('deliver')
+        self.watcher.update_monitored_hwnds(snapshot.ranks)
+        if trace:
+            tracing.get_tracer().finish(trace)
+
+    def _on_engine_changed(self, change):
+        self.watcher.update_monitored_hwnds(self.engine.rank_snapshot())
+
+    # === 统计 === #
+    def _stats(self):
+        stats = self.controller.stats()
+        stats["ipc"] = self.server.stats()
+        return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="窗口重排器（无界面守护进程）")
+    parser.add_argument("--address", default=None,
+                        help=f"IPC 地址：命名管道或 Unix socket 路径（默认 {ipc.default_address()}）")
+    parser.add_argument("--simulate", type=int, metavar="N", default=0,
+                        help="使用内存模拟桌面（N 个窗口）代替真实窗口系统")
+    parser.add_argument("--sim-latency", type=float, metavar="SECONDS", default=0.0,
+                        help="模拟桌面每次调用的耗时（秒）")
+    parser.add_argument("--hook-service", action="store_true",
+                        help="鼠标 / 键盘钩子运行在独立进程，事件经共享内存传回")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="日志文件格式：text 或 json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.log_format != "text":
+        setup_logger(log_format=args.log_format)
+    if args.simulate:
+        from sim_backend import SimulatedDesktop
+        desktop = SimulatedDesktop(latency=args.sim_latency)
+        desktop.populate(args.simulate)
+        win_api.set_backend(desktop)
+
+    win_api.set_process_dpi_aware()
+
+    app = QCoreApplication(sys.argv[:1])
+    daemon = Daemon(address=args.address, use_hook_service=args.hook_service)
+    daemon.start()
+
+    # Ctrl+C / 终止信号：Qt 事件循环里 Python 信号处理只在解释器运行时执行，用定时器定期交还控制权
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    wake = QTimer()
+    wake.timeout.connect(lambda: None)
+    wake.start(200)
+
+    logger.info("[守护进程] 已启动")
+    code = app.exec()
+    daemon.stop()
+    logger.info("[守护进程] 已退出")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# echo_guard.py
+import threading
+import time
+from collections import deque
+
+from logger import logger
+
+_guard = None
+
+
+def get_guard():
+    """全局回声抑制器，重排线程（登记）和主线程 / 钩子线程（查询）共用"""
+    global _guard
+    if _guard is None:
+        _guard = EchoGuard()
+    return _guard
+
+
+class EchoGuard:
+    """
+    自身引起的事件抑制（回声消除），防止“重排 -> 窗口事件 -> 再次重排”的反馈循环。
+
+    回声：重排线程调用 SetWindowPos 之前用 expect() 登记要移动的窗口；
+    之后一小段时间（回声窗口）内这些窗口的前台事件被当作重排自己造成的（例如应用在
+    WM_WINDOWPOSCHANGED 里把自己激活），is_echo() 返回 True，由监控器丢弃，不当作用户切换窗口。
+    登记之后有真实输入（点击 / 按键，钩子线程调用 note_input；钩子进程的输入序号经 add_input_source 接入）时不再算回声。
+
+    回声窗口自适应：按实测的回声延迟做平滑估计（与 TCP 重传超时相同：平均值 + 4 倍平均偏差），
+    限制在 [MIN_WINDOW, MAX_WINDOW]。回声窗口之外、MAX_WINDOW 之内到达的事件不丢弃，但计入延迟估计，
+    回声变慢时窗口随之变长。
+
+    失控保护：触发的重排在 1 秒内超过 RUNAWAY_RATE 次、且两次之间都没有真实输入时，
+    判定为失控循环，暂停触发重排 BASE_BACKOFF 秒；再次失控时暂停时间翻倍（最长 MAX_BACKOFF 秒），
+    有真实输入驱动的重排之后恢复初始值。
+    """
+
+    INITIAL_WINDOW = 0.25
+    MIN_WINDOW = 0.05
+    MAX_WINDOW = 1.0
+    RUNAWAY_RATE = 5
+    BASE_BACKOFF = 0.5
+    MAX_BACKOFF = 8.0
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._expected = {}  # hwnd -> [登记时间, 登记时的输入计数, 是否已计入延迟估计]
+
+        # 回声延迟估计（秒），没有样本之前使用 INITIAL_WINDOW
+        self.window = self.INITIAL_WINDOW
+        self._srtt = None
+        self._rttvar = 0.0
+
+        # 真实输入计数：每个钩子线程只累加自己的计数器，读取时求和，不会丢失累加
+        self._local = threading.local()
+        self._counters = []
+        # 外部输入序号（钩子进程），移除时把最后的值并入 _retired，总数保持单调
+        self._sources = []
+        self._retired = 0
+
+        # 失控检测：上次触发重排时的输入计数、没有真实输入的触发重排时间
+        self._last_reorder_inputs = -1
+        self._unprompted = deque()
+        self._backoff = 0.0
+        self._backoff_until = 0.0
+
+        # 计数器
+        self.expected = 0
+        self.dropped = 0
+        self.late = 0
+        self.runaways = 0
+        self.suppressed = 0
+
+    # === 重排线程 === #
+    def expect(self, hwnds):
+        """即将对这些窗口调用 SetWindowPos"""
+        now = self._clock()
+        with self._lock:
+            expired = [hwnd for hwnd, entry in self._expected.items() if now - entry[0] > self.MAX_WINDOW]
+            for hwnd in expired:
+                del self._expected[hwnd]
+            inputs = self.inputs
+            for hwnd in hwnds:
+                self._expected[hwnd] = [now, inputs, False]
+                self.expected += 1
+
+    # === 事件 === #
+    def is_echo(self, hwnd):
+        """这个窗口的事件是否是最近一次重排造成的（是则计数，由调用方丢弃）"""
+        entry = self._expected.get(hwnd)
+        if entry is None:
+            return False
+        issued, inputs, sampled = entry
+        if self.inputs != inputs:
+            return False
+
+        delay = self._clock() - issued
+        if delay > self.MAX_WINDOW:
+            return False
+        with self._lock:
+            if not sampled:
+                entry[2] = True
+                self._sample(delay)
+            if delay <= self.window:
+                self.dropped += 1
+                return True
+            self.late += 1
+            return False
+
+    def note_input(self):
+        """收到一次真实的鼠标 / 键盘输入（任意线程）"""
+        counter = getattr(self._local, 'counter', None)
+        if counter is None:
+            counter = self._local.counter = [0]
+            with self._lock:
+                self._counters.append(counter)
+        counter[0] += 1
+
+    def add_input_source(self, source):
+        """source() 返回单调递增的外部输入序号（例如钩子进程写在事件环头部的 inputs）"""
+        with self._lock:
+            self._sources.append(source)
+
+    def remove_input_source(self, source):
+        with self._lock:
+            self._sources.remove(source)
+            self._retired += source()
+
+    @property
+    def inputs(self):
+        """真实输入总数：只用于比较是否变化"""
+        return sum(counter[0] for counter in self._counters) + sum(source() for source in self._sources) + self._retired
+
+    # === 失控保护 === #
+    def allow_reorder(self):
+        """调度器触发的重排执行前调用：返回 False 时跳过这次重排（失控退避中）"""
+        now = self._clock()
+        if now < self._backoff_until:
+            self.suppressed += 1
+            return False
+
+        if self.inputs != self._last_reorder_inputs:
+            # 有真实输入驱动：不是循环
+            self._unprompted.clear()
+            self._backoff = 0.0
+        else:
+            self._unprompted.append(now)
+            while self._unprompted and self._unprompted[0] <= now - 1.0:
+                self._unprompted.popleft()
+            if len(self._unprompted) > self.RUNAWAY_RATE:
+                self._backoff = min(self._backoff * 2, self.MAX_BACKOFF) if self._backoff else self.BASE_BACKOFF
+                self._backoff_until = now + self._backoff
+                self._unprompted.clear()
+                self.runaways += 1
+                self.suppressed += 1
+                logger.warning("[回声抑制] 1 秒内 %s 次没有输入的重排，暂停触发重排 %.1f 秒",
+                               self.RUNAWAY_RATE + 1, self._backoff)
+                return False
+
+        self._last_reorder_inputs = self.inputs
+        return True
+
+    @property
+    def backing_off(self):
+        return self._clock() < self._backoff_until
+
+    def stats(self):
+        """回声统计：登记的窗口数、丢弃的回声事件、超出回声窗口的迟到事件、当前回声窗口（毫秒）、失控次数、被跳过的重排"""
+        return {
+            "expected": self.expected,
+            "dropped": self.dropped,
+            "late": self.late,
+            "window_ms": self.window * 1000,
+            "runaways": self.runaways,
+            "suppressed": self.suppressed,
+            "backing_off": self.backing_off,
+        }
+
+    # === 内部（持锁调用） === #
+    def _sample(self, delay):
+        if self._srtt is None:
+            self._srtt = delay
+            self._rttvar = delay / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - delay)
+            self._srtt = 0.875 * self._srtt + 0.125 * delay
+        self.window = min(max(self._srtt + 4 * self._rttvar, self.MIN_WINDOW), self.MAX_WINDOW)
@@ -0,0 +1,236 @@
+# event_ring.py
+"""
+跨进程输入事件环形缓冲区：单生产者（钩子进程）/ 单消费者（主程序），
+基于 multiprocessing.shared_memory，不加锁。
+
+内存布局：
+    头部  head | tail | dropped | capacity | armed | inputs
+          | zones_seq | zone_count | dropped_outside | dropped_close   (10 × uint64)
+    矩形  left | top | right | bottom                 (每个 16 字节，共 MAX_ZONES 个)
+    记录  kind | x | y | reserved | timestamp_ns     (每条 24 字节，共 capacity 条)
+
+生产者先写记录再推进 head，消费者先读 head 再读记录、最后推进 tail；
+x86 / x64 的写入不会被重排，所以读到新的 head 时记录一定已经写完。
+头部各字段通过按 uint64 转换的 memoryview 整体读写（一次 8 字节拷贝）；
+struct 的 '<Q' 是逐字节写入的，另一方可能读到写了一半的 head / tail。
+inputs 是生产者看到的全部点击 / 按键的序号（包括没有写入事件环的），供主程序的回声抑制判断是否有真实输入。
+
+点击预过滤：消费者把受管窗口的矩形写进矩形表 (set_zones)，生产者写入点击前先用 accept_click 判断，
+与进程内钩子线程的 auto_monitor.ClickFilter 规则相同 (classify_click)，不可能点中受管窗口的点击不跨进程。
+矩形表用顺序锁保护：消费者写之前和写之后各把 zones_seq 加一（写入期间为奇数），
+生产者读到相同的偶数序号才采用读到的矩形，并按序号缓存。
+"""
+import multiprocessing
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+# 事件类型
+MOUSE_LEFT_UP = 1
+MOUSE_RIGHT_UP = 2
+KEY_COMMIT = 3
+
+_HEADER = struct.Struct('<QQQQQQQQQQ')
+_ZONE = struct.Struct('<iiii')
+_RECORD = struct.Struct('<IiiIq')
+
+# 矩形表容量；受管窗口更多时不做预过滤（全部转发）
+MAX_ZONES = 256
+_NO_FILTER = MAX_ZONES + 1
+_ZONES_OFFSET = _HEADER.size
+_RECORDS_OFFSET = _ZONES_OFFSET + MAX_ZONES * _ZONE.size
+
+# 点中受管窗口右上角这个范围内（关闭按钮）的点击不触发重排
+CLOSE_ZONE_WIDTH = 60
+CLOSE_ZONE_HEIGHT = 40
+
+# classify_click 的结果
+CLICK_HIT = 0
+CLICK_OUTSIDE = 1
+CLICK_CLOSE = 2
+
+# 头部字段在 uint64 视图中的下标
+_HEAD = 0
+_TAIL = 1
+_DROPPED = 2
+_CAPACITY = 3
+_ARMED = 4
+_INPUTS = 5
+_ZONES_SEQ = 6
+_ZONE_COUNT = 7
+_DROPPED_OUTSIDE = 8
+_DROPPED_CLOSE = 9
+
+
+def classify_click(zones, x, y):
+    """点击是否落在某个矩形内（且不在它右上角的关闭按钮区域）"""
+    on_close = False
+    for left, top, right, bottom in zones:
+        if left <= x < right and top <= y < bottom:
+            if y - top <= CLOSE_ZONE_HEIGHT and x > right - CLOSE_ZONE_WIDTH:
+                on_close = True
+                continue
+            return CLICK_HIT
+    return CLICK_CLOSE if on_close else CLICK_OUTSIDE
+
+
+class EventRing:
+    """
+    EventRing.create(capacity) 由消费者创建，生产者用 EventRing.attach(name) 连接。
+    capacity 必须是 2 的幂；缓冲区满时新事件被丢弃并计入 dropped。
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._buf = shm.buf
+        self._header = shm.buf[:_HEADER.size].cast('Q')
+        self._owner = owner
+        self.capacity = self._header[_CAPACITY]
+        self._mask = self.capacity - 1
+        # 生产者缓存的矩形表：(序号, 矩形元组或 None)
+        self._zones = (None, None)
+
+    @classmethod
+    def create(cls, capacity=4096):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("capacity 必须是 2 的幂")
+        shm = shared_memory.SharedMemory(create=True, size=_RECORDS_OFFSET + capacity * _RECORD.size)
+        # 消费者发布矩形之前不做预过滤
+        _HEADER.pack_into(shm.buf, 0, 0, 0, 0, capacity, 1, 0, 0, _NO_FILTER, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        if sys.platform != 'win32' and multiprocessing.parent_process() is None:
+            # 独立启动的连接方有自己的 resource_tracker，退出时会把共享内存删掉；连接方不负责回收。
+            # 由 multiprocessing 启动的子进程与创建方共用 tracker，不需要处理
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    # === 生产者 === #
+    def push(self, kind, x=0, y=0, timestamp_ns=None):
+        """写入一条事件，缓冲区满时返回 False"""
+        header = self._header
+        head = header[_HEAD]
+        if head - header[_TAIL] >= self.capacity:
+            header[_DROPPED] += 1
+            return False
+
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        _RECORD.pack_into(self._buf, _RECORDS_OFFSET + (head & self._mask) * _RECORD.size, kind, x, y, 0, timestamp_ns)
+        header[_HEAD] = head + 1
+        return True
+
+    def note_input(self):
+        """生产者看到一次真实输入（不写入事件）；读-改-写，多个生产者线程时与 push 一样需要调用方互斥"""
+        self._header[_INPUTS] += 1
+
+    def accept_click(self, x, y):
+        """点击是否需要写入（可能点中受管窗口）；丢弃的点击计数。与 push 一样需要调用方互斥"""
+        zones = self.zones()
+        if zones is None:
+            return True
+        result = classify_click(zones, x, y)
+        if result == CLICK_HIT:
+            return True
+        self._header[_DROPPED_CLOSE if result == CLICK_CLOSE else _DROPPED_OUTSIDE] += 1
+        return False
+
+    def zones(self):
+        """消费者发布的矩形（None 表示不过滤）；序号不变时直接用缓存"""
+        header = self._header
+        seq, zones = self._zones
+        current = header[_ZONES_SEQ]
+        if current == seq:
+            return zones
+        while True:
+            if current & 1:
+                # 消费者正在写
+                time.sleep(0)
+                current = header[_ZONES_SEQ]
+                continue
+            count = header[_ZONE_COUNT]
+            if count > MAX_ZONES:
+                zones = None
+            else:
+                unpack = _ZONE.unpack_from
+                zones = tuple(unpack(self._buf, _ZONES_OFFSET + i * _ZONE.size) for i in range(count))
+            again = header[_ZONES_SEQ]
+            if again == current:
+                self._zones = (current, zones)
+                return zones
+            current = again
+
+    @property
+    def full(self):
+        header = self._header
+        return header[_HEAD] - header[_TAIL] >= self.capacity
+
+    # === 消费者 === #
+    def pop_all(self):
+        """取出所有已写入的事件 [(kind, x, y, timestamp_ns)]"""
+        buf = self._buf
+        header = self._header
+        head = header[_HEAD]
+        tail = header[_TAIL]
+        if head == tail:
+            return []
+
+        events = []
+        unpack = _RECORD.unpack_from
+        for seq in range(tail, head):
+            kind, x, y, _, timestamp_ns = unpack(buf, _RECORDS_OFFSET + (seq & self._mask) * _RECORD.size)
+            events.append((kind, x, y, timestamp_ns))
+        header[_TAIL] = head
+        return events
+
+    def set_zones(self, zones):
+        """发布受管窗口的矩形 [(left, top, right, bottom)]；None 或超过 MAX_ZONES 个时生产者不过滤"""
+        header = self._header
+        header[_ZONES_SEQ] += 1
+        if zones is None or len(zones) > MAX_ZONES:
+            header[_ZONE_COUNT] = _NO_FILTER
+        else:
+            for i, zone in enumerate(zones):
+                _ZONE.pack_into(self._buf, _ZONES_OFFSET + i * _ZONE.size, *zone)
+            header[_ZONE_COUNT] = len(zones)
+        header[_ZONES_SEQ] += 1
+
+    # === 共享标志 === #
+    @property
+    def dropped(self):
+        return self._header[_DROPPED]
+
+    @property
+    def dropped_clicks(self):
+        """生产者预过滤丢弃的点击：(矩形外, 关闭按钮区域)"""
+        return self._header[_DROPPED_OUTSIDE], self._header[_DROPPED_CLOSE]
+
+    @property
+    def inputs(self):
+        return self._header[_INPUTS]
+
+    @property
+    def armed(self):
+        """消费者告诉生产者：按键事件是否需要发送（前台不是需要重排的受管窗口时为 False）"""
+        return self._header[_ARMED] != 0
+
+    @armed.setter
+    def armed(self, value):
+        self._header[_ARMED] = 1 if value else 0
+
+    def close(self):
+        # 共享内存关闭前必须先释放所有视图
+        self._header.release()
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
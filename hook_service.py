@@ -0,0 +1,121 @@
+# hook_service.py
+"""
+独立的输入钩子进程：只运行 pynput 鼠标 / 键盘钩子，把筛选后的事件写进共享内存环 (event_ring)。
+钩子回调不再和主程序的重排、图标加载、日志写入争抢 GIL，
+也不会因为回调超过 LowLevelHooksTimeout 被系统静默摘除。
+
+    python hook_service.py <ring_name>                       # 真实钩子（Windows）
+    python hook_service.py <ring_name> --fake N [INTERVAL]   # 假生产者：写入 N 条合成事件，用于在 Linux 上测试
+
+主程序用 subprocess 按 command() 启动它：子进程只导入本模块和 event_ring，不加载 PySide6、不配置日志文件。
+标准输入 / 输出是主程序持有的两个管道：
+- 每写入一条事件向标准输出写一个字节，唤醒主程序的读取线程，主程序不需要定时轮询事件环
+- 标准输入读到结尾（主程序关闭管道或退出）时钩子进程结束
+"""
+import os
+import sys
+import threading
+import time
+
+import event_ring
+
+# 打包后的程序没有单独的 Python 解释器：以这个参数重新启动自身，由入口 (main.py) 转到 main()
+SERVICE_FLAG = "--hook-service-child"
+
+# 与 auto_monitor._KeyboardWatcher 相同的“确认类”按键
+_COMMIT_CHARS = '123456789'
+
+
+def command(ring_name):
+    """启动钩子进程的命令行"""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, SERVICE_FLAG, ring_name]
+    return [sys.executable, os.path.abspath(__file__), ring_name]
+
+
+def run(ring_name):
+    """钩子进程入口：主程序退出后自动结束"""
+    from pynput import keyboard, mouse
+
+    ring = event_ring.EventRing.attach(ring_name)
+    # 鼠标和键盘监听各有一个线程，事件环只允许一个生产者：写入（包括输入序号）时互斥
+    lock = threading.Lock()
+
+    def on_click(x, y, button, pressed):
+        if pressed:
+            return
+        with lock:
+            # 任何点击 / 按键都计入输入序号，主程序据此判断前台变化是不是重排的回声
+            ring.note_input()
+            if button == mouse.Button.left:
+                kind = event_ring.MOUSE_LEFT_UP
+            elif button == mouse.Button.right:
+                kind = event_ring.MOUSE_RIGHT_UP
+            else:
+                return
+            # 不可能点中受管窗口的点击在这里丢掉，不跨进程、不唤醒主程序
+            if ring.accept_click(x, y):
+                _push(ring, kind, x, y)
+
+    def on_release(key):
+        with lock:
+            ring.note_input()
+            # 前台不是需要重排的受管窗口时，主程序会清掉 armed 标志
+            if not ring.armed:
+                return
+            if key == keyboard.Key.space or key == keyboard.Key.enter:
+                _push(ring, event_ring.KEY_COMMIT)
+            elif getattr(key, 'char', None) and key.char in _COMMIT_CHARS:
+                _push(ring, event_ring.KEY_COMMIT)
+
+    with mouse.Listener(on_click=on_click), keyboard.Listener(on_release=on_release):
+        _wait_for_parent()
+    ring.close()
+
+
+def run_fake(ring_name, count, interval_s=0.0):
+    """
+    假生产者：按 左键 / 右键 / 按键 轮流产生 count 条事件，点击与真实钩子一样先经过 accept_click。
+    interval_s=0 时尽快写入（缓冲区满时等待消费者），用于测吞吐；大于 0 时按固定间隔写入，用于测延迟。
+    """
+    ring = event_ring.EventRing.attach(ring_name)
+    kinds = (event_ring.MOUSE_LEFT_UP, event_ring.MOUSE_RIGHT_UP, event_ring.KEY_COMMIT)
+    next_time = time.perf_counter()
+
+    for i in range(count):
+        if interval_s:
+            next_time += interval_s
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+        kind, x, y = kinds[i % 3], i % 1920, i % 1080
+        if kind != event_ring.KEY_COMMIT and not ring.accept_click(x, y):
+            continue
+        while ring.full:
+            time.sleep(0)
+        _push(ring, kind, x, y)
+    ring.close()
+
+
+def _push(ring, kind, x=0, y=0):
+    """写入一条事件并唤醒主程序；主程序已经退出时管道写入失败，忽略"""
+    if ring.push(kind, x, y):
+        try:
+            os.write(1, b'\x01')
+        except OSError:
+            pass
+
+
+def _wait_for_parent():
+    # 主程序持有标准输入管道的写端，它关闭管道或退出后这里读到结尾
+    sys.stdin.buffer.read()
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[1] == '--fake':
+        run_fake(argv[0], int(argv[2]), float(argv[3]) if len(argv) >= 4 else 0.0)
+    else:
+        run(argv[0])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
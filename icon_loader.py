@@ -0,0 +1,191 @@
+# icon_loader.py
+import hashlib
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPixmap
+
+import win_api
+import window_health
+from logger import logger
+
+_loader = None
+
+
+def get_loader():
+    """全局图标加载器，首次调用时创建（必须在界面线程、QApplication 之后）"""
+    global _loader
+    if _loader is None:
+        _loader = IconLoader()
+    return _loader
+
+
+class _IconTask(QRunnable):
+    """线程池任务：读取一个窗口的图标"""
+
+    def __init__(self, loader, hwnd):
+        super().__init__()
+        self.loader = loader
+        self.hwnd = hwnd
+
+    def run(self):
+        self.loader._load(self.hwnd)
+
+
+class IconLoader(QObject):
+    """
+    异步图标加载：WM_GETICON 放到线程池里带超时发送，无响应的程序不会卡住界面。
+
+    - pixmap(hwnd) 立即返回：已加载的图标、没有图标时的空图，或加载中的占位图
+    - 加载完成后发出 icon_ready(hwnd)，由列表模型刷新对应行
+    - 缓存按 (进程路径, 图像内容哈希) 去重，同一程序的多个窗口共用一张图；
+      缓存条目数有上限，按最近使用淘汰 (LRU)
+    """
+
+    icon_ready = Signal(int)
+    # 线程池 -> 界面线程：hwnd, 缓存键, 缩放后的 QImage（没有图标时为 None）, 是否因无响应跳过
+    _loaded = Signal(int, object, object, bool)
+
+    MAX_ENTRIES = 256
+    TIMEOUT_MS = 200
+    THREADS = 2
+
+    def __init__(self, size=24, max_entries=MAX_ENTRIES, timeout_ms=TIMEOUT_MS, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.max_entries = max_entries
+        self.timeout_ms = timeout_ms
+
+        self._cache = OrderedDict()  # (路径, 哈希) -> QPixmap，最近使用的在末尾
+        self._keys = {}              # hwnd -> 缓存键；None 表示该窗口没有图标
+        self._pending = set()
+        self._empty = QPixmap()
+        self._placeholder = None
+
+        # 计数器
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.timeouts = 0
+        self.evictions = 0
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.THREADS)
+        self._loaded.connect(self._on_loaded)
+
+    # === 查询（界面线程） === #
+    def pixmap(self, hwnd):
+        if hwnd in self._keys:
+            key = self._keys[hwnd]
+            if key is None:
+                self.hits += 1
+                return self._empty
+
+            pixmap = self._cache.get(key)
+            if pixmap is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return pixmap
+
+            # 图已被淘汰，重新加载
+            del self._keys[hwnd]
+
+        # 隔离期内的无响应窗口先不加载；期满后下次绘制再取，加载前由 allow() 重新探测
+        if hwnd not in self._pending and not window_health.get_health().blocked(hwnd):
+            self.misses += 1
+            self._pending.add(hwnd)
+            self.pool.start(_IconTask(self, hwnd))
+        return self.placeholder()
+
+    def placeholder(self):
+        """加载中显示的灰色方块"""
+        if self._placeholder is None:
+            pixmap = QPixmap(self.size, self.size)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(128, 128, 128, 90))
+            painter.drawRoundedRect(2, 2, self.size - 4, self.size - 4, 4, 4)
+            painter.end()
+            self._placeholder = pixmap
+        return self._placeholder
+
+    def forget(self, hwnd):
+        """窗口已关闭：丢弃它的映射（共享的图留在 LRU 中，由淘汰机制回收）"""
+        self._keys.pop(hwnd, None)
+        self._pending.discard(hwnd)
+
+    def stats(self):
+        """缓存统计：命中 / 未命中 / 去重合并 / 超时 / 淘汰次数，当前图数和窗口数"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "deduplicated": self.deduplicated,
+            "timeouts": self.timeouts,
+            "evictions": self.evictions,
+            "entries": len(self._cache),
+            "windows": len(self._keys),
+        }
+
+    def shutdown(self, timeout_ms=1000):
+        self.pool.clear()
+        self.pool.waitForDone(timeout_ms)
+
+    # === 加载（线程池） === #
+    def _load(self, hwnd):
+        health = window_health.get_health()
+        if not health.allow(hwnd):
+            self._loaded.emit(hwnd, None, None, True)
+            return
+
+        try:
+            hicon = win_api.get_window_hicon(hwnd, timeout_ms=self.timeout_ms)
+            if not hicon:
+                self._loaded.emit(hwnd, None, None, False)
+                return
+
+            image = win_api.get_backend().icon_to_image(hicon)
+            if image.isNull():
+                self._loaded.emit(hwnd, None, None, False)
+                return
+
+            image = image.convertToFormat(QImage.Format_ARGB32).scaled(
+                self.size, self.size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+            )
+            digest = hashlib.blake2b(bytes(image.constBits()), digest_size=16).digest()
+            key = (win_api.get_process_image_path(hwnd), digest)
+            self._loaded.emit(hwnd, key, image, False)
+
+        except TimeoutError:
+            health.report_timeout(hwnd, self.timeout_ms / 1000)
+            self._loaded.emit(hwnd, None, None, True)
+        except Exception as e:
+            # 窗口可能在加载过程中被关闭
+            logger.debug("[图标] 加载失败 (HWND: %s): %s", hwnd, e)
+            self._loaded.emit(hwnd, None, None, False)
+
+    # === 结果入缓存（界面线程） === #
+    def _on_loaded(self, hwnd, key, image, timed_out):
+        if hwnd not in self._pending:
+            # 加载期间窗口已被 forget
+            return
+        self._pending.discard(hwnd)
+
+        if timed_out:
+            # 不记入缓存：窗口解除隔离后还会再加载
+            self.timeouts += 1
+        elif key is None:
+            self._keys[hwnd] = None
+        else:
+            if key in self._cache:
+                self.deduplicated += 1
+                self._cache.move_to_end(key)
+            else:
+                self._cache[key] = QPixmap.fromImage(image)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+            self._keys[hwnd] = key
+
+        self.icon_ready.emit(hwnd)
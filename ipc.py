@@ -0,0 +1,683 @@
+# ipc.py
+"""
+守护进程的本地控制接口：JSON-RPC 2.0，传输层是 multiprocessing.connection
+（Windows 上是命名管道，Linux 上是 Unix socket），每条消息一帧 UTF-8 JSON。
+
+    {"jsonrpc": "2.0", "method": "move", "params": {"hwnd": 1234, "direction": "up"}, "id": 1}
+
+请求也可以是数组（批量命令）：同一批命令在引擎的一次批处理中执行，界面和钩子只收到一次变化通知。
+没有 id 的请求是通知，不返回结果。
+
+方法 (ControlApi)：
+    add(hwnd, title=None, stack=None)   添加受管窗口，title 为空时读取窗口标题，stack 为空时加入默认栈
+    remove(hwnd)                  移除受管窗口（主窗口的工具窗口一起移除）
+    move(hwnd, direction)         与相邻的块交换，direction 为 up / down
+    move_to_stack(hwnd, stack)    把窗口所在的块移到另一个栈的末尾（栈不存在时新建）
+    add_stack(name)               新建一个空栈
+    reorder(full=False, stacks=None)    请求一次重排（交给重排线程，立即返回），stacks 为空时重排全部栈
+    list(since=None)              受管窗口列表和栈名称；since 等于当前版本时 targets 为 null
+    save_profile(name)            把当前受管窗口保存为命名配置 (profiles.py)
+    profiles()                    已保存的配置 {名称: {active, blocks}}
+    stats()                       引擎、调度器、点击、熔断、日志、IPC 统计
+
+命令行客户端：
+    python ipc.py list
+    python ipc.py move '{"hwnd": 1234, "direction": "up"}'
+
+访问控制：默认地址在当前用户的运行时目录下（$XDG_RUNTIME_DIR，没有时是临时目录下只有本用户可访问的子目录），
+socket 文件权限 0600；连接用每个用户一个的随机密钥认证（同一目录下的 authkey 文件，权限 0600），
+守护进程、界面客户端和命令行客户端默认都读取它。
+"""
+import json
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client as _connect, Listener
+
+import win_api
+from logger import logger
+from rank_engine import EngineChange, EngineSnapshot, TargetSnapshot
+
+# JSON-RPC 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# 应用错误：窗口不存在
+INVALID_WINDOW = -32001
+
+
+AUTHKEY_SIZE = 32
+
+
+def runtime_dir():
+    """当前用户专用的运行时目录（socket 和密钥文件所在），不存在时创建"""
+    if sys.platform == 'win32':
+        path = os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'window_stack')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base and os.path.isdir(base):
+        path = os.path.join(base, 'window_stack')
+    else:
+        path = os.path.join(tempfile.gettempdir(), f'window_stack-{os.getuid()}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # 共享的临时目录里可能被别人抢先建了同名目录：只接受自己的、别人无权访问的目录
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} 不是当前用户专用的目录")
+    return path
+
+
+def default_address():
+    """Windows 上是按用户区分的命名管道，其他平台是用户运行时目录下的 Unix socket"""
+    if sys.platform == 'win32':
+        return r'\\.\pipe\window_stack-' + os.environ.get('USERNAME', 'user')
+    return os.path.join(runtime_dir(), 'window_stack.sock')
+
+
+def default_authkey():
+    """当前用户的连接密钥：第一次调用时随机生成，保存在运行时目录下只有本用户可读的文件里"""
+    path = os.path.join(runtime_dir(), 'authkey')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(AUTHKEY_SIZE))
+
+    # 另一个进程刚创建、还没写完时稍等
+    for _ in range(50):
+        with open(path, 'rb') as f:
+            key = f.read()
+        if len(key) == AUTHKEY_SIZE:
+            return key
+        time.sleep(0.01)
+    raise PermissionError(f"密钥文件 {path} 已损坏，删除后重新启动守护进程")
+
+
+class RpcError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    def to_json(self):
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
+
+# === 服务端 === #
+class Server:
+    """
+    handlers: {方法名: 可调用对象}，params 为对象时按关键字参数、为数组时按位置参数调用。
+    batch: 返回上下文管理器的可调用对象，批量请求在其中执行（例如 WindowRankEngine.batch）。
+    authkey: 连接密钥，默认为当前用户的 default_authkey()。
+    每个客户端连接一个线程；处理函数需要自己保证线程安全（引擎本身加锁）。
+    """
+
+    def __init__(self, handlers, address=None, batch=None, authkey=None):
+        self.handlers = dict(handlers)
+        self.address = address or default_address()
+        self.authkey = authkey or default_authkey()
+        self._batch = batch
+        self._listener = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._connections = set()
+
+        # 计数器
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    # === 生命周期 === #
+    def start(self):
+        self._remove_stale_socket()
+        self._listener = Listener(self.address, authkey=self.authkey)
+        if sys.platform != 'win32':
+            os.chmod(self.address, 0o600)
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, name="IpcServer", daemon=True)
+        self._thread.start()
+        logger.info("[IPC] 监听 %s", self.address)
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        # accept() 阻塞时关闭监听不一定能唤醒它，连一次自己
+        try:
+            _connect(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError):
+            pass
+        self._thread.join(2)
+        self._listener.close()
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            clients = len(self._connections)
+        return {"clients": clients, "requests": self.requests, "batches": self.batches, "errors": self.errors}
+
+    def _remove_stale_socket(self):
+        """上次异常退出留下的 socket 文件：是自己的 socket、且没有进程在监听时才删除"""
+        if sys.platform == 'win32':
+            return
+        try:
+            info = os.lstat(self.address)
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(info.st_mode) or info.st_uid != os.getuid():
+            raise OSError(f"{self.address} 不是当前用户的 socket，不会删除")
+        try:
+            _connect(self.address, authkey=self.authkey).close()
+        except ConnectionRefusedError:
+            os.unlink(self.address)
+            return
+        except AuthenticationError:
+            # 有进程在监听，但不是用同一个密钥的守护进程
+            pass
+        except (OSError, EOFError):
+            return
+        raise OSError(f"{self.address} 已被另一个守护进程占用")
+
+    # === 连接 === #
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                # 认证失败或连接中途断开
+                if self._running:
+                    logger.warning("[IPC] 接受连接失败: %s", e)
+                continue
+            if not self._running:
+                conn.close()
+                break
+            with self._lock:
+                self._connections.add(conn)
+            threading.Thread(target=self._serve, args=(conn,), name="IpcClient", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                try:
+                    data = conn.recv_bytes()
+                except (OSError, EOFError):
+                    break
+                response = self.handle_message(data)
+                if response is not None:
+                    conn.send_bytes(response)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    # === 协议 === #
+    def handle_message(self, data):
+        """处理一帧请求，返回响应帧（bytes）；全部是通知时返回 None"""
+        try:
+            message = json.loads(data)
+        except ValueError as e:
+            self.errors += 1
+            return _encode(_error_response(None, RpcError(PARSE_ERROR, f"无法解析 JSON: {e}")))
+
+        if isinstance(message, list):
+            if not message:
+                self.errors += 1
+                return _encode(_error_response(None, RpcError(INVALID_REQUEST, "空的批量请求")))
+            self.batches += 1
+            if self._batch is None:
+                responses = [self._handle_one(request) for request in message]
+            else:
+                with self._batch():
+                    responses = [self._handle_one(request) for request in message]
+            responses = [response for response in responses if response is not None]
+            return _encode(responses) if responses else None
+
+        response = self._handle_one(message)
+        return None if response is None else _encode(response)
+
+    def _handle_one(self, request):
+        self.requests += 1
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" \
+                or not isinstance(request.get("method"), str):
+            self.errors += 1
+            return _error_response(None, RpcError(INVALID_REQUEST, "不是有效的 JSON-RPC 2.0 请求"))
+
+        request_id = request.get("id")
+        is_notification = "id" not in request
+        try:
+            result = self._dispatch(request["method"], request.get("params"))
+        except RpcError as e:
+            self.errors += 1
+            return None if is_notification else _error_response(request_id, e)
+        except Exception as e:
+            self.errors += 1
+            logger.error("[IPC] %s 执行失败: %s", request["method"], e)
+            return None if is_notification else _error_response(request_id, RpcError(INTERNAL_ERROR, str(e)))
+
+        if is_notification:
+            return None
+        return {"jsonrpc": "2.0", "result": result, "id": request_id}
+
+    def _dispatch(self, method, params):
+        handler = self.handlers.get(method)
+        if handler is None:
+            raise RpcError(METHOD_NOT_FOUND, f"未知方法: {method}")
+        try:
+            if params is None:
+                return handler()
+            if isinstance(params, dict):
+                return handler(**params)
+            if isinstance(params, list):
+                return handler(*params)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e))
+        raise RpcError(INVALID_PARAMS, "params 必须是对象或数组")
+
+
+def _error_response(request_id, error):
+    return {"jsonrpc": "2.0", "error": error.to_json(), "id": request_id}
+
+
+def _encode(message):
+    return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+
+# === 客户端 === #
+class Client:
+    """
+    同步客户端；一个连接同一时间只有一个请求在途，多个线程共用时按调用顺序排队。
+    authkey 默认为当前用户的 default_authkey()（与守护进程相同）。连接断开时抛出 ConnectionError。
+    """
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or default_address()
+        self._conn = _connect(self.address, authkey=authkey or default_authkey())
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, method, params=None):
+        """调用一个方法并返回结果；服务端返回错误时抛出 RpcError"""
+        response = self._request(self._make_request(method, params))
+        return _unwrap(response)
+
+    def notify(self, method, params=None):
+        request = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            request["params"] = params
+        with self._lock:
+            self._send(request)
+
+    def batch(self, calls):
+        """
+        批量调用 [(方法, params), ...]，在服务端的一次批处理中执行。
+        按顺序返回结果；失败的调用在对应位置是 RpcError 对象（不抛出），其他调用照常生效。
+        """
+        requests = [self._make_request(method, params) for method, params in calls]
+        if not requests:
+            return []
+        responses = self._request(requests)
+        if isinstance(responses, dict):
+            # 整批被拒绝（例如无法解析）
+            _unwrap(responses)
+        by_id = {response.get("id"): response for response in responses}
+        results = []
+        for request in requests:
+            try:
+                results.append(_unwrap(by_id[request["id"]]))
+            except RpcError as e:
+                results.append(e)
+        return results
+
+    def _make_request(self, method, params):
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+        request = {"jsonrpc": "2.0", "method": method, "id": request_id}
+        if params is not None:
+            request["params"] = params
+        return request
+
+    def _request(self, message):
+        with self._lock:
+            self._send(message)
+            try:
+                return json.loads(self._conn.recv_bytes())
+            except (OSError, EOFError) as e:
+                raise ConnectionError(f"与守护进程的连接已断开: {e}") from e
+
+    def _send(self, message):
+        try:
+            self._conn.send_bytes(_encode(message))
+        except (OSError, EOFError) as e:
+            raise ConnectionError(f"与守护进程的连接已断开: {e}") from e
+
+
+def _unwrap(response):
+    if "error" in response:
+        error = response["error"]
+        raise RpcError(error.get("code"), error.get("message"), error.get("data"))
+    return response.get("result")
+
+
+# === 控制接口 === #
+class ControlApi:
+    """
+    守护进程暴露的方法，不依赖 Qt：引擎可以是跑在模拟桌面上的 WindowRankEngine。
+    reorder: reorder(full, stacks) 请求一次重排（守护进程里是提交给重排线程）
+    stats: 返回额外统计的可调用对象 {名称: dict}
+    profiles: profiles.ProfileManager，没有时配置相关的方法返回错误
+    """
+
+    def __init__(self, engine, reorder=None, stats=None, profiles=None):
+        self.engine = engine
+        self._reorder = reorder
+        self._stats = stats
+        self._profiles = profiles
+        # 每次引擎变化加一，客户端据此判断列表是否需要重新拉取
+        self.version = 0
+        engine.subscribe(self._on_engine_changed)
+
+    def handlers(self):
+        return {
+            "add": self.add,
+            "remove": self.remove,
+            "move": self.move,
+            "move_to_stack": self.move_to_stack,
+            "add_stack": self.add_stack,
+            "reorder": self.reorder,
+            "list": self.list,
+            "stats": self.stats,
+            "save_profile": self.save_profile,
+            "profiles": self.profiles,
+        }
+
+    def _on_engine_changed(self, change):
+        self.version += 1
+
+    # === 方法 === #
+    def add(self, hwnd, title=None, stack=None):
+        hwnd = _hwnd(hwnd)
+        if stack is not None:
+            stack = _stack_name(stack)
+        if not win_api.is_window(hwnd):
+            raise RpcError(INVALID_WINDOW, f"窗口不存在: {hwnd}")
+        if title is None:
+            title = win_api.get_backend().get_window_text(hwnd)
+        added = self.engine.add_window(TargetSnapshot(hwnd, title, None, 'STANDARD', False), stack=stack)
+        if added:
+            logger.info("[IPC] 添加窗口：句柄=%s, 标题=%s, 栈=%s", hwnd, title, self.engine.stack_of(hwnd))
+        return added
+
+    def remove(self, hwnd):
+        record = self.engine.get(_hwnd(hwnd))
+        if record is None:
+            return False
+        self.engine.remove_window(record)
+        logger.info("[IPC] 移除管理窗口：句柄=%s, 标题=%s", record.hwnd, record.title)
+        return True
+
+    def move(self, hwnd, direction):
+        if direction not in ('up', 'down'):
+            raise RpcError(INVALID_PARAMS, f"direction 必须是 up 或 down: {direction!r}")
+        record = self.engine.get(_hwnd(hwnd))
+        if record is None:
+            raise RpcError(INVALID_WINDOW, f"不是受管窗口: {hwnd}")
+        return self.engine.move_item(record, direction)
+
+    def move_to_stack(self, hwnd, stack):
+        stack = _stack_name(stack)
+        record = self.engine.get(_hwnd(hwnd))
+        if record is None:
+            raise RpcError(INVALID_WINDOW, f"不是受管窗口: {hwnd}")
+        return self.engine.move_to_stack(record, stack)
+
+    def add_stack(self, name):
+        return self.engine.add_stack(_stack_name(name))
+
+    def reorder(self, full=False, stacks=None):
+        if stacks is not None:
+            if not isinstance(stacks, list):
+                raise RpcError(INVALID_PARAMS, f"stacks 必须是栈名称数组: {stacks!r}")
+            stacks = {_stack_name(name) for name in stacks}
+        if self._reorder is None:
+            return self.engine.execute_reorder(full=bool(full), stacks=stacks)
+        self._reorder(bool(full), stacks)
+        return True
+
+    def list(self, since=None):
+        version = self.version
+        if since is not None and since == version:
+            return {"version": version, "targets": None}
+        snapshot = self.engine.snapshot()
+        return {"version": version, "targets": [target._asdict() for target in snapshot.targets],
+                "stacks": list(snapshot.stacks)}
+
+    def stats(self):
+        snapshot = self.engine.snapshot()
+        stats = {
+            "version": self.version,
+            "targets": len(snapshot.targets),
+            "managed": len({(target.stack, target.rank) for target in snapshot.targets}),
+            "stacks": len(snapshot.stacks),
+            "reorder": self.engine.reorder_stats(),
+        }
+        if self._stats is not None:
+            stats.update(self._stats())
+        return stats
+
+
+    def save_profile(self, name):
+        if not isinstance(name, str) or not name.strip():
+            raise RpcError(INVALID_PARAMS, "name 必须是非空字符串")
+        profile = self._require_profiles().save_current(name.strip())
+        return len(profile.blocks)
+
+    def profiles(self):
+        return {name: {"active": profile.active, "blocks": len(profile.blocks)}
+                for name, profile in self._require_profiles().store.profiles.items()}
+
+    def _require_profiles(self):
+        if self._profiles is None:
+            raise RpcError(METHOD_NOT_FOUND, "守护进程没有启用配置")
+        return self._profiles
+
+
+def _hwnd(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RpcError(INVALID_PARAMS, f"hwnd 必须是整数: {value!r}")
+    return value
+
+
+def _stack_name(value):
+    if not isinstance(value, str) or not value.strip():
+        raise RpcError(INVALID_PARAMS, f"栈名称必须是非空字符串: {value!r}")
+    return value.strip()
+
+
+# === 界面客户端 === #
+class RemoteEngine:
+    """
+    界面的客户端模式：提供界面用到的 WindowRankEngine 接口，操作转发给守护进程。
+    守护进程自己监控点击、清理已关闭的窗口；列表由 start_polling() 启动的拉取线程定时拉取
+    （修改之后立即拉取一次），查询只读缓存的快照，界面线程上只有修改本身的一次往返。
+    变化通知在拉取线程里调用。连接断开时记录错误，查询返回最后一次拿到的列表，修改返回 False。
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._version = None
+        self._snapshot = EngineSnapshot((), {}, ())
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._poller = None
+
+    # === 查询 === #
+    def __contains__(self, hwnd):
+        return hwnd in self._snapshot.ranks
+
+    def snapshot(self):
+        """最后一次拉取到的列表（不访问守护进程）"""
+        return self._snapshot
+
+    # === 拉取线程 === #
+    def start_polling(self, interval):
+        """每 interval 秒拉取一次；修改或 request_poll() 之后立即拉取"""
+        self._stopped.clear()
+        self._poller = threading.Thread(target=self._poll_loop, args=(interval,), name="RemoteEnginePoller",
+                                        daemon=True)
+        self._poller.start()
+
+    def stop_polling(self):
+        if self._poller is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._poller.join()
+        self._poller = None
+
+    def request_poll(self):
+        self._wake.set()
+
+    def _poll_loop(self, interval):
+        while not self._stopped.is_set():
+            self.poll()
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def poll(self):
+        """拉取守护进程的列表，有变化时通知订阅者"""
+        try:
+            result = self._client.call("list", {"since": self._version})
+        except (ConnectionError, RpcError) as e:
+            logger.error("[IPC] 拉取受管窗口失败: %s", e)
+            return
+        if result["targets"] is None:
+            return
+
+        targets = tuple(TargetSnapshot(**target) for target in result["targets"])
+        new = EngineSnapshot(targets, {target.hwnd: target.rank for target in targets}, tuple(result["stacks"]))
+        with self._lock:
+            old, self._snapshot = self._snapshot, new
+            self._version = result["version"]
+
+        added = tuple(hwnd for hwnd in new.ranks if hwnd not in old.ranks)
+        removed = tuple(hwnd for hwnd in old.ranks if hwnd not in new.ranks)
+        kept_old = [(target.hwnd, target.stack) for target in old.targets if target.hwnd in new.ranks]
+        kept_new = [(target.hwnd, target.stack) for target in new.targets if target.hwnd in old.ranks]
+        reordered = kept_old != kept_new or old.stacks != new.stacks
+        change = EngineChange(added, removed, reordered)
+        if change.added or change.removed or change.reordered:
+            for listener in list(self._listeners):
+                listener(change)
+
+    # === 变化通知 === #
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def stack_names(self):
+        return self._snapshot.stacks
+
+    # === 修改 === #
+    def add_window(self, item_data, stack=None):
+        params = {"hwnd": item_data.hwnd, "title": item_data.title}
+        if stack is not None:
+            params["stack"] = stack
+        return self._mutate("add", params)
+
+    def remove_window(self, item_data):
+        return self._mutate("remove", {"hwnd": item_data.hwnd})
+
+    def move_item(self, item_data, direction):
+        return self._mutate("move", {"hwnd": item_data.hwnd, "direction": direction})
+
+    def move_to_stack(self, item_data, name):
+        return self._mutate("move_to_stack", {"hwnd": item_data.hwnd, "stack": name})
+
+    def add_stack(self, name):
+        return self._mutate("add_stack", {"name": name})
+
+    def execute_reorder(self, full=False, stacks=None):
+        params = {"full": full}
+        if stacks is not None:
+            params["stacks"] = sorted(stacks)
+        return self._mutate("reorder", params)
+
+    def clean_invalid_windows(self):
+        # 守护进程自己清理已关闭的窗口，这里只让拉取线程同步列表
+        self.request_poll()
+        return False
+
+    def _mutate(self, method, params):
+        try:
+            result = self._client.call(method, params)
+        except (ConnectionError, RpcError) as e:
+            logger.error("[IPC] %s 失败: %s", method, e)
+            return False
+        self.request_poll()
+        return result
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="窗口重排守护进程的命令行客户端")
+    parser.add_argument("method", help="add / remove / move / move_to_stack / add_stack / reorder / list / stats")
+    parser.add_argument("params", nargs="?", help="JSON 格式的参数（对象或数组）")
+    parser.add_argument("--address", default=None, help=f"守护进程地址（默认 {default_address()}）")
+    args = parser.parse_args(argv)
+
+    params = json.loads(args.params) if args.params else None
+    try:
+        with Client(args.address) as client:
+            result = client.call(args.method, params)
+    except RpcError as e:
+        print(f"错误 {e.code}: {e.message}", file=sys.stderr)
+        return 1
+    except (ConnectionError, OSError, AuthenticationError) as e:
+        print(f"无法连接守护进程: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,44 +1,204 @@
+import atexit
+import json
 import logging
-from pathlib import Path
+import queue
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+# 日志格式：时间 | 级别 | 模块 | 消息
+LOG_FORMAT = "%(asctime)s | %(levelname)s | %(module)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 同一条日志模板（同一 logger、级别、未格式化的 msg）每 RATE_WINDOW 秒最多写 RATE_LIMIT 条
+RATE_LIMIT = 20
+RATE_WINDOW = 10.0
+
+_handler = None
+_listener = None
+
+
+# === 限流 === #
+class RateLimiter:
+    """
+    按日志模板限流：超出的记录直接丢弃，只计数；
+    该模板下一次放行时（或程序退出时）补一条汇总，说明省略了多少条。
+    只有 %-style 的日志模板相同，f-string 日志每条都不同，不会被归为一类。
+    """
+
+    def __init__(self, limit=RATE_LIMIT, window=RATE_WINDOW, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [窗口开始时间, 窗口内条数, 累计省略条数]
+        self.suppressed = 0
+
+    def check(self, record):
+        """返回 None 表示丢弃；否则返回此前省略的条数（需要补汇总）"""
+        key = (record.name, record.levelno, record.msg)
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = [now, 1, 0]
+                return 0
+            if now - bucket[0] >= self.window:
+                bucket[0] = now
+                bucket[1] = 0
+            if bucket[1] >= self.limit:
+                bucket[2] += 1
+                self.suppressed += 1
+                return None
+            bucket[1] += 1
+            pending, bucket[2] = bucket[2], 0
+            return pending
+
+    def drain(self):
+        """取出所有尚未汇总的省略计数 [(key, 条数)]"""
+        with self._lock:
+            pending = [(key, bucket[2]) for key, bucket in self._buckets.items() if bucket[2]]
+            for bucket in self._buckets.values():
+                bucket[2] = 0
+        return pending
+
+
+def _summary_record(name, levelno, msg, count):
+    return logging.makeLogRecord({
+        "name": name, "levelno": levelno, "levelname": logging.getLevelName(levelno),
+        "module": "logger", "msg": "[日志限流] 省略了 %d 条同类日志: %s", "args": (count, msg),
+    })
+
+
+class _QueueHandler(QueueHandler):
+    """
+    调用线程只做限流判断和入队；消息格式化和文件写入都在 QueueListener 的后台线程进行。
+    因此日志参数应是不会再被修改的值（hwnd、标题、数字等）。
+    """
+
+    def __init__(self, log_queue, limiter):
+        super().__init__(log_queue)
+        self.limiter = limiter
+
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        pending = self.limiter.check(record)
+        if pending is None:
+            return
+        if pending:
+            self.enqueue(_summary_record(record.name, record.levelno, record.msg, pending))
+        self.enqueue(record)
+
+    def flush_summaries(self):
+        for (name, levelno, msg), count in self.limiter.drain():
+            self.enqueue(_summary_record(name, levelno, msg, count))
+
 
-def setup_logger():
-    """初始化日志配置：输出到控制台和文件"""
-    # 创建日志目录
+# === 输出格式 === #
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志一行 JSON：便于 grep / jq 处理，也比文本格式更紧凑"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "module": record.module,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _log_dir():
     if getattr(sys, 'frozen', False):
         base_dir = Path(sys.executable).parent
     else:
         # 如果是脚本运行
         base_dir = Path(__file__).parent
-        
-    log_dir = base_dir / 'logs'
-    # === 修改结束 ===
-
-    log_dir.mkdir(exist_ok=True)
+    return base_dir / 'logs'
 
-    # 日志格式：时间 | 级别 | 模块 | 消息
-    log_format = "%(asctime)s | %(levelname)s | %(module)s | %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
 
-    # 全局日志设置
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+def create_handlers(log_dir=None, log_format="text", console_stream=None):
+    """
+    控制台 + 文件（按大小滚动，保留 7 个备份）。
+    log_format="json" 时文件改为 JSON Lines (window_list.jsonl)，控制台仍是文本。
+    """
+    log_dir = Path(log_dir) if log_dir else _log_dir()
+    log_dir.mkdir(exist_ok=True)
+    text = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
 
     # 1. 控制台Handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
-    logger.addHandler(console_handler)
+    console_handler = logging.StreamHandler(console_stream)
+    console_handler.setFormatter(text)
 
-    # 2. 文件Handler（按天滚动，保留7天）
-    from logging.handlers import RotatingFileHandler
+    # 2. 文件Handler
+    if log_format == "json":
+        filename, formatter = "window_list.jsonl", JsonLinesFormatter()
+    else:
+        filename, formatter = "window_list.log", text
     file_handler = RotatingFileHandler(
-        log_dir / "window_list.log",
+        log_dir / filename,
         maxBytes=10 * 1024 * 1024,  # 10MB/文件
         backupCount=7,  # 保留7个备份
         encoding="utf-8"
     )
-    file_handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(formatter)
+    return [console_handler, file_handler]
+
+
+def setup_logger(log_format="text", log_dir=None, console_stream=None, rate_limit=RATE_LIMIT):
+    """
+    初始化日志配置：根 logger 只挂一个入队的 QueueHandler，
+    控制台和文件由后台 QueueListener 线程写入。重复调用会替换之前的配置（例如切换到 JSON Lines）。
+    rate_limit=None 时不限流。
+    """
+    global _handler, _listener
+    shutdown()
+
+    log_queue = queue.SimpleQueue()
+    handlers = create_handlers(log_dir, log_format, console_stream)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    _handler = _QueueHandler(log_queue, RateLimiter(float("inf") if rate_limit is None else rate_limit))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(_handler)
+    return _handler
+
+
+def shutdown():
+    """补写限流汇总，等待后台线程把队列中的日志写完"""
+    global _handler, _listener
+    if _handler is not None:
+        _handler.flush_summaries()
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def flush(timeout=1.0):
+    """等待后台线程取完队列中的日志（用于测试和基准）"""
+    deadline = time.monotonic() + timeout
+    while _listener is not None and not _listener.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def stats():
+    """限流统计：被省略的日志条数"""
+    return {"suppressed": _handler.limiter.suppressed if _handler else 0}
+
 
 setup_logger()
-logger = logging.getLogger(__name__)
\ No newline at end of file
+atexit.register(shutdown)
+logger = logging.getLogger(__name__)
@@ -1,53 +1,116 @@
 # main.py
 import sys
-import qdarktheme
-import win32gui
+
+# 打包后的程序以自身作为钩子进程 (hook_service.command)：只导入钩子模块，不加载界面和日志
+if __name__ == "__main__" and sys.argv[1:2] == ["--hook-service-child"]:
+    import hook_service
+    sys.exit(hook_service.main(sys.argv[2:]))
+
+import startup_profile
+# 导入耗时要从其他模块导入之前开始统计
+if __name__ == "__main__" and "--startup-profile" in sys.argv:
+    startup_profile.get_profile().enable()
+
+import argparse
 
 import win_api
 import ui_widgets
-from logger import logger
+import icon_loader
+import tracing
+from logger import logger, setup_logger
 from PySide6.QtCore import QSize, QTimer
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                               QListWidget, QPushButton, QLabel, QListWidgetItem,
-                               QApplication)
+                               QListView, QPushButton, QLabel, QApplication, QInputDialog)
 
 from rank_engine import WindowRankEngine
-from auto_monitor import WindowWatcher
+from window_records import WindowRecord
+from controller import ReorderController
 
 
 class WindowManager(QMainWindow):
-    def __init__(self):
+    """
+    启动分两步：构造函数只建界面、引擎和重排线程，窗口先显示出来；
+    start_deferred() 在首帧之后依次加载主题、启动窗口清单（首次全量枚举）、安装输入钩子，
+    阶段之间回到事件循环，界面保持可以响应。主题、NumPy、pynput 都在各自的阶段里才导入。
+    """
+    # 客户端模式下拉取守护进程列表的间隔（拉取线程里执行，修改之后立即拉取一次）
+    REMOTE_POLL_MS = 500
+
+    def __init__(self, use_hook_service=False, remote=None):
+        """remote: ipc.Client 时作为守护进程的客户端运行，钩子、重排和受管窗口列表都在守护进程里"""
         super().__init__()
         self.setWindowTitle("窗口重排器")
         self.resize(800, 500)
 
         # 初始化界面
         self._init_ui()
-
-        # 鼠标监控
-        self.watcher = WindowWatcher()
-        self.watcher.start()
+        self.diagnostics = None
+        # 排序层级里折叠起来的栈
+        self._collapsed = set()
+
+        # 数据管理：每次引擎操作结束后统一刷新一次右侧列表
+        self.remote = remote
+        if remote is None:
+            self.engine = WindowRankEngine()
+        else:
+            import ipc
+            self.engine = ipc.RemoteEngine(remote)
+            # 其他客户端或守护进程自己造成的变化（例如清理已关闭的窗口）由拉取线程同步，界面线程只读缓存
+            self.engine.start_polling(self.REMOTE_POLL_MS / 1000)
+            self.update_status(f"已连接守护进程：{remote.address}", "color: gray; font-size: 10px;")
+
+        # 监控 / 触发合并 / 重排线程与守护进程共用；钩子在启动阶段 hooks 安装（客户端模式下由守护进程监控）
+        self.controller = ReorderController(self.engine, use_hook_service=use_hook_service, parent=self)
+        self.watcher = self.controller.watcher
+        self.scheduler = self.controller.scheduler
+        self.worker = self.controller.worker
+        self.controller.engine_changed.connect(self._on_engine_changed)
+        self.worker.finished.connect(self.refresh_target_ui)
+        self.worker.start()
 
         # 连接操作信号
         self._init_connections()
 
-        # 数据管理
-        self.engine = WindowRankEngine()
-
-        # 第一次加载数据
-        self.refresh_window_list()
-
-        # 定时刷新左侧列表
-        self.refresh_timer = QTimer(self)
-        self.refresh_timer.setInterval(1000)
-        self.refresh_timer.timeout.connect(self.refresh_window_list)
-        self.refresh_timer.start()
-
-        # 定时刷新左侧列表
-        self.maintenance_timer = QTimer(self)
-        self.maintenance_timer.setInterval(1000)
-        self.maintenance_timer.timeout.connect(self.auto_clean_targets)
-        self.maintenance_timer.start()
+        # 窗口清单和配置重新挂载在启动阶段 inventory 创建（客户端模式下配置由守护进程负责）
+        self.inventory = None
+        self.profiles = None
+        self._stages = []
+
+    # === 分阶段启动 === #
+    def start_deferred(self):
+        """首帧显示之后调用：各阶段之间回到事件循环，先处理重绘和用户输入"""
+        self._stages = [("theme", self._load_theme), ("inventory", self._start_inventory)]
+        if self.remote is None:
+            self._stages.append(("hooks", self.watcher.start))
+        QTimer.singleShot(0, self._run_next_stage)
+
+    def _run_next_stage(self):
+        profile = startup_profile.get_profile()
+        name, stage = self._stages.pop(0)
+        with profile.phase(name):
+            stage()
+        if self._stages:
+            QTimer.singleShot(0, self._run_next_stage)
+        else:
+            logger.info("启动完成")
+            profile.report()
+
+    def _load_theme(self):
+        import qdarktheme
+        qdarktheme.setup_theme("auto")
+
+    def _start_inventory(self):
+        """窗口清单：由窗口事件增量维护左侧列表和受管窗口，定时全量同步只作兜底"""
+        # 已保存的配置：窗口出现时（包括下面的首次枚举）按规则重新挂载
+        self.inventory = self.controller.create_inventory(self, profiles=self.remote is None)
+        self.profiles = self.controller.profiles
+        self.inventory.ignore(int(self.winId()))
+        self.inventory.window_added.connect(self._on_window_added)
+        self.inventory.window_removed.connect(self._on_window_removed)
+        self.inventory.window_title_changed.connect(self._on_window_title_changed)
+
+        # 第一次加载数据（图标由列表绘制时按需异步加载）
+        self.inventory.start()
 
     # === 初始化界面 === #
     def _init_ui(self):
@@ -57,22 +120,30 @@ class WindowManager(QMainWindow):
 
         # 左侧加载列表
         left_layout = QVBoxLayout()
-        self.source_list_widget = QListWidget()  # 重命名
-        self.source_list_widget.setIconSize(QSize(24, 24))
+        self.source_model = ui_widgets.WindowListModel(self)
+        self.source_list_view = QListView()
+        self.source_list_view.setModel(self.source_model)
+        self.source_list_view.setItemDelegate(ui_widgets.WindowItemDelegate(show_rank=False, parent=self))
+        self.source_list_view.setUniformItemSizes(True)
+        self.source_list_view.setIconSize(QSize(24, 24))
         self.btn_refresh = QPushButton("刷新列表")
 
         left_layout.addWidget(QLabel("当前活动窗口"))
-        left_layout.addWidget(self.source_list_widget)
+        left_layout.addWidget(self.source_list_view)
         left_layout.addWidget(self.btn_refresh)
 
         # 右侧重排列表
         right_layout = QVBoxLayout()
-        self.target_list_widget = QListWidget()
-        self.target_list_widget.setIconSize(QSize(24, 24))
-        # self.target_list_widget.setDragEnabled(True)
-        # self.target_list_widget.setAcceptDrops(True)
-        # self.target_list_widget.setDragDropMode(QAbstractItemView.InternalMove)
-        # self.target_list_widget.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.target_model = ui_widgets.WindowListModel(self)
+        self.target_list_view = QListView()
+        self.target_list_view.setModel(self.target_model)
+        self.target_list_view.setItemDelegate(ui_widgets.WindowItemDelegate(show_rank=True, parent=self))
+        self.target_list_view.setUniformItemSizes(True)
+        self.target_list_view.setIconSize(QSize(24, 24))
+        # self.target_list_view.setDragEnabled(True)
+        # self.target_list_view.setAcceptDrops(True)
+        # self.target_list_view.setDragDropMode(QAbstractItemView.InternalMove)
+        # self.target_list_view.setSelectionMode(QAbstractItemView.SingleSelection)
 
         sort_btn_layout = QHBoxLayout()
         self.btn_up = QPushButton("▲ 上移")
@@ -80,14 +151,26 @@ class WindowManager(QMainWindow):
         sort_btn_layout.addWidget(self.btn_up)
         sort_btn_layout.addWidget(self.btn_down)
 
+        # 分组：每个栈单独排序，点击只重排所在的栈
+        stack_btn_layout = QHBoxLayout()
+        self.btn_new_stack = QPushButton("新建分组")
+        self.btn_move_stack = QPushButton("移到分组…")
+        stack_btn_layout.addWidget(self.btn_new_stack)
+        stack_btn_layout.addWidget(self.btn_move_stack)
+
         self.btn_apply = QPushButton("立即执行重排")
+        self.btn_save_profile = QPushButton("保存为配置")
+        self.btn_diagnostics = QPushButton("延迟诊断")
         self.status_label = QLabel("就绪")
         self.status_label.setStyleSheet("color: gray; font-size: 10px;")
 
         right_layout.addWidget(QLabel("排序层级"))
-        right_layout.addWidget(self.target_list_widget)
+        right_layout.addWidget(self.target_list_view)
         right_layout.addLayout(sort_btn_layout)
+        right_layout.addLayout(stack_btn_layout)
         right_layout.addWidget(self.btn_apply)
+        right_layout.addWidget(self.btn_save_profile)
+        right_layout.addWidget(self.btn_diagnostics)
         right_layout.addWidget(self.status_label)
 
         main_layout.addLayout(left_layout, stretch=1)
@@ -96,197 +179,204 @@ class WindowManager(QMainWindow):
     # === 绑定信号 === #
     def _init_connections(self):
         # 双击
-        self.source_list_widget.itemDoubleClicked.connect(self.add_target)
-        self.target_list_widget.itemDoubleClicked.connect(self.remove_target)
+        self.source_list_view.doubleClicked.connect(self.add_target)
+        self.target_list_view.doubleClicked.connect(self.remove_target)
         # 移动按钮
         self.btn_up.clicked.connect(self.move_item_up)
         self.btn_down.clicked.connect(self.move_item_down)
+        # 分组
+        self.btn_new_stack.clicked.connect(self.new_stack)
+        self.btn_move_stack.clicked.connect(self.move_to_stack)
         # 重排
         self.btn_refresh.clicked.connect(self.refresh_window_list)
-        self.btn_apply.clicked.connect(self.execute_reorder)
+        self.btn_apply.clicked.connect(lambda: self.execute_reorder(full=True))
+        self.btn_save_profile.clicked.connect(self.save_profile)
+        self.btn_diagnostics.clicked.connect(self.show_diagnostics)
 
         # 鼠标监控重排
-        self.watcher.request_rearrange.connect(self._scan_and_reorder_delay)
+        self.scheduler.fired.connect(self._update_stats_tooltip)
         self.watcher.status_changed.connect(self.update_status)
 
     # === 刷新源窗口列表 === #
     def refresh_window_list(self):
-        current_windows = win_api.get_all_windows()
-
-        current_hwnds = {hwnd for hwnd, title in current_windows if int(self.winId()) != hwnd}
-
-        for i in range(self.source_list_widget.count() - 1, -1, -1):
-            item = self.source_list_widget.item(i)
-            widget = self.source_list_widget.itemWidget(item)
-            if widget.item_data.hwnd not in current_hwnds:
-                self.source_list_widget.takeItem(i)
-
-                win_api.clear_icon_cache(widget.item_data.hwnd)
-
-                hwnd = widget.item_data.hwnd
-                title = widget.item_data.title
-
-                logger.info(f"[列表同步] 移除已关闭窗口: [{title}] (HWND: {hwnd})")
-
-        existing_hwnds = set()
-        for i in range(self.source_list_widget.count()):
-            item = self.source_list_widget.item(i)
-            widget = self.source_list_widget.itemWidget(item)
-            existing_hwnds.add(widget.item_data.hwnd)
-
-        # logger.debug("=== 开始刷新窗口列表 ===")
-        # self.source_list_widget.clear()
-        # windows = win_api.get_all_windows()
-        # logger.info(f"成功获取到 {len(windows)} 个窗口")
-        for hwnd, title in current_windows:
-            if hwnd == int(self.winId()): continue
-
-            if hwnd not in existing_hwnds:
-                logger.info(f"[列表同步] 发现新窗口: [{title}] (HWND: {hwnd})")
-                item_data = ui_widgets.ItemData(hwnd=hwnd, title=title)
-
-                list_item = QListWidgetItem()
-                widget = ui_widgets.SourceItemWidget(item_data=item_data)
+        """手动全量同步一次（平时由窗口事件增量更新）"""
+        if self.inventory is None:
+            return
+        self.inventory.resync()
+        self.auto_clean_targets()
 
-                list_item.setSizeHint(widget.sizeHint())
+    def _on_window_added(self, hwnd, title):
+        self.source_model.append_item(WindowRecord(hwnd=hwnd, title=title))
 
-                self.source_list_widget.addItem(list_item)
-                self.source_list_widget.setItemWidget(list_item, widget)
+    def _on_window_removed(self, hwnd):
+        if self.source_model.remove_hwnd(hwnd) is not None and hwnd not in self.engine:
+            icon_loader.get_loader().forget(hwnd)
 
-                logger.debug(f"成功添加窗口：句柄={hwnd}, 标题={title}")
+    def _on_window_title_changed(self, hwnd, title):
+        self.source_model.replace_item(WindowRecord(hwnd=hwnd, title=title))
 
     # === 增加、移除管理窗口 === #
-    def add_target(self, item):
-
-        widget = self.source_list_widget.itemWidget(item)
-        item_data = widget.item_data
-        if self.engine.add_window(item_data=item_data):
-            logger.info(f"成功添加窗口：句柄={item_data.hwnd}, 标题={item_data.title}")
+    def add_target(self, index):
+        """加入右侧选中行所在的分组，没有选中时加入默认分组"""
+        item_data = index.data(ui_widgets.ITEM_ROLE)
+        current = self.target_list_view.currentIndex()
+        stack = current.data(ui_widgets.ITEM_ROLE).stack if current.isValid() else None
+        if self.engine.add_window(item_data=item_data, stack=stack):
+            logger.info("成功添加窗口：句柄=%s, 标题=%s", item_data.hwnd, item_data.title)
+
+    def remove_target(self, index):
+        item_data = index.data(ui_widgets.ITEM_ROLE)
+        # 双击分组标题：折叠 / 展开
+        if isinstance(item_data, ui_widgets.StackHeader):
+            if item_data.stack in self._collapsed:
+                self._collapsed.discard(item_data.stack)
+            else:
+                self._collapsed.add(item_data.stack)
             self.refresh_target_ui()
-
-    def remove_target(self, item):
-        widget = self.target_list_widget.itemWidget(item)
-        item_data = widget.item_data
+            return
         if self.engine.remove_window(item_data=item_data):
-            logger.info(f"成功移除管理窗口：句柄={item_data.hwnd}, 标题={item_data.title}")
-            self.refresh_target_ui()
+            logger.info("成功移除管理窗口：句柄=%s, 标题=%s", item_data.hwnd, item_data.title)
+
+    def _selected_target(self):
+        """右侧选中的受管窗口；没有选中或选中的是分组标题时返回 None"""
+        index = self.target_list_view.currentIndex()
+        if not index.isValid():
+            return None
+        item_data = index.data(ui_widgets.ITEM_ROLE)
+        return None if isinstance(item_data, ui_widgets.StackHeader) else item_data
+
+    def _update_stats_tooltip(self):
+        """每次触发重排（控制器已提交给重排线程）之后刷新状态栏提示中的统计"""
+        common = self.controller.stats()
+        stats, health, clicks, echo = common["scheduler"], common["health"], common["clicks"], common["echo"]
+        icons = icon_loader.get_loader().stats()
+        reorder = self.engine.reorder_stats()
+        self.status_label.setToolTip(
+            f"重排请求 {stats['received']} 次 | 实际执行 {stats['executed']} 次 | 合并 {stats['coalesced']} 次\n"
+            f"图标缓存 命中 {icons['hits']} | 未命中 {icons['misses']} | 去重 {icons['deduplicated']} | "
+            f"超时 {icons['timeouts']} | {icons['entries']} 张图 / {icons['windows']} 个窗口\n"
+            f"无响应熔断 隔离中 {health['quarantined']} | 跳过调用 {health['skipped']} 次 | "
+            f"估计节省 {health['saved_seconds']:.1f} 秒\n"
+            f"点击 {clicks['seen']} 次 | 转发 {clicks['forwarded']} 次 | "
+            f"预过滤丢弃 {clicks['dropped_outside'] + clicks['dropped_close']} 次 | "
+            f"窗口事件 收到 {clicks['win_events']} / 使用 {clicks['win_events_used']} 次"
+            f"（{clicks['hooked_processes']} 个进程）\n"
+            f"重排 {reorder['reorders']} 次 | 平均每次触及 {reorder['touched_avg']:.1f} 个窗口、"
+            f"移动 {reorder['moved_avg']:.1f} 个 | 上次 {reorder['last_touched']} / {reorder['last_moved']}\n"
+            f"回声抑制 丢弃 {echo['dropped']} 次 | 迟到 {echo['late']} 次 | 窗口 {echo['window_ms']:.0f} ms | "
+            f"失控 {echo['runaways']} 次 | 跳过重排 {echo['suppressed']} 次"
+        )
 
-    def _scan_and_reorder_delay(self):
-        QTimer.singleShot(10, self._scan_and_reorder)
-
-    def _scan_and_reorder(self):
-        self._scan_for_child_windows()
-        self.execute_reorder()
-
-    def _scan_for_child_windows(self):
-        current_windows = win_api.get_all_windows(filter=False)
-        current_hwnds_set = {hwnd for hwnd, title in current_windows}
-
-        if hasattr(self, "known_hwnds"):
-            new_hwnds = current_hwnds_set - self.known_hwnds
-        else:
-            new_hwnds = current_hwnds_set
+    # === 上移、下移管理窗口 === #
+    def move_item_up(self):
+        self._move_selected('up')
 
-        self.known_hwnds = current_hwnds_set
+    def move_item_down(self):
+        self._move_selected('down')
 
-        if not new_hwnds:
+    def _move_selected(self, direction):
+        item_data = self._selected_target()
+        if item_data is None:  # 无选中项直接返回
             return
 
-        targets = self.engine.targets
-        if not targets:
+        if self.engine.move_item(item_data=item_data, direction=direction):
+            action = "上移" if direction == 'up' else "下移"
+            # 行移动由模型差异完成（engine_changed -> refresh_target_ui），选中状态会跟着这一行走
+            logger.info("成功%s管理窗口：句柄=%s, 标题=%s", action, item_data.hwnd, item_data.title)
+
+    # === 分组 === #
+    def new_stack(self):
+        """新建一个空分组并选中它，之后双击左侧窗口即加入这个分组"""
+        name, ok = QInputDialog.getText(self, "新建分组", "分组名称：")
+        name = name.strip()
+        if not ok or not name:
             return
-
-        # 封装函数检测
-        for new_hwnd, new_title in current_windows:
-            if new_hwnd not in new_hwnds:
-                continue
-
-            for target in targets:
-                if win_api.is_son_window(target.hwnd, new_hwnd):
-                    self.engine.insert_derived_window(new_hwnd, new_title, target.hwnd)
-                    break
-
-        # 普通pid检测
-        # managed_pids = {}
-        # for target in targets:
-        #     pid = win_api.get_window_pid(target.hwnd)
-        #     if pid:
-        #         managed_pids[pid] = target.hwnd
-
-        # for hwnd, title in current_windows:
-        #     if hwnd in new_hwnds:
-        #         new_pid = win_api.get_window_pid(hwnd)
-        #
-        #         if new_pid in managed_pids:
-        #             parent_hwnd = managed_pids[new_pid]
-        #             self.engine.insert_derived_window(hwnd, title, parent_hwnd)
-
-        # self.execute_reorder()
-
-    # === 上移、下移管理窗口 === #
-    def move_item_up(self):
-        selected_item = self.target_list_widget.selectedItems()
-        if not selected_item:  # 无选中项直接返回
+        if self.engine.add_stack(name):
+            logger.info("新建分组：%s", name)
+        self._collapsed.discard(name)
+        self.refresh_target_ui()
+        row = self.target_model.row_of(('stack', name))
+        if row >= 0:
+            self.target_list_view.setCurrentIndex(self.target_model.index(row))
+
+    def move_to_stack(self):
+        """把选中的窗口（连同它的工具窗口）移到另一个分组，可以直接输入新分组的名称"""
+        item_data = self._selected_target()
+        if item_data is None:
             return
-
-        current_row = self.target_list_widget.row(selected_item[0])
-
-        widget = self.target_list_widget.itemWidget(selected_item[0])
-        item_data = widget.item_data
-        if self.engine.move_item(item_data=item_data, direction='up'):
-            logger.info(f"成功上移管理窗口：句柄={item_data.hwnd}, 标题={item_data.title}")
-            self.refresh_target_ui()
-
-            new_row = max(current_row - 1, 0)
-            self.target_list_widget.setCurrentRow(new_row)
-
-    def move_item_down(self):
-        selected_item = self.target_list_widget.selectedItems()
-        if not selected_item:  # 无选中项直接返回
+        names = [name for name in self.engine.snapshot().stacks if name != item_data.stack]
+        name, ok = QInputDialog.getItem(self, "移到分组", "分组：", names, 0, True)
+        name = name.strip()
+        if not ok or not name:
             return
-
-        current_row = self.target_list_widget.row(selected_item[0])
-
-        widget = self.target_list_widget.itemWidget(selected_item[0])
-        item_data = widget.item_data
-        if self.engine.move_item(item_data=item_data, direction='down'):
-            logger.info(f"成功下移管理窗口：句柄={item_data.hwnd}, 标题={item_data.title}")
-            self.refresh_target_ui()
-
-            new_row = min(current_row + 1, self.target_list_widget.count() - 1)
-            self.target_list_widget.setCurrentRow(new_row)
+        if self.engine.move_to_stack(item_data, name):
+            logger.info("移到分组 %s：句柄=%s, 标题=%s", name, item_data.hwnd, item_data.title)
 
     # === 管理窗口界面 === #
     def auto_clean_targets(self):
-        if self.engine.clean_invalid_windows():
-            self.refresh_target_ui()
-
-    def refresh_target_ui(self):
-        self.target_list_widget.clear()
-
-        self.watcher.update_monitored_hwnds(self.engine.targets)
-
-        item_data_list = self.engine.targets
-        for item_data in item_data_list:
+        self.engine.clean_invalid_windows()
 
-            if int(self.winId()) == item_data.hwnd:
-                continue
-
-            if item_data.window_type == 'TOOL':
-                continue
-
-            list_item = QListWidgetItem()
-            widget = ui_widgets.TargetItemWidget(item_data=item_data)
-
-            list_item.setSizeHint(widget.sizeHint())
+    def _on_engine_changed(self, change):
+        self.refresh_target_ui()
 
-            self.target_list_widget.addItem(list_item)
-            self.target_list_widget.setItemWidget(list_item, widget)
+    def refresh_target_ui(self, snapshot=None, trace=None):
+        """按引擎快照刷新右侧列表；重排线程完成后会带着快照和追踪记录调用"""
+        if trace:
+            trace.stamp('deliver')
+        if snapshot is None:
+            snapshot = self.engine.snapshot()
+
+        self.watcher.update_monitored_hwnds(snapshot.ranks)
+
+        # 每个栈一行标题，折叠的栈只显示标题
+        own_hwnd = int(self.winId())
+        groups = {name: [] for name in snapshot.stacks}
+        for item_data in snapshot.targets:
+            if item_data.hwnd != own_hwnd and item_data.window_type != 'TOOL':
+                groups[item_data.stack].append(item_data)
+        rows = []
+        for name, windows in groups.items():
+            collapsed = name in self._collapsed
+            rows.append(ui_widgets.stack_header(name, len(windows), collapsed))
+            if not collapsed:
+                rows.extend(windows)
+        self.target_model.set_items(rows)
+
+        if trace:
+            trace.stamp('refresh')
+            tracing.get_tracer().finish(trace)
 
     # === 执行重排 === #
-    def execute_reorder(self):
-        self.engine.execute_reorder()
-        self.refresh_target_ui()
+    def execute_reorder(self, full=False):
+        self.controller.submit_reorder(full=full)
+
+    # === 配置 === #
+    def save_profile(self):
+        """把当前的排序层级保存为命名配置，之后窗口重新打开时自动挂载"""
+        name, ok = QInputDialog.getText(self, "保存为配置", "配置名称：", text="默认")
+        name = name.strip()
+        if not ok or not name:
+            return
+        if self.remote is not None:
+            import ipc
+            try:
+                self.remote.call("save_profile", {"name": name})
+            except (ConnectionError, ipc.RpcError) as e:
+                logger.error("保存配置失败：%s", e)
+                self.update_status(f"保存配置失败：{e}", "color: red;")
+                return
+        elif self.profiles is not None:
+            self.profiles.save_current(name)
+        else:
+            return
+        self.update_status(f"已保存配置：{name}", "color: gray; font-size: 10px;")
+
+    # === 延迟诊断 === #
+    def show_diagnostics(self):
+        if self.diagnostics is None:
+            self.diagnostics = ui_widgets.TraceDiagnosticsDialog(parent=self)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
 
     # === 状态栏 === #
     def update_status(self, text, style):
@@ -295,20 +385,66 @@ class WindowManager(QMainWindow):
 
     # === 窗口关闭事件 === #
     def closeEvent(self, event):
-        self.watcher.stop()
+        self.controller.stop()
+        if self.remote is not None:
+            self.engine.stop_polling()
+        icon_loader.get_loader().shutdown()
         super().closeEvent(event)
 
 
-if __name__ == "__main__":
-    try:
-        win32gui.SetProcessDPIAware()
-    except AttributeError:
-        pass
+def parse_args():
+    parser = argparse.ArgumentParser(description="窗口重排器")
+    parser.add_argument("--simulate", type=int, metavar="N", default=0,
+                        help="使用内存模拟桌面（N 个窗口）代替真实窗口系统，用于调试和性能分析")
+    parser.add_argument("--sim-latency", type=float, metavar="SECONDS", default=0.0,
+                        help="模拟桌面每次调用的耗时（秒）")
+    parser.add_argument("--hook-service", action="store_true",
+                        help="鼠标 / 键盘钩子运行在独立进程，事件经共享内存传回")
+    parser.add_argument("--trace", action="store_true",
+                        help="启动时即开启触发延迟追踪（也可以在延迟诊断面板中开关）")
+    parser.add_argument("--connect", nargs="?", const="", default=None, metavar="ADDRESS",
+                        help="作为客户端连接已运行的守护进程 (daemon.py)，不在本进程监控和重排；不填地址时用默认地址")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="启动完成后输出各启动阶段和模块导入的耗时")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="日志文件格式：text 或 json（每行一条 JSON，写入 logs/window_list.jsonl）")
+    args, _ = parser.parse_known_args()
+    return args
 
-    app = QApplication(sys.argv)
-    qdarktheme.setup_theme("auto")
 
-    window = WindowManager()
-    window.show()
+if __name__ == "__main__":
+    profile = startup_profile.get_profile()
+    profile.mark("顶层导入完成")
+    args = parse_args()
+
+    with profile.phase("setup"):
+        if args.log_format != "text":
+            setup_logger(log_format=args.log_format)
+        if args.simulate:
+            from sim_backend import SimulatedDesktop
+            desktop = SimulatedDesktop(latency=args.sim_latency)
+            desktop.populate(args.simulate)
+            win_api.set_backend(desktop)
+
+        win_api.set_process_dpi_aware()
+        tracing.get_tracer().enabled = args.trace
+
+    with profile.phase("qapp"):
+        app = QApplication(sys.argv)
+
+    with profile.phase("window"):
+        remote = None
+        if args.connect is not None:
+            import ipc
+            remote = ipc.Client(args.connect or None)
+        window = WindowManager(use_hook_service=args.hook_service, remote=remote)
+        window.show()
+
+    def on_first_frame():
+        profile.mark("首帧")
+        window.start_deferred()
+
+    # 显示事件处理完之后才会执行零延时定时器
+    QTimer.singleShot(0, on_first_frame)
 
     sys.exit(app.exec())
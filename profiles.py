@@ -0,0 +1,486 @@
+# profiles.py
+"""
+持久化的窗口栈配置 (profile)：按匹配规则而不是 hwnd 保存受管窗口，
+重启本程序或重新打开应用后，窗口出现时自动按保存的顺序重新挂载。
+
+配置文件 profiles.json（与 logs/ 同目录）：
+    {
+      "version": 1,
+      "profiles": {
+        "写作": {"active": true, "blocks": [
+          {"main": {"exe": "winword.exe", "class": "OpusApp", "title": "报告"},
+           "tools": [{"exe": "winword.exe", "class": "NUIDialog"}]},
+          {"main": {"exe": "acrord32.exe"}},
+          {"main": {"exe": "wechat.exe"}, "stack": "聊天"}
+        ]}
+      }
+    }
+
+规则字段都可以省略：
+    exe    可执行文件名，不区分大小写
+    class  窗口类名，精确匹配
+    title  标题正则，re.search 语义
+blocks 的顺序就是 Z 序（从上到下），tools 是挂在该块主窗口上的工具窗口；
+stack 是块所在的栈（分组），省略时为默认栈。
+
+匹配索引 (MatcherIndex)：exe / class 用精确映射分桶，标题用正则中字面量的 3-gram 倒排表，
+每个新窗口的匹配开销与规则总数无关。
+"""
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python 3.10
+    import sre_parse
+
+import win_api
+from logger import logger
+from rank_engine import DEFAULT_STACK
+
+FORMAT_VERSION = 1
+# 通配：规则没有指定 exe / class
+ANY = None
+
+
+def default_path():
+    if getattr(sys, 'frozen', False):
+        base_dir = Path(sys.executable).parent
+    else:
+        base_dir = Path(__file__).parent
+    return base_dir / 'profiles.json'
+
+
+def exe_name(path):
+    """进程路径 -> 小写的可执行文件名（规则里的 exe 格式）"""
+    return path.replace('\\', '/').rsplit('/', 1)[-1].lower()
+
+
+# === 规则与配置 === #
+class Rule:
+    """
+    一条匹配规则。order 是所有启用配置中的优先级（越小越优先），由 MatcherIndex 分配；
+    block 是所在块的下标，tool 为 None 表示块的主窗口，否则为工具窗口下标；
+    stack 只对主窗口规则有意义：块所在的栈，None 为默认栈。
+    """
+    __slots__ = ('exe', 'class_name', 'title', 'profile', 'block', 'tool', 'stack', 'order', 'pattern')
+
+    def __init__(self, exe=None, class_name=None, title=None, profile=None, block=0, tool=None, stack=None):
+        self.exe = exe.lower() if exe else None
+        self.class_name = class_name or None
+        self.title = title or None
+        self.profile = profile
+        self.block = block
+        self.tool = tool
+        self.stack = stack or None
+        self.order = 0
+        self.pattern = re.compile(title) if title else None
+
+    @classmethod
+    def from_json(cls, data, profile, block, tool=None, stack=None):
+        return cls(data.get("exe"), data.get("class"), data.get("title"), profile, block, tool, stack)
+
+    def to_json(self):
+        data = {}
+        if self.exe:
+            data["exe"] = self.exe
+        if self.class_name:
+            data["class"] = self.class_name
+        if self.title:
+            data["title"] = self.title
+        return data
+
+    @property
+    def key(self):
+        return (self.profile, self.block, self.tool)
+
+    def matches(self, exe, class_name, title):
+        return (self.exe in (ANY, exe) and self.class_name in (ANY, class_name)
+                and (self.pattern is None or self.pattern.search(title) is not None))
+
+    def __repr__(self):
+        return f"Rule({self.profile}#{self.block}{'' if self.tool is None else f'.{self.tool}'} {self.to_json()})"
+
+
+class Profile:
+    """一个命名的窗口栈：blocks = [(主窗口规则, [工具窗口规则])]"""
+
+    def __init__(self, name, blocks=(), active=True):
+        self.name = name
+        self.active = active
+        self.blocks = list(blocks)
+
+    @classmethod
+    def from_json(cls, name, data):
+        blocks = []
+        for i, block in enumerate(data.get("blocks", ())):
+            main = Rule.from_json(block.get("main", {}), name, i, stack=block.get("stack"))
+            tools = [Rule.from_json(tool, name, i, j) for j, tool in enumerate(block.get("tools", ()))]
+            blocks.append((main, tools))
+        return cls(name, blocks, data.get("active", True))
+
+    def to_json(self):
+        blocks = []
+        for main, tools in self.blocks:
+            block = {"main": main.to_json()}
+            if main.stack:
+                block["stack"] = main.stack
+            if tools:
+                block["tools"] = [tool.to_json() for tool in tools]
+            blocks.append(block)
+        return {"active": self.active, "blocks": blocks}
+
+    def rules(self):
+        for main, tools in self.blocks:
+            yield main
+            yield from tools
+
+
+class ProfileStore:
+    """profiles.json 的读写；保存时先写临时文件再替换，写到一半退出不会损坏原文件"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_path()
+        self.profiles = {}
+
+    def load(self):
+        if not self.path.exists():
+            self.profiles = {}
+            return self.profiles
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.profiles = {name: Profile.from_json(name, profile)
+                             for name, profile in data.get("profiles", {}).items()}
+        except (OSError, ValueError, re.error) as e:
+            logger.error("[配置] 读取 %s 失败: %s", self.path, e)
+            self.profiles = {}
+        return self.profiles
+
+    def save(self):
+        data = {"version": FORMAT_VERSION,
+                "profiles": {name: profile.to_json() for name, profile in self.profiles.items()}}
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def active(self):
+        return [profile for profile in self.profiles.values() if profile.active]
+
+
+# === 匹配索引 === #
+# 标题字面量索引的 n-gram 长度：字面量短于它的规则只能逐条匹配
+GRAM = 3
+
+
+def required_literal(pattern):
+    """
+    标题正则里必然原样出现的最长字面量（只看顶层连续的普通字符，例如 "^Doc A - Word$" -> "Doc A - Word"）。
+    顶层是分支、或带大小写不敏感标志时返回空串。
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ""
+    if parsed.state.flags & re.IGNORECASE:
+        return ""
+    best = run = ""
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            run += chr(value)
+        else:
+            best = max(best, run, key=len)
+            run = ""
+    return max(best, run, key=len)
+
+
+class _Bucket:
+    """
+    同一 (exe, class) 下不能走字面量索引的规则，按优先级排列：
+    plain 没有标题条件；scan 的标题正则提取不出足够长的字面量，只能逐条匹配
+    """
+    __slots__ = ('plain', 'scan')
+
+    def __init__(self):
+        self.plain = []
+        self.scan = []
+
+
+class MatcherIndex:
+    """
+    预编译的规则索引：
+    - exe / class 精确匹配：规则按 (exe, class) 分桶，每个新窗口最多查 4 个桶
+    - 标题：每条规则取标题正则里必然出现的字面量，按其中最少见的 3-gram 建倒排表；
+      新窗口只用自己标题里的 3-gram 查表，命中的少数规则再用各自的正则确认
+    每个窗口的开销只与标题长度和命中数有关，与规则总数无关。
+    （CPython 的 re 会逐个尝试合并正则里的每个分支，数百条规则合并后比逐条匹配还慢，所以不合并。）
+    """
+
+    def __init__(self, profiles):
+        self.rules = []
+        for profile in profiles:
+            self.rules.extend(profile.rules())
+        for order, rule in enumerate(self.rules):
+            rule.order = order
+
+        self._buckets = {}
+        literals = {}
+        for rule in self.rules:
+            literal = required_literal(rule.title) if rule.title else ""
+            if len(literal) >= GRAM:
+                literals[rule] = literal
+                continue
+            bucket = self._buckets.get((rule.exe, rule.class_name))
+            if bucket is None:
+                bucket = self._buckets[(rule.exe, rule.class_name)] = _Bucket()
+            (bucket.scan if rule.title else bucket.plain).append(rule)
+
+        # 每条规则只登记在它字面量里最少见的一个 3-gram 下，倒排表尽量短
+        counts = {}
+        for literal in literals.values():
+            for gram in {literal[i:i + GRAM] for i in range(len(literal) - GRAM + 1)}:
+                counts[gram] = counts.get(gram, 0) + 1
+        self._grams = {}
+        for rule, literal in literals.items():
+            gram = min((literal[i:i + GRAM] for i in range(len(literal) - GRAM + 1)), key=counts.__getitem__)
+            self._grams.setdefault(gram, []).append(rule)
+
+        # 只有规则用到 exe / class 时才需要查询进程路径和窗口类名
+        self.uses_exe = any(rule.exe for rule in self.rules)
+        self.uses_class = any(rule.class_name for rule in self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, exe, class_name, title, taken=()):
+        """返回优先级最高的匹配 Rule（跳过 taken 中已挂载窗口的规则 key），没有时返回 None"""
+        best = None
+
+        # 规则都不用 exe / class 时调用方传 ANY，几个键会重复
+        for key in dict.fromkeys(((exe, class_name), (exe, ANY), (ANY, class_name), (ANY, ANY))):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for rule in bucket.plain:
+                if best is not None and rule.order > best.order:
+                    break
+                if rule.key not in taken:
+                    best = rule
+                    break
+            for rule in bucket.scan:
+                if best is not None and rule.order > best.order:
+                    break
+                if rule.key not in taken and rule.pattern.search(title):
+                    best = rule
+                    break
+
+        grams = self._grams
+        if grams:
+            for i in range(len(title) - GRAM + 1):
+                hits = grams.get(title[i:i + GRAM])
+                if hits is None:
+                    continue
+                for rule in hits:
+                    if (best is None or rule.order < best.order) and rule.key not in taken \
+                            and rule.matches(exe, class_name, title):
+                        best = rule
+        return best
+
+
+# === 重新挂载 === #
+class ProfileManager:
+    """
+    新窗口出现时（包括启动时的首次枚举）按启用的配置重新挂载：
+    主窗口按保存的块顺序插入引擎，工具窗口挂到所在块的主窗口下（主窗口还没出现时先记下，等它出现再挂）。
+    每条规则同一时间只对应一个窗口；窗口被移除后规则空出来，之后出现的窗口可以再次匹配。
+    """
+
+    def __init__(self, engine, store=None):
+        self.engine = engine
+        self.store = store or ProfileStore()
+        self._lock = threading.Lock()
+        self._attached = {}   # 规则 key -> hwnd
+        self._rules = {}      # hwnd -> 规则 key
+        self._pending = {}    # (配置, 块) -> [(hwnd, title)]，等待主窗口出现的工具窗口
+        self.index = MatcherIndex(())
+        self.matched = 0      # 实际挂载进引擎的窗口数（等主窗口的工具窗口挂上后才计入）
+        engine.subscribe(self._on_engine_changed)
+
+    def load(self):
+        self.store.load()
+        self.rebuild()
+        return self
+
+    def rebuild(self):
+        with self._lock:
+            self.index = MatcherIndex(self.store.active())
+            self._attached = {}
+            self._rules = {}
+            self._pending = {}
+        logger.info("[配置] 已加载 %s 个配置，%s 条规则", len(self.store.active()), len(self.index))
+
+    # === 窗口出现 === #
+    def on_window(self, hwnd, title):
+        """窗口清单发现新窗口时调用（主线程）"""
+        index = self.index
+        if not len(index) or hwnd in self.engine:
+            return False
+        try:
+            exe = exe_name(win_api.get_process_image_path(hwnd)) if index.uses_exe else ANY
+            class_name = win_api.get_class_name(hwnd) if index.uses_class else ANY
+        except Exception:
+            # 窗口可能已经关闭
+            return False
+
+        with self._lock:
+            rule = index.match(exe, class_name, title, self._attached)
+            if rule is None:
+                return False
+            # 先占住规则，避免挂载过程中同一规则被另一个窗口抢到
+            self._attached[rule.key] = hwnd
+            self._rules[hwnd] = rule.key
+
+        if rule.tool is None:
+            attached = self._attach_main(rule, hwnd, title)
+        else:
+            attached = self._attach_tool(rule, hwnd, title)
+        if attached:
+            self.matched += attached
+        return bool(attached)
+
+    def _attach_main(self, rule, hwnd, title):
+        """返回挂载进引擎的窗口数（主窗口加上等待它的工具窗口），失败返回 False"""
+        from window_records import WindowRecord
+
+        before = self._next_attached_main(rule)
+        if not self.engine.add_window(WindowRecord(hwnd, title), before=before, stack=rule.stack or DEFAULT_STACK):
+            self._release(hwnd)
+            return False
+        logger.info("[配置] %s: 重新挂载窗口 [%s] (HWND: %s)", rule.profile, title, hwnd)
+
+        with self._lock:
+            waiting = self._pending.pop((rule.profile, rule.block), ())
+        attached = 1
+        for tool_hwnd, tool_title in waiting:
+            if self.engine.insert_derived_window(tool_hwnd, tool_title, hwnd):
+                attached += 1
+            else:
+                self._release(tool_hwnd)
+        return attached
+
+    def _attach_tool(self, rule, hwnd, title):
+        """主窗口已挂载时直接挂上（返回 True）；否则记入等待列表（返回 False，不算已挂载）"""
+        with self._lock:
+            # 检查和登记在同一次加锁内完成：主窗口加入引擎之后才取走等待列表，工具窗口不会被漏掉
+            main_hwnd = self._attached.get((rule.profile, rule.block, None))
+            if main_hwnd is None or main_hwnd not in self.engine:
+                self._pending.setdefault((rule.profile, rule.block), []).append((hwnd, title))
+                return False
+
+        if self.engine.insert_derived_window(hwnd, title, main_hwnd):
+            return True
+        self._release(hwnd)
+        return False
+
+    def _next_attached_main(self, rule):
+        """同一配置、同一个栈中排在后面、已经挂载的第一个主窗口：新块插在它前面，保持保存时的顺序"""
+        profile = self.store.profiles[rule.profile]
+        for block in range(rule.block + 1, len(profile.blocks)):
+            if profile.blocks[block][0].stack != rule.stack:
+                continue
+            hwnd = self._attached.get((rule.profile, block, None))
+            if hwnd is not None and hwnd in self.engine:
+                return hwnd
+        return None
+
+    def stats(self):
+        """规则数、已挂载的窗口数、正在等主窗口的工具窗口数"""
+        with self._lock:
+            pending = sum(len(waiting) for waiting in self._pending.values())
+        return {"rules": len(self.index), "matched": self.matched, "pending": pending}
+
+    # === 窗口移除 === #
+    def _on_engine_changed(self, change):
+        for hwnd in change.removed:
+            self._release(hwnd)
+
+    def _release(self, hwnd):
+        with self._lock:
+            key = self._rules.pop(hwnd, None)
+            if key is not None and self._attached.get(key) == hwnd:
+                del self._attached[key]
+
+    def forget(self, hwnd):
+        """窗口已关闭：如果它是在等主窗口的工具窗口，从等待列表中去掉"""
+        self._release(hwnd)
+        with self._lock:
+            for waiting in self._pending.values():
+                waiting[:] = [entry for entry in waiting if entry[0] != hwnd]
+
+    # === 保存 === #
+    def save_current(self, name):
+        """把引擎当前的受管窗口保存为配置 name（已存在时覆盖），并立即按新配置重建索引"""
+        profile, attached = capture(name, self.engine.snapshot().targets)
+        self.store.profiles[name] = profile
+        self.store.save()
+        self.rebuild()
+        # 当前窗口就是配置的来源，直接记为已挂载
+        with self._lock:
+            for key, hwnd in attached.items():
+                self._attached[key] = hwnd
+                self._rules[hwnd] = key
+        logger.info("[配置] 已保存配置 %s：%s 个块", name, len(profile.blocks))
+        return profile
+
+
+def capture(name, targets):
+    """
+    由引擎快照 (TargetSnapshot 列表，各栈依次、Z 序从上到下) 生成配置：按 (栈, rank) 分块，工具窗口排在主窗口前面。
+    规则默认只用 exe + class；同一配置里 exe + class 相同的窗口再加上精确标题区分。
+    返回 (配置, {规则 key: hwnd})。
+    """
+    groups = []
+    for target in targets:
+        if not groups or groups[-1][0] != (target.stack, target.rank):
+            groups.append(((target.stack, target.rank), []))
+        groups[-1][1].append(target)
+
+    identities = {}
+    for _, windows in groups:
+        for target in windows:
+            try:
+                exe = exe_name(win_api.get_process_image_path(target.hwnd))
+                class_name = win_api.get_class_name(target.hwnd)
+            except Exception:
+                exe, class_name = None, None
+            identities[target.hwnd] = (exe, class_name)
+
+    counts = {}
+    for identity in identities.values():
+        counts[identity] = counts.get(identity, 0) + 1
+
+    def rule_for(target, block, tool=None):
+        exe, class_name = identities[target.hwnd]
+        title = None
+        if counts[(exe, class_name)] > 1 or not (exe or class_name):
+            title = f"^{re.escape(target.title)}$"
+        return Rule(exe, class_name, title, name, block, tool)
+
+    blocks = []
+    attached = {}
+    for i, ((stack, _), windows) in enumerate(groups):
+        main = next((t for t in windows if t.window_type != 'TOOL'), windows[-1])
+        tools = [t for t in windows if t is not main]
+        rules = (rule_for(main, i), [rule_for(tool, i, j) for j, tool in enumerate(tools)])
+        if stack != DEFAULT_STACK:
+            rules[0].stack = stack
+        blocks.append(rules)
+        attached[rules[0].key] = main.hwnd
+        for rule, tool in zip(rules[1], tools):
+            attached[rule.key] = tool.hwnd
+    return Profile(name, blocks), attached
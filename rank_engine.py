@@ -1,166 +1,549 @@
 # rank_engine.py
+import contextlib
+import functools
+import threading
 import time
-from dataclasses import dataclass
-from typing import List, Optional, Tuple, Set
-
-import win32con
-import win32gui
-from PySide6.QtCore import QTimer
+from collections import namedtuple
+from types import MappingProxyType
 
 import win_api
-from ui_widgets import ItemData
+import window_health
+import echo_guard
+import reorder_planner
+from window_records import WindowRecord
+from window_blocks import Stack
 from logger import logger
 
+# 没有指定栈时窗口加入的栈，始终存在
+DEFAULT_STACK = "默认"
+
+# 交给界面和其他线程的不可变快照；stacks 是全部栈的名称（包括空栈），按创建顺序
+TargetSnapshot = namedtuple('TargetSnapshot', 'hwnd title rank window_type quarantined stack',
+                            defaults=(DEFAULT_STACK,))
+EngineSnapshot = namedtuple('EngineSnapshot', 'targets ranks stacks')
+# 一次引擎操作的变化汇总：新增 / 移除的 hwnd，以及顺序或序号是否变化
+EngineChange = namedtuple('EngineChange', 'added removed reordered')
+
+
+def _locked(method):
+    """引擎方法加锁：界面线程和重排线程都会访问引擎"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _mutating(method):
+    """
+    修改目标列表的操作：加锁，并把操作内部的所有变化合并成一次通知。
+    嵌套调用（例如 clean_invalid_windows 内部多次 remove_window）只在最外层结束后通知一次，
+    通知在锁外、在调用线程执行。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._depth += 1
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                self._depth -= 1
+            change = self._take_change() if self._depth == 0 else None
+        self._notify(change)
+        return result
+    return wrapper
+
 
 class WindowRankEngine:
-    def __init__(self):
-        self._targets = []
+    def __init__(self, api=win_api, batch_mode=True, health=None, echo=None):
+        """
+        api: 窗口 API 模块（默认 win_api），可替换为记录调用的替身以统计原生调用次数。
+        batch_mode: 是否使用 DeferWindowPos 事务批量重排，失败时自动回退逐个设置。
+        health: 无响应窗口熔断器（默认全局的 window_health.get_health()），被隔离的窗口不参与重排。
+        echo: 回声抑制器（默认全局的 echo_guard.get_guard()），移动窗口前登记，监控器据此丢弃重排自己引起的事件。
+        """
+        self._api = api
+        self.batch_mode = batch_mode
+        self.health = health or window_health.get_health()
+        self.echo = echo or echo_guard.get_guard()
+        self._lock = threading.RLock()
+
+        # === 目标顺序 === #
+        # 名称 -> 栈，按创建顺序；每个栈是一个块链表（主窗口及其可嵌套的工具窗口），序号和重排互相独立
+        self._stacks = {DEFAULT_STACK: Stack(DEFAULT_STACK)}
+        # hwnd -> 所在的栈
+        self._stack_of = {}
+        # rank 按块的位置懒计算：增删移动只标记所在的栈，查询时统一遍历一次
+        # 展开后的 hwnd 顺序 / hwnd -> 列表下标 / hwnd -> rank 只读快照，列表变化后置空，下次查询时重建
+        self._hwnds = None
+        self._positions = None
+        self._rank_snapshot = None
+
+        # === 重排统计（只由执行重排的线程写） === #
+        # touched: 参与重排的栈里的窗口数；moved: 实际调整 Z 序的窗口数
+        self.reorders = 0
+        self.touched = 0
+        self.moved = 0
+        self.last_touched = 0
+        self.last_moved = 0
+
+        # === 变化通知 === #
+        self._listeners = []
+        self._depth = 0
+        self._added = []
+        self._removed = []
+        self._reordered = False
 
     @property
+    @_locked
     def targets(self):
-        return self._targets
+        """展开后的目标列表：各栈依次展开，栈内 Z 序从上到下"""
+        self._ensure_ranks()
+        return list(self._records())
+
+    def _records(self):
+        for stack in self._stacks.values():
+            yield from stack
+
+    # === 查询 === #
+    def __contains__(self, hwnd):
+        return hwnd in self._stack_of
+
+    @_locked
+    def get(self, hwnd):
+        """按 hwnd 取 WindowRecord，不存在时返回 None"""
+        stack = self._stack_of.get(hwnd)
+        if stack is None:
+            return None
+        self._ensure_ranks()
+        return stack.get(hwnd)
+
+    @_locked
+    def snapshot(self):
+        """当前目标列表和 rank 映射的不可变快照"""
+        self._ensure_ranks()
+        health = self.health
+        targets = tuple(
+            TargetSnapshot(t.hwnd, t.title, t.rank, t.window_type, health.is_quarantined(t.hwnd), stack.name)
+            for stack in self._stacks.values() for t in stack
+        )
+        return EngineSnapshot(targets, self.rank_snapshot(), tuple(self._stacks))
+
+    @_locked
+    def hwnds(self):
+        """当前目标列表的 hwnd 顺序（比 snapshot 轻，不构造记录）"""
+        if self._hwnds is None:
+            self._hwnds = tuple(target.hwnd for target in self._records())
+        return self._hwnds
+
+    @_locked
+    def index_of(self, hwnd):
+        """hwnd 在展开列表中的下标，不存在时返回 -1"""
+        if self._positions is None:
+            self._positions = {hwnd: i for i, hwnd in enumerate(self.hwnds())}
+        return self._positions.get(hwnd, -1)
+
+    def rank_of(self, hwnd):
+        """hwnd 对应的 rank，不是受管窗口时返回 0"""
+        return self.rank_snapshot().get(hwnd, 0)
+
+    @_locked
+    def rank_snapshot(self):
+        """hwnd -> rank 的只读快照；引擎之后的修改不会影响已经拿到的快照"""
+        if self._rank_snapshot is None:
+            self._ensure_ranks()
+            self._rank_snapshot = MappingProxyType({target.hwnd: target.rank for target in self._records()})
+        return self._rank_snapshot
+
+    # === 窗口栈 === #
+    @_locked
+    def stack_names(self):
+        return tuple(self._stacks)
+
+    def stack_of(self, hwnd):
+        """hwnd 所在栈的名称，不是受管窗口时返回 None"""
+        stack = self._stack_of.get(hwnd)
+        return stack.name if stack is not None else None
+
+    @_locked
+    def stacks_of(self, hwnds):
+        """这些窗口所在的栈名称集合（触发重排的窗口 -> 需要重排的栈），忽略非受管窗口"""
+        stack_of = self._stack_of
+        return {stack_of[hwnd].name for hwnd in hwnds if hwnd in stack_of}
+
+    @_mutating
+    def add_stack(self, name):
+        """新建一个空栈，已存在时返回 False"""
+        if name in self._stacks:
+            return False
+        self._get_stack(name)
+        return True
 
-    # === 添加窗口 === #
-    def add_window(self, item_data: ItemData):
-        """添加窗口，如果已存在则返回 False"""
-        if any(target.hwnd == item_data.hwnd for target in self._targets):
+    @_mutating
+    def move_to_stack(self, item_data, name):
+        """把窗口所在的整块（主窗口和它的工具窗口）移到栈 name 的末尾，栈不存在时新建"""
+        source = self._stack_of.get(item_data.hwnd)
+        if source is None or source.name == name:
             return False
 
-        rank = 1
-        if self._targets:
-            last_target = self._targets[-1]
-            rank = last_target.rank + 1
-        item_data.rank = rank
+        target = self._get_stack(name)
+        block = target.adopt(source.detach(source.block_of(item_data.hwnd)))
+        for record in block.records():
+            self._stack_of[record.hwnd] = target
+        source.ranks_dirty = target.ranks_dirty = True
+        source.changed = target.changed = True
+        self._drop_if_empty(source)
+        self._invalidate()
+        self._reordered = True
+        return True
+
+    def _get_stack(self, name):
+        """取栈，不存在时新建（在修改操作内部调用）"""
+        stack = self._stacks.get(name)
+        if stack is None:
+            stack = self._stacks[name] = Stack(name)
+            self._reordered = True
+        return stack
+
+    def _drop_if_empty(self, stack):
+        """最后一个窗口离开后删除空栈（默认栈始终保留）"""
+        if not len(stack) and stack.name != DEFAULT_STACK:
+            del self._stacks[stack.name]
+            self._reordered = True
+
+    def _invalidate(self):
+        self._hwnds = None
+        self._positions = None
+        self._rank_snapshot = None
+
+    # === 变化通知 === #
+    def subscribe(self, listener):
+        """listener(EngineChange)：每次修改目标列表的操作结束后调用一次（在执行该操作的线程）"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        把多个操作合并成一次变化通知（IPC 批量命令使用）。
+        批处理期间一直持有引擎锁，其他线程的操作要等整批结束。
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+            change = self._take_change() if self._depth == 0 else None
+        self._notify(change)
+
+    def _notify(self, change):
+        if change is not None:
+            for listener in list(self._listeners):
+                listener(change)
+
+    def _take_change(self):
+        if not (self._added or self._removed or self._reordered):
+            return None
+        change = EngineChange(tuple(self._added), tuple(self._removed), self._reordered)
+        self._added = []
+        self._removed = []
+        self._reordered = False
+        return change
+
+    # === 添加窗口 === #
+    @_mutating
+    def add_window(self, item_data, before=None, stack=None):
+        """
+        添加窗口（任何带 hwnd / title 的记录，引擎保存自己的副本），如果已存在则返回 False。
+        before: 插到这个窗口所在的块之前（配置重新挂载时按保存的顺序插入），默认追加到末尾
+        stack: 加入的栈名称，不存在时新建；默认是 before 所在的栈，没有 before 时是默认栈
+        """
+        if item_data.hwnd in self._stack_of:
+            return False
 
-        self._targets.append(item_data)
-        self._recalculate_ranks()
+        if stack is None:
+            before_stack = self._stack_of.get(before)
+            stack = before_stack.name if before_stack is not None else DEFAULT_STACK
+        target = self._get_stack(stack)
+
+        # 追加到末尾的块序号就是块数 + 1，其他块的序号不变
+        record = WindowRecord(item_data.hwnd, item_data.title, rank=target.block_count + 1)
+        # before 不在这个栈里时同样追加到末尾
+        before_block = target.block_of(before) if before is not None else None
+        if before_block is None:
+            target.append(record)
+        else:
+            target.insert_before(record, before_block)
+            target.ranks_dirty = True
+            self._reordered = True
+        self._stack_of[record.hwnd] = target
+        target.changed = True
+        self._invalidate()
+        self._added.append(record.hwnd)
         return True
 
+    @_mutating
     def insert_derived_window(self, child_hwnd, child_title, parent_hwnd):
-        if any(target.hwnd == child_hwnd for target in self._targets):
+        """把工具窗口挂到 parent_hwnd（主窗口或已挂载的工具窗口）上，Z 序紧贴在父窗口之上"""
+        if child_hwnd in self._stack_of:
             return False
 
-        parent_idx = -1
-        parent_rank = 1
-        for i, target in enumerate(self._targets):
-            if target.hwnd == parent_hwnd:
-                parent_idx = i
-                parent_rank = target.rank
-                break
-
-        new_item = ItemData(child_hwnd, child_title, rank=parent_rank, window_type='TOOL')
-        self._targets.insert(parent_idx, new_item)
-        logger.info(f"挂载工具窗口: [{child_title}] -> [{self._targets[parent_idx].title}]")
+        stack = self._stack_of.get(parent_hwnd)
+        if stack is None:
+            return False
+        parent = stack.get(parent_hwnd)
+
+        new_item = WindowRecord(child_hwnd, child_title, rank=parent.rank, window_type='TOOL', parent=parent_hwnd)
+        stack.attach(new_item, parent_hwnd)
+        self._stack_of[child_hwnd] = stack
+        stack.changed = True
+        self._invalidate()
+        self._added.append(child_hwnd)
+        logger.info("挂载工具窗口: [%s] -> [%s]", child_title, parent.title)
         return True
 
     # === 移除窗口 === #
-    def remove_window(self, item_data: ItemData):
-        remove_hwnd = item_data.hwnd
-        self._targets = [t for t in self._targets if t.hwnd != remove_hwnd]
-        self._recalculate_ranks()
+    @_mutating
+    def remove_window(self, item_data):
+        """移除窗口；移除主窗口时它的工具窗口一起移除"""
+        stack = self._stack_of.get(item_data.hwnd)
+        if stack is None:
+            return True
+        block = stack.block_of(item_data.hwnd)
+
+        # 移除的不是最后一块时，后面各块的序号都会变
+        if block.main.hwnd == item_data.hwnd and not stack.is_last(block):
+            stack.ranks_dirty = True
+            self._reordered = True
+
+        removed = stack.remove(item_data.hwnd)
+        for record in removed:
+            del self._stack_of[record.hwnd]
+        self._drop_if_empty(stack)
+        self._invalidate()
+        self._removed.extend(record.hwnd for record in removed)
         return True
 
     # === 移动窗口 === #
-    def move_item(self, item_data: ItemData, direction: str):
+    @_mutating
+    def move_item(self, item_data, direction: str):
+        """与相邻的块交换位置（整块移动，工具窗口跟随主窗口）"""
         if direction not in ('up', 'down'):
             return False
 
-        current_main_idx = next(i for i, t in enumerate(self._targets) if t.hwnd == item_data.hwnd)
-        curr_start, curr_end = self._get_block_range(current_main_idx)
-
-        target_idx = -1
-        for idx, target in enumerate(self._targets):
-            if target.hwnd == item_data.hwnd:
-                target_idx = idx
-                break
+        stack = self._stack_of.get(item_data.hwnd)
+        if stack is None:
+            return False
+        block = stack.block_of(item_data.hwnd)
 
         if direction == 'up':
-            if curr_start == 0:
-                return False
-
-            prev_main_idx = curr_start - 1
-            prev_start, prev_end = self._get_block_range(prev_main_idx)
-
-            block_a = self._targets[prev_start:prev_end]
-            block_b = self._targets[curr_start:curr_end]
-
-            self._targets[prev_start:curr_end] = block_b + block_a
-
-            # 原逻辑
-            # if target_idx > 0:
-            #     new_idx = target_idx - 1
-            # else:
-            #     return False
-        elif direction == 'down':
-            if curr_end >= len(self._targets):
-                return False
-
-            next_main_idx = -1
-            for i in range(curr_end, len(self._targets)):
-                if self._targets[i].window_type == 'STANDARD':
-                    next_main_idx = i
-                    break
-
-            next_start, next_end = self._get_block_range(next_main_idx)
-
-            block_a = self._targets[curr_start:curr_end]
-            block_b = self._targets[next_start:next_end]
-
-            self._targets[curr_start:next_end] = block_b + block_a
-
-            # 原逻辑
-            # if target_idx < len(self._targets) - 1:
-            #     new_idx = target_idx + 1
-            # else:
-            #     return False
+            moved = stack.swap_with_prev(block)
+        else:
+            moved = stack.swap_with_next(block)
+        if not moved:
+            return False
 
-        self._recalculate_ranks()
-        # 原逻辑
-        # self._targets[target_idx], self._targets[new_idx] = self._targets[new_idx], self._targets[target_idx]
+        self._invalidate()
+        stack.ranks_dirty = True
+        stack.changed = True
+        self._reordered = True
         return True
 
     # === 执行重排 === #
-    def execute_reorder(self):
+    def execute_reorder(self, full=False, stacks=None):
+        """
+        full=False: 读取受管窗口当前的相对 Z 序，只移动顺序不对的窗口；顺序已正确时直接跳过。
+        full=True: 从最顶层开始重新排列全部受管窗口（手动“立即执行重排”使用）。
+        stacks: 只重排这些栈（触发窗口所在的栈），外加上次重排后顺序或成员变过的栈；None 时重排全部栈。
+        """
         logger.info("=== 开始重排 ===")
-        if not self._targets:
+        # 只在复制目标列表时持锁：SetWindowPos 可能被无响应的窗口卡住，不能让界面线程跟着等
+        with self._lock:
+            chosen = [stack for stack in self._stacks.values()
+                      if stacks is None or stack.name in stacks or stack.changed]
+            for stack in chosen:
+                stack.changed = False
+            groups = [list(stack) for stack in chosen if len(stack)]
+        if not groups:
             return False
 
+        # 各栈独立排列；倒序处理，多个栈都要移动时列在前面的栈最后排、在最上面
+        # probed: 本次触发内已探测过的窗口（是否可参与排序、是否置顶），每个窗口最多探测一次
+        probed = {}
+        touched = moved = 0
+        for targets in reversed(groups):
+            touched += len(targets)
+            moved += self._reorder_stack(targets, full, probed)
+
+        self.reorders += 1
+        self.touched += touched
+        self.moved += moved
+        self.last_touched = touched
+        self.last_moved = moved
+        return True
+
+    def _reorder_stack(self, targets, full, probed):
+        """排列一个栈，返回调整了 Z 序的窗口数"""
+        if full:
+            plan = self._build_reorder_plan(targets, probed)
+        else:
+            plan = self._build_minimal_plan(targets, probed)
+            if not plan:
+                logger.info("  - 顺序已正确，跳过重排")
+                return 0
+        if not plan:
+            return 0
+
+        topmost = {hwnd for hwnd, _, _ in plan if probed[hwnd][1]}
+        self.echo.expect(hwnd for hwnd, _, _ in plan)
+        if not (self.batch_mode and self._apply_plan_batch(plan, topmost)):
+            self._apply_plan_one_by_one(plan)
+        return len(plan)
+
+    def reorder_stats(self):
+        """每次重排触及的窗口数：参与重排的栈里的窗口 (touched) 和实际调整 Z 序的窗口 (moved)"""
+        reorders = self.reorders
+        return {
+            "reorders": reorders,
+            "touched": self.touched,
+            "moved": self.moved,
+            "touched_avg": self.touched / reorders if reorders else 0.0,
+            "moved_avg": self.moved / reorders if reorders else 0.0,
+            "last_touched": self.last_touched,
+            "last_moved": self.last_moved,
+        }
+
+    def _build_minimal_plan(self, targets, probed):
+        """
+        根据实时 Z 序生成最少移动的计划。
+        先读相对 Z 序（不在顶层窗口链上的目标即已关闭），顺序已正确时不再做任何探测；
+        只对需要移动的窗口（和最上面的置顶窗口）探测无响应 / 可见性 / 置顶状态，
+        去掉不能参与排序的窗口后重新规划，直到计划里的窗口都已探测过。
+        """
+        api = self._api
+        kinds = {target.hwnd: target.window_type for target in targets}
+        current = api.get_relative_z_order(list(kinds))
+        present = set(current)
+        desired = [hwnd for hwnd in kinds if hwnd in present]
+
+        moves = reorder_planner.plan_moves(desired, current)
+        if not moves:
+            return []
+
+        # 置顶窗口必须移动以取消 TopMost（否则移到它上面的窗口会被它压住）。
+        # 置顶窗口总在 Z 序最上面，只需从上往下检查到第一个不置顶的受管窗口
+        topmost = []
+        skipped = set()
+        for hwnd in current:
+            if not api.is_topmost(hwnd):
+                break
+            if self._probe(hwnd, kinds[hwnd], probed)[0]:
+                topmost.append(hwnd)
+            else:
+                skipped.add(hwnd)
+
+        while True:
+            if skipped:
+                desired = [hwnd for hwnd in desired if hwnd not in skipped]
+                current = [hwnd for hwnd in current if hwnd not in skipped]
+            moves = reorder_planner.plan_moves(desired, current, force_move=topmost)
+            fresh = [hwnd for hwnd, _ in moves if hwnd not in probed]
+            if not fresh:
+                break
+            for hwnd in fresh:
+                self._probe(hwnd, kinds[hwnd], probed)
+            topmost += [hwnd for hwnd in fresh if probed[hwnd] == (True, True)]
+            skipped = {hwnd for hwnd in fresh if not probed[hwnd][0]}
+
+        return [
+            (hwnd, api.HWND_TOP if insert_after is None else insert_after, kinds[hwnd] != 'TOOL')
+            for hwnd, insert_after in moves
+        ]
+
+    def _probe(self, hwnd, window_type, probed):
+        """探测窗口能否参与排序、是否置顶，结果存入 probed[hwnd] = (可参与, 置顶)"""
+        entry = probed.get(hwnd)
+        if entry is not None:
+            return entry
+
+        api = self._api
+        if not api.is_window(hwnd):
+            entry = (False, False)
+        # 无响应的窗口会把 SetWindowPos 卡住，隔离期内跳过
+        elif not self.health.allow(hwnd):
+            entry = (False, False)
+        # 工具窗口隐藏时跳过；主窗口最小化或隐藏时跳过，避免把它强行弹出来
+        elif not api.is_window_visible(hwnd):
+            entry = (False, False)
+        elif window_type != 'TOOL' and api.is_minimized(hwnd):
+            entry = (False, False)
+        else:
+            entry = (True, api.is_topmost(hwnd))
+        probed[hwnd] = entry
+        return entry
+
+    def _build_reorder_plan(self, targets, probed):
+        """生成完整重排计划：[(hwnd, insert_after, force_show), ...]，只包含需要参与排序的窗口"""
+        api = self._api
+        plan = []
         pre_hwnd = None
 
-        for idx, target in enumerate(self._targets):
-            # --- 1. 存活与可见性检查 ---
-            if not win32gui.IsWindow(target.hwnd):
+        for target in targets:
+            if not self._probe(target.hwnd, target.window_type, probed)[0]:
                 continue
 
-            is_visible = win32gui.IsWindowVisible(target.hwnd)
-
-            # 工具窗口逻辑
-            if target.window_type == 'TOOL':
-                if not is_visible: continue
-                force_show = False
-            else:
-                # 如果主窗口最小化或隐藏，跳过排序，避免把它强行弹出来
-                if win_api.is_minimized(target.hwnd) or not is_visible:
-                    continue
-                force_show = True
-
-            # --- 2. 核心排序逻辑 ---
+            # 工具窗口可见时参与排序，但不强制发送 Show 指令
+            force_show = target.window_type != 'TOOL'
+            insert_after = api.HWND_TOP if pre_hwnd is None else pre_hwnd
+            plan.append((target.hwnd, insert_after, force_show))
+            pre_hwnd = target.hwnd
 
-            # 确定我们要插在谁后面
-            if pre_hwnd is None:
-                insert_after = win32con.HWND_TOP
-            else:
-                insert_after = pre_hwnd
+        return plan
+
+    def _apply_plan_batch(self, plan, topmost):
+        """DeferWindowPos 事务：所有窗口一次提交，桌面只重绘一次"""
+        api = self._api
+
+        # 同一事务里不能对同一窗口提交两次，所以只对真正置顶的窗口先单独取消 TopMost
+        for hwnd, _, force_show in plan:
+            if hwnd in topmost:
+                api.set_z_order(hwnd, api.HWND_NOTOPMOST, force_show=force_show)
+
+        # 只有一个窗口要动时，直接 SetWindowPos 比开一个事务更省调用
+        if len(plan) == 1:
+            hwnd, insert_after, force_show = plan[0]
+            start = time.perf_counter()
+            api.set_z_order(hwnd, insert_after, force_show=force_show)
+            self.health.record(hwnd, time.perf_counter() - start)
+            return True
+
+        start = time.perf_counter()
+        ok = api.set_z_order_batch(plan)
+        # 整个事务偏慢时无法归因到单个窗口，逐个探测一次
+        if time.perf_counter() - start > self.health.SLOW_CALL:
+            for hwnd, _, _ in plan:
+                self.health.check(hwnd)
+        return ok
+
+    def _apply_plan_one_by_one(self, plan):
+        """逐个窗口设置（批量事务失败时的回退路径）"""
+        api = self._api
+        for hwnd, insert_after, force_show in plan:
+            # 前面的窗口刚被判为无响应时，后面的窗口不再等它
+            if self.health.is_quarantined(hwnd):
+                continue
 
+            start = time.perf_counter()
             # 先确保它不是 TopMost (消除副作用)
-            win_api.set_z_order(target.hwnd, win32con.HWND_NOTOPMOST, force_show=force_show)
+            api.set_z_order(hwnd, api.HWND_NOTOPMOST, force_show=force_show)
 
             # 然后摆正位置
-            win_api.set_z_order(target.hwnd, insert_after, force_show=force_show)
-
-            pre_hwnd = target.hwnd
-
-        return True
+            api.set_z_order(hwnd, insert_after, force_show=force_show)
+            self.health.record(hwnd, time.perf_counter() - start)
 
     # 原逻辑
     # def execute_reorder(self):
@@ -208,37 +591,32 @@ class WindowRankEngine:
     #     return True
 
     # === 检测窗口存活情况 ===#
+    @_mutating
     def clean_invalid_windows(self):
-        cleaned = False
-        for target in list(self._targets):
-            if not win32gui.IsWindow(target.hwnd):
-                self.remove_window(target)
-                cleaned = True
-        return cleaned
+        if not self._stack_of:
+            return False
 
-    # === 重新计算序号 === #
-    def _recalculate_ranks(self):
-        current_rank = 1
-        for target in self._targets:
-            if target.window_type == 'STANDARD':
-                target.rank = current_rank
-                current_rank += 1
-            else:
-                pass
+        # NumPy 到第一次清理时才导入，引擎模块本身导入很轻
+        import numpy as np
+        from window_snapshot import hwnd_array
 
-    # === 获取主窗口和子窗口的组合 === #
-    def _get_block_range(self, main_idx: int):
-        """
-        策略：列表结构通常是 [子1, 子2, 主A, 子3, 主B]
-        所以默认结构是 [子1, 子2, 主A]。
-        我们定义一个 Block 为：[属于该主窗口的所有前置子窗口 + 主窗口本身]
-        """
-        start = main_idx
-        while start > 0:
-            if self._targets[start - 1].window_type == 'TOOL':
-                start -= 1
-            else:
-                break
-        end = main_idx + 1
-        return start, end
+        # 一次枚举代替逐个 IsWindow：不在顶层窗口列表里的目标即为已关闭
+        alive = hwnd_array(self._api.enum_windows())
+        dead = np.setdiff1d(hwnd_array(self._stack_of.keys()), alive)
+        for hwnd in dead.tolist():
+            # 主窗口先被移除时，它的工具窗口已经一起移除
+            record = self.get(hwnd)
+            if record is not None:
+                self.remove_window(record)
+        return len(dead) > 0
 
+    # === 重新计算序号 === #
+    def _ensure_ranks(self):
+        """按块在栈内的位置重新编号，块内的工具窗口与主窗口同号"""
+        for stack in self._stacks.values():
+            if not stack.ranks_dirty:
+                continue
+            for rank, block in enumerate(stack.blocks(), start=1):
+                for record in block.records():
+                    record.rank = rank
+            stack.ranks_dirty = False
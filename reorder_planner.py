@@ -0,0 +1,103 @@
+# reorder_planner.py
+"""
+最少移动重排规划（纯 Python，不依赖任何 Windows API）。
+
+思路：把“当前 Z 序”映射成“期望顺序中的下标”序列，
+其中最长递增子序列 (LIS) 上的窗口相对顺序已经正确，保持不动；
+其余窗口按期望顺序从上到下依次插到它的前一个窗口之后即可。
+"""
+from bisect import bisect_left
+
+
+def longest_increasing_subsequence(seq):
+    """返回 seq 中一个最长严格递增子序列的下标列表（O(n log n)）"""
+    tails = []        # tails[k]: 长度为 k+1 的递增子序列的最小结尾值
+    tails_idx = []    # tails_idx[k]: 该结尾值在 seq 中的下标
+    prev = [-1] * len(seq)
+
+    for i, value in enumerate(seq):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tails_idx.append(i)
+        else:
+            tails[k] = value
+            tails_idx[k] = i
+        prev[i] = tails_idx[k - 1] if k > 0 else -1
+
+    result = []
+    i = tails_idx[-1] if tails_idx else -1
+    while i != -1:
+        result.append(i)
+        i = prev[i]
+    result.reverse()
+    return result
+
+
+def plan_moves(desired, current, force_move=()):
+    """
+    计算把 current 调整为 desired 所需的最少移动。
+
+    desired: 期望顺序（从上到下）的 hwnd 列表
+    current: 当前实际 Z 序（从上到下），只看 desired 中出现的 hwnd
+    force_move: 无论如何都要移动的 hwnd（例如需要先取消 TopMost 的窗口）
+    返回 [(hwnd, insert_after), ...]，insert_after 为 None 表示放到最顶层；
+    顺序已经正确时返回空列表。
+    """
+    position = {hwnd: i for i, hwnd in enumerate(desired)}
+    force_move = set(force_move)
+
+    # 当前顺序中参与比较的窗口，在期望顺序里的下标
+    ranked = [position[hwnd] for hwnd in current
+              if hwnd in position and hwnd not in force_move]
+
+    keep = {desired[ranked[i]] for i in longest_increasing_subsequence(ranked)}
+
+    moves = []
+    for i, hwnd in enumerate(desired):
+        if hwnd in keep:
+            continue
+        # 按期望顺序从上到下处理，前一个窗口此时一定已经在正确位置
+        insert_after = desired[i - 1] if i > 0 else None
+        moves.append((hwnd, insert_after))
+    return moves
+
+
+def apply_moves(stack, moves):
+    """在一个模拟的 Z 序列表（从上到下）上执行 moves，返回新列表，用于校验规划结果"""
+    stack = list(stack)
+    for hwnd, insert_after in moves:
+        if hwnd in stack:
+            stack.remove(hwnd)
+        if insert_after is None:
+            stack.insert(0, hwnd)
+        else:
+            stack.insert(stack.index(insert_after) + 1, hwnd)
+    return stack
+
+
+if __name__ == '__main__':
+    # 快速自检；随机栈与穷举对比的完整校验见 benchmark.py 的 bench_reorder_planner
+    desired = list(range(1, 21))
+
+    # 1. 顺序已正确：不需要任何移动
+    assert plan_moves(desired, desired) == []
+
+    # 2. 用户点击了第 7 个窗口，它被提到最顶层：只需移动一次
+    stack = [7] + [h for h in desired if h != 7]
+    moves = plan_moves(desired, stack)
+    assert moves == [(7, 6)], moves
+    assert apply_moves(stack, moves) == desired
+
+    # 3. 整体倒序：除一个窗口外全部移动
+    stack = desired[::-1]
+    moves = plan_moves(desired, stack)
+    assert len(moves) == len(desired) - 1, moves
+    assert apply_moves(stack, moves) == desired
+
+    # 4. 夹杂非受管窗口、强制移动的窗口
+    stack = [100, 3, 101, 1, 2, 102] + desired[3:]
+    moves = plan_moves(desired, stack, force_move={10})
+    assert [h for h in apply_moves(stack, moves) if h in set(desired)] == desired
+    assert sorted(hwnd for hwnd, _ in moves) == [3, 10], moves
+    print("reorder_planner: ok")
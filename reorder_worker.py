@@ -0,0 +1,129 @@
+# reorder_worker.py
+import threading
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+from logger import logger
+
+
+class ReorderCommand:
+    """
+    一次待执行的后台任务。
+    new_windows: 需要做子窗口归属检测的新窗口 [(hwnd, title)]
+    reorder / full: 是否执行重排、是否全量重排
+    stacks: 只重排这些栈（触发窗口所在的栈），None 表示全部栈
+    trace: 触发这次重排的追踪记录 (tracing.Trace)，未启用追踪时为 None
+    """
+    __slots__ = ('new_windows', 'reorder', 'full', 'stacks', 'trace')
+
+    def __init__(self, new_windows=(), reorder=True, full=False, stacks=None, trace=None):
+        self.new_windows = list(new_windows)
+        self.reorder = reorder
+        self.full = full
+        self.stacks = None if stacks is None else set(stacks)
+        self.trace = trace
+
+    def merge(self, other):
+        """后到的命令覆盖先到的（latest wins），但新窗口不能丢，全量重排也不能被降级"""
+        self.new_windows.extend(other.new_windows)
+        self.reorder = self.reorder or other.reorder
+        self.full = self.full or other.full
+        # 要重排的栈取并集，任一方不限范围时整体不限
+        if self.stacks is None or other.stacks is None:
+            self.stacks = None
+        else:
+            self.stacks |= other.stacks
+        # 延迟按最早的触发计算
+        if self.trace is None:
+            self.trace = other.trace
+
+
+class ReorderWorker(QObject):
+    """
+    重排工作线程：子窗口扫描和 SetWindowPos 都在这里执行，界面线程不再被无响应的窗口卡住。
+
+    命令队列只有一个槽位：执行中再提交的命令会合并进槽位，当前任务结束后只再执行一次。
+    每次执行完把引擎的不可变快照 (EngineSnapshot) 和追踪记录发回界面。
+    """
+
+    finished = Signal(object, object)
+    _wake = Signal()
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        # 子窗口归属检测依赖 NumPy，第一次扫描时才创建（不拖慢启动）
+        self.attributor = None
+
+        self._slot = None
+        self._slot_lock = threading.Lock()
+
+        self.thread = QThread()
+        self.thread.setObjectName("ReorderWorker")
+        self.moveToThread(self.thread)
+        self._wake.connect(self._run)
+
+    # === 生命周期 === #
+    def start(self):
+        if not self.thread.isRunning():
+            self.thread.start()
+
+    def stop(self, timeout_ms=2000):
+        self.thread.quit()
+        if not self.thread.wait(timeout_ms):
+            logger.warning("[重排线程] 退出超时（可能卡在无响应的窗口上）")
+
+    # === 提交命令（任意线程） === #
+    def submit(self, command: ReorderCommand):
+        with self._slot_lock:
+            if self._slot is not None:
+                self._slot.merge(command)
+                return
+            self._slot = command
+        self._wake.emit()
+
+    # === 工作线程 === #
+    def _run(self):
+        with self._slot_lock:
+            command, self._slot = self._slot, None
+        if command is None:
+            return
+
+        trace = command.trace
+        if trace:
+            trace.stamp('queue')
+        try:
+            if command.new_windows:
+                self._scan_for_child_windows(command.new_windows)
+            if trace:
+                trace.stamp('scan')
+            if command.reorder:
+                self.engine.execute_reorder(full=command.full, stacks=command.stacks)
+            if trace:
+                trace.stamp('reorder')
+        except Exception as e:
+            logger.error("[重排线程] 执行失败: %s", e)
+
+        self.finished.emit(self.engine.snapshot(), trace)
+
+    def _scan_for_child_windows(self, new_windows):
+        if self.attributor is None:
+            from child_attribution import ChildAttributor
+            self.attributor = ChildAttributor()
+        # 每个新窗口只查询一次 Owner / PID / 样式，规则与 win_api.is_son_window 相同
+        self.attributor.scan(self.engine, new_windows)
+
+        # 普通pid检测
+        # managed_pids = {}
+        # for target in targets:
+        #     pid = win_api.get_window_pid(target.hwnd)
+        #     if pid:
+        #         managed_pids[pid] = target.hwnd
+
+        # for hwnd, title in current_windows:
+        #     if hwnd in new_hwnds:
+        #         new_pid = win_api.get_window_pid(hwnd)
+        #
+        #         if new_pid in managed_pids:
+        #             parent_hwnd = managed_pids[new_pid]
+        #             self.engine.insert_derived_window(hwnd, title, parent_hwnd)
@@ -0,0 +1,437 @@
+# sim_backend.py
+"""
+内存桌面模拟器：不依赖 Windows，用于在 Linux / CI 上运行引擎、监控逻辑和子窗口扫描，
+并统计原生调用次数和耗时。
+
+    desktop = SimulatedDesktop(latency=0.0002)
+    desktop.populate(3000)
+    win_api.set_backend(desktop)
+"""
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+
+from win_backend import (
+    WindowBackend,
+    HWND_TOP, HWND_BOTTOM, HWND_TOPMOST, HWND_NOTOPMOST,
+    GWL_STYLE, GWL_EXSTYLE,
+    WS_EX_TOPMOST, WS_EX_TOOLWINDOW,
+    SWP_NOZORDER, SWP_SHOWWINDOW,
+    EVENT_OBJECT_CREATE, EVENT_OBJECT_DESTROY, EVENT_OBJECT_SHOW, EVENT_OBJECT_HIDE,
+    EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_CLOAKED, EVENT_OBJECT_UNCLOAKED,
+    EVENT_OBJECT_LOCATIONCHANGE, EVENT_SYSTEM_MINIMIZESTART, EVENT_SYSTEM_MINIMIZEEND,
+    EVENT_SYSTEM_FOREGROUND,
+    OBJID_WINDOW, CHILDID_SELF,
+)
+
+
+class SimWindow:
+    __slots__ = ('hwnd', 'title', 'pid', 'style', 'ex_style', 'owner',
+                 'visible', 'iconic', 'cloaked', 'rect', 'icon', 'hung', 'class_name', 'pushy')
+
+    def __init__(self, hwnd, title, pid, style=0, ex_style=0, owner=0,
+                 visible=True, iconic=False, cloaked=False, rect=(0, 0, 800, 600), icon=0,
+                 class_name="SimWindow"):
+        self.hwnd = hwnd
+        self.title = title
+        self.pid = pid
+        self.style = style
+        self.ex_style = ex_style
+        self.owner = owner
+        self.visible = visible
+        self.iconic = iconic
+        self.cloaked = cloaked
+        self.rect = rect
+        self.icon = icon
+        self.hung = False
+        self.class_name = class_name
+        self.pushy = False
+
+    @property
+    def topmost(self):
+        return bool(self.ex_style & WS_EX_TOPMOST)
+
+
+class SimulatedDesktop(WindowBackend):
+    """
+    一个带真实 Z 序列表的模拟桌面。
+
+    latency: 每次后端调用的模拟耗时（秒），忙等实现，亚毫秒级也准确
+    latency_overrides: 按方法名单独设置耗时，例如 {'set_window_pos': 0.002}
+    hang_time: 对无响应窗口 (set_hung) 发起同步调用时卡住的时间（秒）
+    calls: 各方法的调用次数 (collections.Counter)
+    """
+
+    def __init__(self, latency=0.0, latency_overrides=None):
+        self.latency = latency
+        self.latency_overrides = dict(latency_overrides or {})
+        self.calls = Counter()
+        self.fail_defer = False
+        self.hang_time = 1.0
+
+        self._windows = {}
+        self._z = []  # 从上到下
+        self._z_pos = None  # hwnd -> 下标，Z 序变化后懒重建
+        self._foreground = 0
+        self._next_hwnd = itertools.count(0x10000, 4)
+        self._next_hdwp = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._hooks = {}
+        self._next_hook = itertools.count(1)
+        self._process_paths = {}  # pid -> 可执行文件路径
+
+    # === 模拟器控制接口（不计入调用次数） === #
+    def add_window(self, title, pid=None, style=0, ex_style=0, owner=0,
+                   visible=True, iconic=False, cloaked=False, rect=(0, 0, 800, 600), icon=0,
+                   class_name="SimWindow"):
+        """创建一个窗口并放到 Z 序最顶层，返回 hwnd"""
+        with self._lock:
+            hwnd = next(self._next_hwnd)
+            if pid is None:
+                pid = hwnd
+            self._windows[hwnd] = SimWindow(hwnd, title, pid, style, ex_style, owner,
+                                            visible, iconic, cloaked, rect, icon, class_name)
+            self._z.insert(self._band_top(self._windows[hwnd].topmost), hwnd)
+            self._z_pos = None
+
+        self.fire_event(EVENT_OBJECT_CREATE, hwnd)
+        if visible:
+            self.fire_event(EVENT_OBJECT_SHOW, hwnd)
+        return hwnd
+
+    def close_window(self, hwnd):
+        with self._lock:
+            if self._windows.pop(hwnd, None) is None:
+                return
+            self._z.remove(hwnd)
+            self._z_pos = None
+            refocus = self._foreground == hwnd
+            if refocus:
+                self._foreground = self._z[0] if self._z else 0
+
+        self.fire_event(EVENT_OBJECT_DESTROY, hwnd)
+        if refocus and self._foreground:
+            self.fire_event(EVENT_SYSTEM_FOREGROUND, self._foreground)
+
+    def set_visible(self, hwnd, visible):
+        self._windows[hwnd].visible = visible
+        self.fire_event(EVENT_OBJECT_SHOW if visible else EVENT_OBJECT_HIDE, hwnd)
+
+    def move_window(self, hwnd, rect):
+        """移动 / 改变窗口大小，rect = (left, top, right, bottom)"""
+        self._windows[hwnd].rect = rect
+        self.fire_event(EVENT_OBJECT_LOCATIONCHANGE, hwnd)
+
+    def set_iconic(self, hwnd, iconic):
+        self._windows[hwnd].iconic = iconic
+        self.fire_event(EVENT_SYSTEM_MINIMIZESTART if iconic else EVENT_SYSTEM_MINIMIZEEND, hwnd)
+
+    def set_title(self, hwnd, title):
+        self._windows[hwnd].title = title
+        self.fire_event(EVENT_OBJECT_NAMECHANGE, hwnd)
+
+    def set_cloaked(self, hwnd, cloaked):
+        self._windows[hwnd].cloaked = cloaked
+        self.fire_event(EVENT_OBJECT_CLOAKED if cloaked else EVENT_OBJECT_UNCLOAKED, hwnd)
+
+    def set_hung(self, hwnd, hung):
+        """模拟窗口无响应：带超时的窗口消息会等满超时后失败"""
+        self._windows[hwnd].hung = hung
+
+    def set_pushy(self, hwnd, pushy):
+        """模拟在 WM_WINDOWPOSCHANGED 里把自己激活的应用：每次被 SetWindowPos 移动后抢到前台（并浮到最上面）"""
+        self._windows[hwnd].pushy = pushy
+
+    def set_process_path(self, pid, path):
+        self._process_paths[pid] = path
+
+    def fire_event(self, event, hwnd, id_object=OBJID_WINDOW, id_child=CHILDID_SELF):
+        """向所有订阅了该事件的钩子同步投递一个 WinEvent（也可用来注入合成事件流）"""
+        w = self._windows.get(hwnd)
+        pid = w.pid if w is not None else 0
+        for event_min, event_max, callback, hook_pid in list(self._hooks.values()):
+            if event_min <= event <= event_max and (not hook_pid or hook_pid == pid):
+                callback(event, hwnd, id_object, id_child)
+
+    def window(self, hwnd):
+        return self._windows[hwnd]
+
+    def activate(self, hwnd):
+        """模拟用户点击：窗口提到最顶层并成为前台窗口"""
+        with self._lock:
+            self._raise(hwnd)
+            self._foreground = hwnd
+
+        self.fire_event(EVENT_SYSTEM_FOREGROUND, hwnd)
+
+    def z_order(self):
+        """当前完整 Z 序（从上到下）"""
+        return list(self._z)
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def populate(self, count, seed=0, tool_ratio=0.1, hidden_ratio=0.2):
+        """
+        生成 count 个窗口：大部分是普通可见窗口，另有一定比例的隐藏窗口
+        和属于同一进程的工具窗口，用于模拟窗口很多的桌面。
+        """
+        rnd = random.Random(seed)
+        created = []
+        for i in range(count):
+            roll = rnd.random()
+            if created and roll < tool_ratio:
+                parent = self._windows[rnd.choice(created)]
+                hwnd = self.add_window(f"Tool {i}", pid=parent.pid, ex_style=WS_EX_TOOLWINDOW)
+            elif roll < tool_ratio + hidden_ratio:
+                hwnd = self.add_window("", visible=False)
+            else:
+                # 多个进程共用同一个程序（同一路径、同一图标），例如多开的浏览器
+                app = rnd.randrange(max(1, count // 20))
+                x, y = rnd.randrange(0, 1600), rnd.randrange(0, 900)
+                hwnd = self.add_window(f"Window {i}", rect=(x, y, x + 640, y + 480), icon=0x1000 + app)
+                self._process_paths[self._windows[hwnd].pid] = f"C:\\Sim\\app{app}.exe"
+                created.append(hwnd)
+        return created
+
+    # === 内部工具 === #
+    def _tick(self, name):
+        self.calls[name] += 1
+        cost = self.latency_overrides.get(name, self.latency)
+        if cost > 0:
+            end = time.perf_counter() + cost
+            while time.perf_counter() < end:
+                pass
+
+    def _block_if_hung(self, hwnds):
+        """同步调用碰到无响应窗口时，调用方被卡住 hang_time 秒"""
+        for hwnd in hwnds:
+            w = self._windows.get(hwnd)
+            if w is not None and w.hung:
+                time.sleep(self.hang_time)
+                return
+
+    def _activate_pushy(self, hwnds):
+        for hwnd in hwnds:
+            w = self._windows.get(hwnd)
+            if w is not None and w.pushy:
+                self.activate(hwnd)
+
+    def _position(self, hwnd):
+        if self._z_pos is None:
+            self._z_pos = {h: i for i, h in enumerate(self._z)}
+        return self._z_pos[hwnd]
+
+    def _band_top(self, topmost):
+        """非置顶窗口区段的起始下标（置顶窗口永远在它上面）"""
+        if topmost:
+            return 0
+        for i, hwnd in enumerate(self._z):
+            if not self._windows[hwnd].topmost:
+                return i
+        return len(self._z)
+
+    def _raise(self, hwnd):
+        self._z.remove(hwnd)
+        self._z.insert(self._band_top(self._windows[hwnd].topmost), hwnd)
+        self._z_pos = None
+
+    def _apply_window_pos(self, hwnd, insert_after, flags):
+        w = self._windows.get(hwnd)
+        if w is None:
+            raise OSError(f"无效的窗口句柄: {hwnd}")
+
+        if flags & SWP_SHOWWINDOW:
+            w.visible = True
+        if flags & SWP_NOZORDER:
+            return
+
+        if insert_after == HWND_NOTOPMOST:
+            if w.topmost:
+                w.ex_style &= ~WS_EX_TOPMOST
+                self._raise(hwnd)
+            return
+
+        if insert_after == HWND_TOPMOST:
+            w.ex_style |= WS_EX_TOPMOST
+            self._raise(hwnd)
+            return
+
+        if insert_after == HWND_TOP:
+            self._raise(hwnd)
+            return
+
+        self._z.remove(hwnd)
+        self._z_pos = None
+        if insert_after == HWND_BOTTOM:
+            w.ex_style &= ~WS_EX_TOPMOST
+            self._z.append(hwnd)
+            return
+
+        # 插到某个窗口后面：继承它的置顶状态
+        if not self._windows[insert_after].topmost:
+            w.ex_style &= ~WS_EX_TOPMOST
+        self._z.insert(self._z.index(insert_after) + 1, hwnd)
+
+    # === WindowBackend 接口 === #
+    def enum_windows(self):
+        self._tick('enum_windows')
+        return list(self._z)
+
+    def is_window(self, hwnd):
+        self._tick('is_window')
+        return hwnd in self._windows
+
+    def is_window_visible(self, hwnd):
+        self._tick('is_window_visible')
+        w = self._windows.get(hwnd)
+        return w is not None and w.visible
+
+    def is_hung(self, hwnd):
+        self._tick('is_hung')
+        w = self._windows.get(hwnd)
+        return w is not None and w.hung
+
+    def is_iconic(self, hwnd):
+        self._tick('is_iconic')
+        w = self._windows.get(hwnd)
+        return w is not None and w.iconic
+
+    def is_cloaked(self, hwnd):
+        self._tick('is_cloaked')
+        w = self._windows.get(hwnd)
+        return w is not None and w.cloaked
+
+    def get_window_text(self, hwnd):
+        self._tick('get_window_text')
+        w = self._windows.get(hwnd)
+        return w.title if w else ""
+
+    def get_window_text_length(self, hwnd):
+        self._tick('get_window_text_length')
+        w = self._windows.get(hwnd)
+        return len(w.title) if w else 0
+
+    def get_class_name(self, hwnd):
+        self._tick('get_class_name')
+        w = self._windows.get(hwnd)
+        return w.class_name if w else ""
+
+    def get_owner(self, hwnd):
+        self._tick('get_owner')
+        w = self._windows.get(hwnd)
+        return w.owner if w else 0
+
+    def get_window_pid(self, hwnd):
+        self._tick('get_window_pid')
+        w = self._windows.get(hwnd)
+        return w.pid if w else 0
+
+    def get_window_long(self, hwnd, index):
+        self._tick('get_window_long')
+        w = self._windows.get(hwnd)
+        if w is None:
+            return 0
+        if index == GWL_STYLE:
+            return w.style
+        if index == GWL_EXSTYLE:
+            return w.ex_style
+        return 0
+
+    def get_top_window(self):
+        self._tick('get_top_window')
+        return self._z[0] if self._z else 0
+
+    def get_next_window(self, hwnd):
+        self._tick('get_next_window')
+        i = self._position(hwnd) + 1
+        return self._z[i] if i < len(self._z) else 0
+
+    def set_window_pos(self, hwnd, insert_after, flags):
+        self._tick('set_window_pos')
+        self._block_if_hung([hwnd])
+        with self._lock:
+            self._apply_window_pos(hwnd, insert_after, flags)
+        self._activate_pushy([hwnd])
+
+    def begin_defer_window_pos(self, count):
+        self._tick('begin_defer_window_pos')
+        hdwp = next(self._next_hdwp)
+        self._pending[hdwp] = []
+        return hdwp
+
+    def defer_window_pos(self, hdwp, hwnd, insert_after, flags):
+        self._tick('defer_window_pos')
+        if self.fail_defer:
+            self._pending.pop(hdwp, None)
+            raise OSError("DeferWindowPos 失败 (模拟)")
+        self._pending[hdwp].append((hwnd, insert_after, flags))
+        return hdwp
+
+    def end_defer_window_pos(self, hdwp):
+        self._tick('end_defer_window_pos')
+        pending = self._pending.pop(hdwp)
+        self._block_if_hung([hwnd for hwnd, _, _ in pending])
+        with self._lock:
+            for hwnd, insert_after, flags in pending:
+                self._apply_window_pos(hwnd, insert_after, flags)
+        self._activate_pushy([hwnd for hwnd, _, _ in pending])
+
+    def get_window_rect(self, hwnd):
+        self._tick('get_window_rect')
+        return self._windows[hwnd].rect
+
+    def window_from_point(self, x, y):
+        self._tick('window_from_point')
+        for hwnd in self._z:
+            w = self._windows[hwnd]
+            left, top, right, bottom = w.rect
+            if w.visible and not w.iconic and left <= x < right and top <= y < bottom:
+                return hwnd
+        return 0
+
+    def get_root_window(self, hwnd):
+        self._tick('get_root_window')
+        # 模拟器里只有顶层窗口
+        return hwnd
+
+    def get_foreground_window(self):
+        self._tick('get_foreground_window')
+        return self._foreground
+
+    def get_window_icon(self, hwnd, timeout_ms=None):
+        self._tick('get_window_icon')
+        w = self._windows.get(hwnd)
+        if w is None:
+            return 0
+        if w.hung:
+            if timeout_ms is None:
+                self._block_if_hung([hwnd])
+            else:
+                time.sleep(timeout_ms / 1000)
+                raise TimeoutError(f"窗口 {hwnd} 消息超时")
+        return w.icon
+
+    def icon_to_image(self, hicon):
+        # 模拟图标：用句柄值决定颜色的纯色方块，相同句柄得到相同内容
+        from PySide6.QtGui import QImage, QColor
+        image = QImage(32, 32, QImage.Format_ARGB32)
+        image.fill(QColor.fromRgb(0xFF000000 | (hicon * 2654435761) & 0xFFFFFF))
+        return image
+
+    def get_process_image_path(self, pid):
+        self._tick('get_process_image_path')
+        return self._process_paths.get(pid, f"C:\\Sim\\process{pid}.exe")
+
+    def add_win_event_hook(self, event_min, event_max, callback, pid=0):
+        self._tick('add_win_event_hook')
+        handle = next(self._next_hook)
+        self._hooks[handle] = (event_min, event_max, callback, pid)
+        return handle
+
+    def remove_win_event_hook(self, handle):
+        self._tick('remove_win_event_hook')
+        self._hooks.pop(handle, None)
@@ -0,0 +1,174 @@
+# startup_profile.py
+"""
+启动耗时报告 (--startup-profile)：各启动阶段的墙钟时间、阶段内的导入耗时，以及导入最慢的模块。
+
+导入耗时由 sys.meta_path 最前面的查找器统计：它不自己查找模块，只把其他查找器返回的 loader 包一层，
+给 create_module / exec_module 计时，模块加载完后换回原来的 loader。
+所以源码运行和 Nuitka 编译后（编译进来的模块由 Nuitka 自己的 loader 加载）都能统计，
+而 -X importtime 在编译后的程序里不可用。
+
+    profile = startup_profile.get_profile()
+    profile.enable()                 # 越早越好：之前导入的模块不计入
+    with profile.phase('window'):
+        ...
+    profile.mark('first_frame')
+    profile.report()
+"""
+import contextlib
+import sys
+import time
+
+_profile = None
+
+
+def get_profile():
+    global _profile
+    if _profile is None:
+        _profile = StartupProfile()
+    return _profile
+
+
+class _TimedLoader:
+    """代理原 loader：只给模块创建和执行计时，其余属性（资源读取等）原样转发"""
+
+    def __init__(self, loader, profile):
+        self._loader = loader
+        self._profile = profile
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        create = getattr(self._loader, 'create_module', None)
+        if create is None:
+            return None
+        # 扩展模块（.pyd / .so）的加载主要花在这里
+        with self._profile.importing(spec.name):
+            return create(spec)
+
+    def exec_module(self, module):
+        try:
+            with self._profile.importing(module.__name__):
+                self._loader.exec_module(module)
+        finally:
+            # 换回原 loader，之后的代码看到的 __loader__ / __spec__.loader 与不计时时相同
+            module.__loader__ = self._loader
+            if module.__spec__ is not None:
+                module.__spec__.loader = self._loader
+
+
+class _TimingFinder:
+    def __init__(self, profile):
+        self._profile = profile
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self._profile)
+        return spec
+
+
+class StartupProfile:
+    """
+    未启用时 phase() / mark() 几乎没有开销，正常启动时不需要判断是否开启了统计。
+    phases: [(名称, 开始, 结束, 阶段内导入耗时)]，时间均为相对 enable() 的秒数
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._origin = None
+        self._finder = None
+        self.phases = []
+        self.marks = []
+
+        # 导入统计：模块名 -> [累计, 自身]；_stack 为正在导入的模块 [开始时间, 子模块耗时]
+        self.imports = {}
+        self._stack = []
+        self._import_total = 0.0
+
+    # === 开关 === #
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._origin = time.perf_counter()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def disable(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+        self.enabled = False
+
+    def elapsed(self):
+        return time.perf_counter() - self._origin
+
+    # === 阶段 === #
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = self.elapsed()
+        imports_before = self._import_total
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, self.elapsed(), self._import_total - imports_before))
+
+    def mark(self, name):
+        """记录一个时间点（例如首帧显示、顶层导入结束）"""
+        if self.enabled:
+            self.marks.append((name, self.elapsed()))
+
+    # === 导入 === #
+    @contextlib.contextmanager
+    def importing(self, name):
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            cumulative = time.perf_counter() - frame[0]
+            entry = self.imports.setdefault(name, [0.0, 0.0])
+            entry[0] += cumulative
+            entry[1] += cumulative - frame[1]
+            if self._stack:
+                self._stack[-1][1] += cumulative
+            else:
+                self._import_total += cumulative
+
+    # === 报告 === #
+    def report(self, top=15):
+        """报告各阶段和导入最慢的模块，返回报告的各行（同时写入日志）"""
+        if not self.enabled:
+            return []
+        lines = [f"[启动耗时] 自开始计时 {self.elapsed() * 1000:.1f} ms，其中导入 {self._import_total * 1000:.1f} ms"]
+        for name, at in self.marks:
+            lines.append(f"  @ {at * 1000:8.1f} ms  {name}")
+        for name, start, end, imports in self.phases:
+            lines.append(f"  {name:<12} 开始 {start * 1000:8.1f} ms | 耗时 {(end - start) * 1000:8.1f} ms | "
+                         f"其中导入 {imports * 1000:7.1f} ms")
+
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        lines.append(f"  导入最慢的 {len(slowest)} 个模块（累计 / 自身）：")
+        for name, (cumulative, own) in slowest:
+            lines.append(f"    {cumulative * 1000:8.1f} ms / {own * 1000:7.1f} ms  {name}")
+
+        from logger import logger
+        for line in lines:
+            logger.info("%s", line)
+        return lines
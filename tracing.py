@@ -0,0 +1,164 @@
+# tracing.py
+"""
+触发到稳定的延迟追踪：一次点击 / 按键从钩子回调到右侧列表刷新完成，按阶段打时间戳。
+
+每个阶段的耗时 = 本次打点与上一次打点的间隔，所以排队、跨线程等待也算在对应阶段里：
+    hook     钩子回调（点击预过滤）           ring     钩子进程模式：钩子回调到主线程取出
+    signal   Qt 跨线程信号到达主线程          handle   _handle_mouse_release / _handle_input_action
+    delay    调度器等待（原 10ms singleShot） queue    命令交给重排线程
+    scan     子窗口扫描                       reorder  execute_reorder
+    deliver  结果快照回到界面线程             refresh  refresh_target_ui
+
+    tracer = tracing.get_tracer()
+    trace = tracer.start()          # 未启用时返回 None，各处只做一次判空
+    if trace: trace.stamp('hook')
+    ...
+    tracer.finish(trace)            # 计入各阶段和端到端的滚动分位数
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 面板中的阶段顺序
+STAGES = ('hook', 'ring', 'signal', 'handle', 'delay', 'queue', 'scan', 'reorder', 'deliver', 'refresh')
+TOTAL = 'total'
+
+_tracer = None
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+class Trace:
+    """一次触发；spans: [(阶段, 开始 ns, 结束 ns, 线程 id)]"""
+    __slots__ = ('id', 'start_ns', 'last_ns', 'spans')
+
+    def __init__(self, trace_id, start_ns):
+        self.id = trace_id
+        self.start_ns = start_ns
+        self.last_ns = start_ns
+        self.spans = []
+
+    def stamp(self, stage):
+        now = time.perf_counter_ns()
+        self.spans.append((stage, self.last_ns, now, threading.get_ident()))
+        self.last_ns = now
+
+    @property
+    def duration_ns(self):
+        return self.last_ns - self.start_ns
+
+
+class Tracer:
+    """
+    enabled=False 时 start() 直接返回 None，调用方只多一次判空。
+    window: 每个阶段保留最近多少次耗时用于计算分位数
+    keep: 保留最近多少次完整的触发用于导出 Chrome Trace
+    """
+
+    def __init__(self, enabled=False, window=1024, keep=256):
+        self.enabled = enabled
+        self.window = window
+        self._ids = itertools.count(1)
+        self._durations = {}
+        self._completed = deque(maxlen=keep)
+
+        # 已请求重排、等待调度器执行的触发（只在主线程访问）
+        self._queued = None
+        self.coalesced = 0
+
+    # === 打点 === #
+    def start(self, start_ns=None):
+        """开始一次触发；start_ns 可以是其他进程用 perf_counter_ns 记录的时间"""
+        if not self.enabled:
+            return None
+        if start_ns is None:
+            start_ns = time.perf_counter_ns()
+        return Trace(next(self._ids), start_ns)
+
+    def queue(self, trace):
+        """触发请求了重排；调度器执行前到达的后续触发被合并，延迟按最早那次计算"""
+        if trace is None:
+            return
+        if self._queued is None:
+            self._queued = trace
+        else:
+            self.coalesced += 1
+
+    def take_queued(self):
+        trace, self._queued = self._queued, None
+        return trace
+
+    def finish(self, trace):
+        if trace is None:
+            return
+        durations = self._durations
+        for stage, begin, end, _ in trace.spans:
+            samples = durations.get(stage)
+            if samples is None:
+                samples = durations[stage] = deque(maxlen=self.window)
+            samples.append(end - begin)
+
+        totals = durations.get(TOTAL)
+        if totals is None:
+            totals = durations[TOTAL] = deque(maxlen=self.window)
+        totals.append(trace.duration_ns)
+        self._completed.append(trace)
+
+    def reset(self):
+        self._durations = {}
+        self._completed.clear()
+        self._queued = None
+        self.coalesced = 0
+
+    # === 统计 === #
+    def percentiles(self):
+        """{阶段: (次数, p50, p95, p99)}，单位毫秒；按 STAGES 顺序，最后是端到端 total"""
+        result = {}
+        for stage in STAGES + (TOTAL,):
+            samples = self._durations.get(stage)
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[stage] = (len(ordered),) + tuple(
+                _nearest_rank(ordered, q) / 1e6 for q in (50, 95, 99)
+            )
+        return result
+
+    # === 导出 === #
+    def export_chrome_trace(self, path):
+        """写出 chrome://tracing / Perfetto 可打开的 JSON，返回导出的触发数"""
+        pid = os.getpid()
+        events = []
+        tids = set()
+        for trace in list(self._completed):
+            for stage, begin, end, tid in trace.spans:
+                tids.add(tid)
+                events.append({
+                    "name": stage, "cat": "trigger", "ph": "X", "pid": pid, "tid": tid,
+                    "ts": begin / 1e3, "dur": (end - begin) / 1e3,
+                    "args": {"trace": trace.id},
+                })
+
+        # 线程名（已结束的线程只保留 id）
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for tid in tids:
+            if tid in names:
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                               "args": {"name": names[tid]}})
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(self._completed)
+
+
+def _nearest_rank(ordered, q):
+    index = max(0, -(-len(ordered) * q // 100) - 1)
+    return ordered[index]
@@ -0,0 +1,94 @@
+# trigger_scheduler.py
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class TriggerScheduler(QObject):
+    """
+    重排触发调度器：位于监控器和引擎之间，把短时间内的多次重排请求合并为一次执行。
+
+    - delay_ms: 收到请求后至少等待的时间（等输入法候选窗口消失，原来的 10ms 延迟）
+    - min_interval_ms: 两次执行之间的最小间隔
+    - max_rate: 每秒最多执行次数
+    在等待期间到达的请求全部并入同一次执行；执行之后再到达的请求会再安排一次，
+    所以最后一个事件之后一定还有一次执行（尾随执行）。
+
+    请求可以带一个 key（触发重排的窗口），fired 时交出这次执行合并的全部 key (frozenset)；
+    只要有一个请求没带 key，就交出 None（不限范围）。
+    """
+
+    fired = Signal(object)
+
+    def __init__(self, delay_ms=10, min_interval_ms=50, max_rate=10, parent=None):
+        super().__init__(parent)
+        self.delay_ms = delay_ms
+        self.min_interval_ms = min_interval_ms
+        self.max_rate = max_rate
+
+        # 计数器
+        self.received = 0
+        self.executed = 0
+
+        self._last_run = None
+        self._recent_runs = deque()
+        self._keys = set()
+        self._all = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    # === 请求 === #
+    def request(self, key=None):
+        """请求一次重排；已有待执行的重排时直接合并"""
+        self.received += 1
+        if key is None:
+            self._all = True
+        else:
+            self._keys.add(key)
+        if self._timer.isActive():
+            return
+
+        self._timer.start(self._next_delay_ms())
+
+    @property
+    def pending(self):
+        return self._timer.isActive()
+
+    def stats(self):
+        """触发统计：收到的请求数、实际执行数、被合并掉的请求数"""
+        pending = 1 if self.pending else 0
+        return {
+            "received": self.received,
+            "executed": self.executed,
+            "coalesced": self.received - self.executed - pending,
+        }
+
+    # === 内部 === #
+    def _next_delay_ms(self):
+        now = time.monotonic()
+        earliest = now + self.delay_ms / 1000
+
+        # 最小间隔
+        if self._last_run is not None:
+            earliest = max(earliest, self._last_run + self.min_interval_ms / 1000)
+
+        # 最大频率：最近 1 秒内已执行满 max_rate 次时，等最早那次滑出窗口
+        while self._recent_runs and self._recent_runs[0] <= now - 1.0:
+            self._recent_runs.popleft()
+        if self.max_rate and len(self._recent_runs) >= self.max_rate:
+            earliest = max(earliest, self._recent_runs[0] + 1.0)
+
+        return max(0, round((earliest - now) * 1000))
+
+    def _fire(self):
+        now = time.monotonic()
+        self._last_run = now
+        self._recent_runs.append(now)
+        self.executed += 1
+        keys = None if self._all else frozenset(self._keys)
+        self._keys = set()
+        self._all = False
+        self.fired.emit(keys)
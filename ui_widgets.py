@@ -1,110 +1,299 @@
 # ui_widgets.py
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel, QLineEdit, QSizePolicy, QListWidgetItem
-from PySide6.QtGui import QIntValidator
-from PySide6.QtCore import Qt, Signal, QObject
-import win_api
+from PySide6.QtWidgets import (QStyledItemDelegate, QStyle, QDialog, QVBoxLayout, QHBoxLayout, QCheckBox,
+                               QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, QLabel, QFileDialog)
+from collections import namedtuple
 
+from PySide6.QtGui import QIcon
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QTimer
+import icon_loader
+import reorder_planner
+import tracing
 
-class ItemData(QObject):
-    rank_updated = Signal(int)
-    title_updated = Signal(str)
 
-    def __init__(self, hwnd: int, title: str, rank: int = None, window_type: str = 'STANDARD'):
-        super().__init__()
-        self._hwnd = hwnd
-        self._title = title
-        self._rank = rank
-        self._window_type = window_type
+# 自定义数据角色
+ITEM_ROLE = Qt.UserRole
+RANK_ROLE = Qt.UserRole + 1
+QUARANTINED_ROLE = Qt.UserRole + 2
 
-    @property
-    def hwnd(self):
-        return self._hwnd
+# 排序层级里每个栈的标题行：hwnd 是 ('stack', 名称)，不会与真实窗口冲突；双击折叠 / 展开
+StackHeader = namedtuple('StackHeader', 'hwnd title rank stack collapsed')
 
-    @property
-    def title(self):
-        return self._title
 
-    @property
-    def rank(self):
-        return self._rank
+def stack_header(name, count, collapsed):
+    arrow = "▶" if collapsed else "▼"
+    return StackHeader(('stack', name), f"{arrow} {name} ({count})", None, name, collapsed)
 
-    @rank.setter
-    def rank(self, value: int):
-        if self._rank != value:
-            self._rank = value
-            self.rank_updated.emit(value)
 
-    @property
-    def window_type(self):
-        return self._window_type
+class WindowListModel(QAbstractListModel):
+    """
+    窗口列表模型：每行是一个带 hwnd / title / rank 属性的记录（WindowRecord、TargetSnapshot 或栈标题行 StackHeader）。
+    set_items 按 hwnd 计算差异，只发出行删除 / 移动 / 插入 / 数据变化通知，
+    内容没变时不会触碰任何一行。
+    图标由 icon_loader 异步加载，加载完成后只刷新对应行的图标。
+    """
 
+    def __init__(self, parent=None, icons=None):
+        super().__init__(parent)
+        self._items = []
+        self._rows = None  # hwnd -> 行号，列表变化后懒重建
+
+        self.icons = icons or icon_loader.get_loader()
+        self.icons.icon_ready.connect(self._on_icon_ready)
+
+    # === Qt 模型接口 === #
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self._items[index.row()]
+
+        if role == Qt.DisplayRole:
+            return item.title
+        if role == Qt.DecorationRole:
+            return None if isinstance(item, StackHeader) else self.icons.pixmap(item.hwnd)
+        if role == ITEM_ROLE:
+            return item
+        if role == RANK_ROLE:
+            return item.rank
+        if role == QUARANTINED_ROLE:
+            # 只有目标快照 (TargetSnapshot) 带熔断状态
+            return getattr(item, 'quarantined', False)
+        return None
+
+    # === 查询 === #
+    def item(self, row):
+        return self._items[row]
+
+    def row_of(self, hwnd):
+        """hwnd 所在行号，不存在时返回 -1"""
+        if self._rows is None:
+            self._rows = {item.hwnd: i for i, item in enumerate(self._items)}
+        return self._rows.get(hwnd, -1)
+
+    def _on_icon_ready(self, hwnd):
+        row = self.row_of(hwnd)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    # === 单行增量修改 === #
+    def append_item(self, item):
+        row = len(self._items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._items.append(item)
+        self._rows = None
+        self.endInsertRows()
+
+    def remove_hwnd(self, hwnd):
+        row = self.row_of(hwnd)
+        if row < 0:
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        item = self._items.pop(row)
+        self._rows = None
+        self.endRemoveRows()
+        return item
+
+    def replace_item(self, item):
+        row = self.row_of(item.hwnd)
+        if row < 0:
+            return
+        self._items[row] = item
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    # === 整体差异更新 === #
+    def set_items(self, items):
+        """把模型更新为 items 的顺序和内容，只对有变化的行发通知"""
+        items = list(items)
+        new_hwnds = {item.hwnd for item in items}
 
-class SourceItemWidget(QWidget):
-    """左侧列表的自定义控件：[图标] [标题]"""
+        # 1. 删除不再存在的行（从下往上，避免行号错位）
+        for row in range(len(self._items) - 1, -1, -1):
+            if self._items[row].hwnd not in new_hwnds:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._items[row]
+                self.endRemoveRows()
+        self._rows = None
 
-    def __init__(self, item_data: ItemData, parent=None):
+        # 2. 保留的行里，最长递增子序列上的行相对顺序已正确，保持不动
+        position = {item.hwnd: i for i, item in enumerate(items)}
+        current = [position[item.hwnd] for item in self._items]
+        keep = {items[current[i]].hwnd for i in reorder_planner.longest_increasing_subsequence(current)}
+
+        # 3. 其余行按新顺序从上到下移动 / 插入到前一行之后
+        for i, item in enumerate(items):
+            if item.hwnd in keep:
+                continue
+
+            dest = self.row_of(items[i - 1].hwnd) + 1 if i > 0 else 0
+            row = self.row_of(item.hwnd)
+            if row < 0:
+                self.beginInsertRows(QModelIndex(), dest, dest)
+                self._items.insert(dest, item)
+                self._rows = None
+                self.endInsertRows()
+            elif row != dest and row + 1 != dest:
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), dest)
+                self._items.insert(dest, self._items[row])
+                del self._items[row + 1 if row > dest else row]
+                self._rows = None
+                self.endMoveRows()
+
+        # 4. 内容变化（标题 / 序号 / 隔离状态）的行只发 dataChanged
+        for row, item in enumerate(items):
+            old = self._items[row]
+            if old is not item:
+                self._items[row] = item
+                if (old.title != item.title or old.rank != item.rank
+                        or getattr(old, 'quarantined', False) != getattr(item, 'quarantined', False)):
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index)
+
+
+class WindowItemDelegate(QStyledItemDelegate):
+    """
+    列表项绘制：[序号] [图标] [标题]，代替每行一个 QWidget。
+    show_rank=False 时用于左侧源列表，不绘制序号。
+    被熔断隔离的窗口标题变灰并标注“无响应”；栈标题行 (StackHeader) 只绘制加粗的标题。
+    """
+
+    ROW_HEIGHT = 28
+    ICON_SIZE = 24
+    SPACING = 5
+
+    def __init__(self, show_rank=False, parent=None):
         super().__init__(parent)
+        self.show_rank = show_rank
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        self.initStyleOption(option, index)
+        widget = option.widget
+        style = widget.style() if widget else None
+
+        # 背景 / 选中高亮
+        option.text = ""
+        option.icon = QIcon()
+        if style:
+            style.drawControl(QStyle.CE_ItemViewItem, option, painter, widget)
+
+        painter.save()
+        rect = option.rect
+        x = rect.left() + self.SPACING
+        text_color = option.palette.highlightedText() if option.state & QStyle.State_Selected else option.palette.text()
+        painter.setPen(text_color.color())
 
-        self._item_data = item_data
+        # 栈标题行
+        if isinstance(index.data(ITEM_ROLE), StackHeader):
+            font = painter.font()
+            font.setBold(True)
+            painter.setFont(font)
+            text_rect = QRect(x, rect.top(), rect.right() - x - self.SPACING, rect.height())
+            painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, index.data(Qt.DisplayRole))
+            painter.restore()
+            return
 
-        self._setup_ui()
+        # 序号
+        if self.show_rank:
+            rank = index.data(RANK_ROLE)
+            fm = option.fontMetrics
+            rank_width = fm.horizontalAdvance("0") + 20
+            rank_rect = QRect(x, rect.top() + 3, rank_width, rect.height() - 6)
+            painter.drawRoundedRect(rank_rect, 3, 3)
+            painter.drawText(rank_rect, Qt.AlignCenter, "" if rank is None else str(rank))
+            x += rank_width + self.SPACING
 
-    def _setup_ui(self):
-        h_layout = QHBoxLayout(self)
-        h_layout.setContentsMargins(0, 0, 0, 0)
-        h_layout.setSpacing(5)
+        # 图标
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            top = rect.top() + (rect.height() - self.ICON_SIZE) // 2
+            painter.drawPixmap(QRect(x, top, self.ICON_SIZE, self.ICON_SIZE), pixmap)
+        x += self.ICON_SIZE + self.SPACING
 
-        icon_lable = QLabel()
-        pixmap = win_api.get_window_pixmap(self._item_data.hwnd)
-        if not pixmap.isNull():
-            icon_lable.setPixmap(pixmap)
+        # 标题
+        text = index.data(Qt.DisplayRole) or ""
+        if index.data(QUARANTINED_ROLE):
+            text = f"[无响应] {text}"
+            painter.setPen(option.palette.placeholderText().color())
+        text_rect = QRect(x, rect.top(), rect.right() - x - self.SPACING, rect.height())
+        title = option.fontMetrics.elidedText(text, Qt.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft, title)
 
-        text_label = QLabel(self._item_data.title)
-        text_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        painter.restore()
 
-        h_layout.addWidget(icon_lable)
-        h_layout.addWidget(text_label)
 
-    @property
-    def item_data(self):
-        return self._item_data
+# === 诊断面板 === #
+class TraceDiagnosticsDialog(QDialog):
+    """
+    触发到稳定的延迟分布：每个阶段和端到端的次数、p50 / p95 / p99（毫秒），每秒刷新。
+    可开关追踪、清空统计、导出 Chrome Trace JSON。
+    """
 
+    COLUMNS = ("阶段", "次数", "p50 (ms)", "p95 (ms)", "p99 (ms)")
 
-class TargetItemWidget(QWidget):
-    """右侧列表的自定义控件：[序号] [图标] [标题]"""
-    def __init__(self, item_data: ItemData,  parent=None):
+    def __init__(self, tracer=None, parent=None):
         super().__init__(parent)
+        self.tracer = tracer or tracing.get_tracer()
+        self.setWindowTitle("延迟诊断")
+        self.resize(480, 420)
 
-        self._item_data = item_data
+        layout = QVBoxLayout(self)
+        self.enabled_box = QCheckBox("启用追踪")
+        self.enabled_box.setChecked(self.tracer.enabled)
+        self.enabled_box.toggled.connect(self._set_enabled)
+        layout.addWidget(self.enabled_box)
 
-        self._setup_ui()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
 
-    def _setup_ui(self):
-        h_layout = QHBoxLayout(self)
-        h_layout.setContentsMargins(0, 0, 0, 0)
-        h_layout.setSpacing(5)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
 
-        rank_edit = QLineEdit(str(self._item_data.rank))
+        button_layout = QHBoxLayout()
+        self.btn_reset = QPushButton("清空")
+        self.btn_export = QPushButton("导出 Chrome Trace")
+        self.btn_reset.clicked.connect(self._reset)
+        self.btn_export.clicked.connect(self._export)
+        button_layout.addWidget(self.btn_reset)
+        button_layout.addWidget(self.btn_export)
+        layout.addLayout(button_layout)
 
-        rank_edit.setReadOnly(True)
-        rank_edit.setFocusPolicy(Qt.NoFocus)
-        rank_edit.setAlignment(Qt.AlignCenter)
-        fm = rank_edit.fontMetrics()
-        char_width = fm.horizontalAdvanceChar("0")
-        rank_edit.setFixedWidth(char_width + 20)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+        self.refresh()
 
-        icon_lable = QLabel()
-        pixmap = win_api.get_window_pixmap(self._item_data.hwnd)
-        if not pixmap.isNull():
-            icon_lable.setPixmap(pixmap)
+    def refresh(self):
+        rows = self.tracer.percentiles()
+        self.table.setRowCount(len(rows))
+        for row, (stage, values) in enumerate(rows.items()):
+            self.table.setItem(row, 0, QTableWidgetItem("端到端" if stage == tracing.TOTAL else stage))
+            count, *quantiles = values
+            cells = [str(count)] + [f"{value:.2f}" for value in quantiles]
+            for column, text in enumerate(cells, start=1):
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.summary_label.setText(f"调度器合并的触发 {self.tracer.coalesced} 次")
 
-        text_label = QLabel(self._item_data.title)
-        text_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+    def _set_enabled(self, enabled):
+        self.tracer.enabled = enabled
 
-        h_layout.addWidget(rank_edit)
-        h_layout.addWidget(icon_lable)
-        h_layout.addWidget(text_label)
+    def _reset(self):
+        self.tracer.reset()
+        self.refresh()
 
-    @property
-    def item_data(self):
-        return self._item_data
+    def _export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Chrome Trace", "trace.json", "JSON (*.json)")
+        if path:
+            count = self.tracer.export_chrome_trace(path)
+            self.summary_label.setText(f"已导出 {count} 次触发 -> {path}")
@@ -1,43 +1,61 @@
-import win32gui, win32con, win32process
-import ctypes
-from ctypes import wintypes
+import logging
+
 from logger import logger
 
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QImage, QPixmap
+import win_backend
+from win_backend import HWND_TOP, HWND_NOTOPMOST
+
+_backend = None
+# get_all_windows 复用的列式快照（缓冲区跨调用复用）
+_snapshot = None
+
+
+# === 窗口系统后端 === #
+def get_backend():
+    """当前使用的窗口系统后端，默认首次调用时创建 pywin32 后端"""
+    global _backend
+    if _backend is None:
+        _backend = win_backend.Win32Backend()
+    return _backend
+
 
-dwmapi = ctypes.WinDLL('dwmapi')
-dwmapi.DwmGetWindowAttribute.argtypes = [wintypes.HWND, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), wintypes.DWORD]
+def set_backend(backend):
+    """替换窗口系统后端（例如 sim_backend.SimulatedDesktop）"""
+    global _backend
+    _backend = backend
 
-_icon_cache = {}
 
 # === 获取句柄、窗口名称 === #
+def enum_windows():
+    """按 Z 序（从上到下）列出全部顶层窗口句柄"""
+    return get_backend().enum_windows()
+
+
 def is_window_cloaked(hwnd: int):
-    cloaked = wintypes.DWORD(0)
-    hr = dwmapi.DwmGetWindowAttribute(hwnd, 14, ctypes.byref(cloaked), ctypes.sizeof(cloaked))
-    return hr == 0 and cloaked.value != 0
+    return get_backend().is_cloaked(hwnd)
 
 
 # 暂时废弃
 def is_real_window(hwnd: int, filter):
+    backend = get_backend()
     # 过滤没有标题的窗口
-    if win32gui.GetWindowTextLength(hwnd) == 0:
+    if backend.get_window_text_length(hwnd) == 0:
         return False
     # 过滤隐藏的窗口
-    if not win32gui.IsWindowVisible(hwnd):
+    if not backend.is_window_visible(hwnd):
         return False
     # 过滤附属窗口
-    if win32gui.GetWindow(hwnd, win32con.GW_OWNER) != 0:
+    if backend.get_owner(hwnd) != 0:
         return False
     # 过滤被DWM遮蔽的窗口（如UWP挂起、其他虚拟桌面窗口）
-    if is_window_cloaked(hwnd):
+    if backend.is_cloaked(hwnd):
         return False
 
     if filter:
         # 过滤工具窗口 (ToolWindow)
         # 这种窗口通常用于浮动工具栏，不会出现在 Alt+Tab 或任务栏中、案例：微信表情框
-        ex_style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
-        if ex_style & win32con.WS_EX_TOOLWINDOW:
+        ex_style = backend.get_window_long(hwnd, win_backend.GWL_EXSTYLE)
+        if ex_style & win_backend.WS_EX_TOOLWINDOW:
             return False
 
     return True
@@ -45,107 +63,171 @@ def is_real_window(hwnd: int, filter):
 
 def get_all_windows(filter=True):
     """获取所有真实可见窗口的 (hwnd, title)"""
-    windows = []
+    # 一次枚举采集列式快照，筛选向量化完成；快照跟随当前后端，缓冲区跨调用复用
+    global _snapshot
+    from window_snapshot import WindowSnapshot, REAL_FIELDS
 
-    def callback(hwnd, extra):
-        title = win32gui.GetWindowText(hwnd)
-        if is_real_window(hwnd, filter):
-            if title not in ["Program Manager", "窗口重排器"]:
-                windows.append((hwnd, title))
+    if _snapshot is None:
+        _snapshot = WindowSnapshot()
+    _snapshot.capture(fields=REAL_FIELDS)
+    return [(hwnd, title) for hwnd, title, _ in _snapshot.real_windows(filter)]
 
-        return True
 
-    win32gui.EnumWindows(callback, None)
-    return windows
+def probe_window(hwnd: int):
+    """
+    按 get_all_windows(filter=False) 的规则检查单个窗口。
+    符合条件时返回 (title, is_tool)，is_tool 表示会被 filter=True 过滤掉的工具窗口；否则返回 None。
+    """
+    if not is_real_window(hwnd, False):
+        return None
 
+    backend = get_backend()
+    title = backend.get_window_text(hwnd)
+    if title in ["Program Manager", "窗口重排器"]:
+        return None
 
-# === 获取窗口图标 === #
-def clear_icon_cache(hwnd):
-    if hwnd in _icon_cache:
-        del _icon_cache[hwnd]
+    ex_style = backend.get_window_long(hwnd, win_backend.GWL_EXSTYLE)
+    return title, bool(ex_style & win_backend.WS_EX_TOOLWINDOW)
 
-def get_window_hicon(hwnd: int):
-    """获取窗口图标句柄（依次尝试窗口小图标、大图标、类小图标、类大图标）"""
-    hicon = win32gui.SendMessage(hwnd, win32con.WM_GETICON, win32con.ICON_SMALL, 0)
-    if hicon != 0:
-        return hicon
 
-    hicon = win32gui.SendMessage(hwnd, win32con.WM_GETICON, win32con.ICON_BIG, 0)
-    if hicon != 0:
-        return hicon
+def is_top_level(hwnd: int):
+    """检查窗口是否为顶层窗口"""
+    return get_backend().get_root_window(hwnd) == hwnd
 
-    # 3. 尝试窗口类的小图标
-    hicon = win32gui.GetClassLong(hwnd, win32con.GCL_HICONSM)
-    if hicon != 0:
-        return hicon
 
-    # 4. 尝试窗口类的大图标
-    hicon = win32gui.GetClassLong(hwnd, win32con.GCL_HICON)
+# === 获取窗口图标 === #
+# 图标的异步加载、缓存见 icon_loader.py
+def get_window_hicon(hwnd: int, timeout_ms=None):
+    """获取窗口图标句柄（依次尝试窗口小图标、大图标、类小图标、类大图标），超时抛出 TimeoutError"""
+    hicon = get_backend().get_window_icon(hwnd, timeout_ms)
     if hicon != 0:
         return hicon
 
     return None
 
 
-def get_window_pixmap(hwnd: int, size: int = 24):
-    """获取窗口图标并转换为QPixmap"""
-    if hwnd in _icon_cache:
-        return _icon_cache[hwnd]
-
-    hicon = get_window_hicon(hwnd)
-    if not hicon:
-        return QPixmap()
-    image = QImage.fromHICON(hicon)
+def get_process_image_path(hwnd: int):
+    """窗口所属进程的可执行文件路径"""
+    pid = get_window_pid(hwnd)
+    if not pid:
+        return ""
+    return get_backend().get_process_image_path(pid)
 
-    pixmap = QPixmap.fromImage(image)
-    icon = pixmap.scaled(size, size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
 
-    if not pixmap.isNull():
-        _icon_cache[hwnd] = icon
-    return icon
+def get_class_name(hwnd: int):
+    """窗口类名"""
+    return get_backend().get_class_name(hwnd)
 
 
 # === 排序窗口 === #
 def is_minimized(hwnd: int):
     """检查窗口是否最小化。"""
-    return win32gui.IsIconic(hwnd) != 0
+    return get_backend().is_iconic(hwnd)
 
 
 # === 排序窗口 === #
-def set_z_order(hwnd, insert_after_hwnd, force_show=True):
+def is_window(hwnd: int):
+    """检查窗口句柄是否仍然有效。"""
+    return get_backend().is_window(hwnd)
+
+
+def is_window_visible(hwnd: int):
+    """检查窗口是否可见。"""
+    return get_backend().is_window_visible(hwnd)
+
+
+def is_window_hung(hwnd: int):
+    """窗口是否已无响应 (IsHungAppWindow)"""
+    return get_backend().is_hung(hwnd)
+
+
+def is_topmost(hwnd: int):
+    """检查窗口是否带有 WS_EX_TOPMOST (置顶) 样式。"""
+    ex_style = get_backend().get_window_long(hwnd, win_backend.GWL_EXSTYLE)
+    return bool(ex_style & win_backend.WS_EX_TOPMOST)
+
+
+def get_relative_z_order(hwnds):
     """
-    设置窗口的 Z 轴顺序 (Z-Order)。
+    沿 GW_HWNDNEXT 链从最顶层窗口向下走一遍，返回 hwnds 中各窗口当前从上到下的顺序。
+    找齐所有窗口后立即停止，不再继续遍历。
     """
+    backend = get_backend()
+    wanted = set(hwnds)
+    order = []
+
+    hwnd = backend.get_top_window()
+    while hwnd and len(order) < len(wanted):
+        if hwnd in wanted:
+            order.append(hwnd)
+        hwnd = backend.get_next_window(hwnd)
+
+    return order
+
+
+def _z_order_flags(force_show=True):
     # 组合标志位
     # SWP_NOMOVE: 不改变当前位置 (x, y)
     # SWP_NOSIZE: 不改变当前大小 (cx, cy)
     # SWP_NOACTIVATE: 不激活窗口
     # SWP_SHOWWINDOW: 显示窗口
     flags = (
-            win32con.SWP_NOMOVE
-            | win32con.SWP_NOSIZE
-            | win32con.SWP_NOACTIVATE
+            win_backend.SWP_NOMOVE
+            | win_backend.SWP_NOSIZE
+            | win_backend.SWP_NOACTIVATE
     )
     if force_show:
-        flags |= win32con.SWP_SHOWWINDOW
-    else:
-        pass
+        flags |= win_backend.SWP_SHOWWINDOW
+    return flags
 
-    win32gui.SetWindowPos(
+
+def set_z_order(hwnd, insert_after_hwnd, force_show=True):
+    """
+    设置窗口的 Z 轴顺序 (Z-Order)。
+    """
+    get_backend().set_window_pos(
         hwnd,  # 目标窗口句柄
         insert_after_hwnd,  # 在哪个窗口句柄之后
-        0, 0, 0, 0,
-        flags
+        _z_order_flags(force_show)
     )
 
 
+def set_z_order_batch(entries):
+    """
+    使用 DeferWindowPos 事务一次性提交多个窗口的 Z 轴顺序，桌面只重绘一次。
+    entries: [(hwnd, insert_after_hwnd, force_show), ...]
+    成功返回 True；事务任一步失败返回 False，由调用方回退到逐个 set_z_order。
+    """
+    if not entries:
+        return True
+
+    backend = get_backend()
+    try:
+        hdwp = backend.begin_defer_window_pos(len(entries))
+        for hwnd, insert_after_hwnd, force_show in entries:
+            # DeferWindowPos 可能返回新的句柄，必须用返回值继续
+            hdwp = backend.defer_window_pos(hdwp, hwnd, insert_after_hwnd, _z_order_flags(force_show))
+        backend.end_defer_window_pos(hdwp)
+    except Exception as e:
+        logger.warning("[批量重排] DeferWindowPos 事务失败，回退逐个设置: %s", e)
+        return False
+
+    return True
+
+
+# === 获取前台窗口 === #
+def get_foreground_window():
+    return get_backend().get_foreground_window()
+
+
 # === 获取指定坐标的窗口句柄 === #
 def get_root_window_at(x, y):
-    hwnd = win32gui.WindowFromPoint((x, y))
+    backend = get_backend()
+    hwnd = backend.window_from_point(x, y)
     if hwnd == 0:
         return None
 
-    root_hwnd = win32gui.GetAncestor(hwnd, win32con.GA_ROOT)
+    root_hwnd = backend.get_root_window(hwnd)
     return root_hwnd
 
 
@@ -153,7 +235,7 @@ def get_root_window_at(x, y):
 def get_window_rect(hwnd):
     """获取窗口的坐标 (left, top, right, bottom)"""
     try:
-        rect = win32gui.GetWindowRect(hwnd)
+        rect = get_backend().get_window_rect(hwnd)
         return rect
     except Exception:
         return None
@@ -194,15 +276,15 @@ def is_click_on_close_button(hwnd: int, x: int, y: int):
 # === 获取窗口pid === #
 def get_window_pid(hwnd: int):
     """获取窗口对应的进程ID"""
-    _, pid = win32process.GetWindowThreadProcessId(hwnd)
-    return pid
+    return get_backend().get_window_pid(hwnd)
 
 
 # === 检查附属关系 === #
 def is_son_window(parent_hwnd: int, target_hwnd: int):
+    backend = get_backend()
     # --- 1. 检查 Win32 Owner 关系 (显式父子关系) ---
     try:
-        owner = win32gui.GetWindow(target_hwnd, win32con.GW_OWNER)
+        owner = backend.get_owner(target_hwnd)
         if owner == parent_hwnd:
             return True
     except Exception:
@@ -210,8 +292,8 @@ def is_son_window(parent_hwnd: int, target_hwnd: int):
         return False
 
     try:
-        _, parent_pid = win32process.GetWindowThreadProcessId(parent_hwnd)
-        _, target_pid = win32process.GetWindowThreadProcessId(target_hwnd)
+        parent_pid = backend.get_window_pid(parent_hwnd)
+        target_pid = backend.get_window_pid(target_hwnd)
     except Exception:
         return False
 
@@ -220,37 +302,69 @@ def is_son_window(parent_hwnd: int, target_hwnd: int):
 
     try:
         # 获取样式
-        style = win32gui.GetWindowLong(target_hwnd, win32con.GWL_STYLE)
-        ex_style = win32gui.GetWindowLong(target_hwnd, win32con.GWL_EXSTYLE)
-        debug_title = win32gui.GetWindowText(target_hwnd)
+        style = backend.get_window_long(target_hwnd, win_backend.GWL_STYLE)
+        ex_style = backend.get_window_long(target_hwnd, win_backend.GWL_EXSTYLE)
 
-        # [日志优化] 将标题和样式信息合并为一条日志，减少刷屏
-        logger.info(f"[检测窗口] HWND: {target_hwnd} | 标题: '{debug_title}' | Style={hex(style)} | ExStyle={hex(ex_style)}")
+        # [日志优化] 将标题和样式信息合并为一条日志，减少刷屏；逐窗口的判定过程只在 DEBUG 级别输出，标题也只在这时读取
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[检测窗口] HWND: %s | 标题: '%s' | Style=%#x | ExStyle=%#x",
+                         target_hwnd, backend.get_window_text(target_hwnd), style, ex_style)
 
     except Exception as e:
         # [日志优化] 使用 logger 记录异常
-        logger.error(f"[检测窗口] HWND: {target_hwnd} 获取窗口样式失败: {e}")
+        logger.error("[检测窗口] HWND: %s 获取窗口样式失败: %s", target_hwnd, e)
         return False
 
     # 判定 A: 工具窗口 (ToolWindow)
-    if ex_style & win32con.WS_EX_TOOLWINDOW:
-        logger.info(f"  -> [结果: True] HWND: {target_hwnd} 判定为子窗口 (命中规则: WS_EX_TOOLWINDOW 工具窗口)")
+    if ex_style & win_backend.WS_EX_TOOLWINDOW:
+        logger.debug("  -> [结果: True] HWND: %s 判定为子窗口 (命中规则: WS_EX_TOOLWINDOW 工具窗口)", target_hwnd)
         return True
 
     # 判定 B: 任务栏可见窗口 (AppWindow)
-    if ex_style & win32con.WS_EX_APPWINDOW:
-        logger.info(f"  -> [结果: False] HWND: {target_hwnd} 判定为独立窗口 (命中规则: WS_EX_APPWINDOW 强制任务栏显示)")
+    if ex_style & win_backend.WS_EX_APPWINDOW:
+        logger.debug("  -> [结果: False] HWND: %s 判定为独立窗口 (命中规则: WS_EX_APPWINDOW 强制任务栏显示)", target_hwnd)
         return False
 
     # 判定 C: Popup 窗口 vs Overlapped 窗口
-    if style & win32con.WS_POPUP:
-        logger.info(f"  -> [结果: False] HWND: {target_hwnd} 判定为独立窗口 (命中规则: WS_POPUP 弹出式样式)")
+    if style & win_backend.WS_POPUP:
+        logger.debug("  -> [结果: False] HWND: %s 判定为独立窗口 (命中规则: WS_POPUP 弹出式样式)", target_hwnd)
         return False
 
     # 默认情况
-    logger.info(f"  -> [结果: False] HWND: {target_hwnd} 判定为独立窗口 (未命中子窗口特征，推测为 WS_OVERLAPPED 标准窗口)")
+    logger.debug("  -> [结果: False] HWND: %s 判定为独立窗口 (未命中子窗口特征，推测为 WS_OVERLAPPED 标准窗口)", target_hwnd)
     return False
 
+
+def get_owner(hwnd: int):
+    """窗口的所有者 (GW_OWNER)，没有时返回 0"""
+    return get_backend().get_owner(hwnd)
+
+
+def get_window_styles(hwnd: int):
+    """(style, ex_style)"""
+    backend = get_backend()
+    return backend.get_window_long(hwnd, win_backend.GWL_STYLE), backend.get_window_long(hwnd, win_backend.GWL_EXSTYLE)
+
+
+def is_son_style(style: int, ex_style: int):
+    """is_son_window 中同进程窗口的样式判定（判定 A / B / C），不查询窗口、不写日志"""
+    # 判定 A: 工具窗口 (ToolWindow)
+    if ex_style & win_backend.WS_EX_TOOLWINDOW:
+        return True
+    # 判定 B: 任务栏可见窗口 (AppWindow)
+    if ex_style & win_backend.WS_EX_APPWINDOW:
+        return False
+    # 判定 C: Popup 窗口 vs Overlapped 窗口
+    if style & win_backend.WS_POPUP:
+        return False
+    return False
+
+
+# === 进程设置 === #
+def set_process_dpi_aware():
+    get_backend().set_process_dpi_aware()
+
+
 if __name__ == '__main__':
     windows = get_all_windows()
     for window in windows:
@@ -0,0 +1,368 @@
+# win_backend.py
+"""
+窗口系统后端接口。
+
+win_api 中所有与窗口系统打交道的调用都经过这里的后端对象：
+- Win32Backend: 基于 pywin32 / ctypes 的真实实现（仅 Windows）
+- sim_backend.SimulatedDesktop: 内存中的桌面模拟器，可在 Linux 上无界面运行和计时
+"""
+from logger import logger
+
+# === Win32 常量 (取自 WinUser.h，模拟器与真实后端共用) === #
+HWND_TOP = 0
+HWND_BOTTOM = 1
+HWND_TOPMOST = -1
+HWND_NOTOPMOST = -2
+
+GWL_STYLE = -16
+GWL_EXSTYLE = -20
+
+WS_POPUP = 0x80000000
+WS_EX_TOPMOST = 0x00000008
+WS_EX_TOOLWINDOW = 0x00000080
+WS_EX_APPWINDOW = 0x00040000
+
+SWP_NOSIZE = 0x0001
+SWP_NOMOVE = 0x0002
+SWP_NOZORDER = 0x0004
+SWP_NOACTIVATE = 0x0010
+SWP_SHOWWINDOW = 0x0040
+
+# SendMessageTimeout
+SMTO_BLOCK = 0x0001
+SMTO_ABORTIFHUNG = 0x0002
+
+# WinEvent (SetWinEventHook)
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZESTART = 0x0016
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+EVENT_OBJECT_HIDE = 0x8003
+EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+EVENT_OBJECT_NAMECHANGE = 0x800C
+EVENT_OBJECT_CLOAKED = 0x8017
+EVENT_OBJECT_UNCLOAKED = 0x8018
+OBJID_WINDOW = 0
+OBJID_CURSOR = -9
+CHILDID_SELF = 0
+
+
+class WindowBackend:
+    """后端接口：枚举、Z 序、坐标、附属关系、PID、样式、前台窗口和图标"""
+
+    # --- 枚举 --- #
+    def enum_windows(self):
+        """按 Z 序从上到下返回所有顶层窗口句柄"""
+        raise NotImplementedError
+
+    def is_window(self, hwnd):
+        raise NotImplementedError
+
+    def is_window_visible(self, hwnd):
+        raise NotImplementedError
+
+    def is_iconic(self, hwnd):
+        raise NotImplementedError
+
+    def is_cloaked(self, hwnd):
+        raise NotImplementedError
+
+    def is_hung(self, hwnd):
+        """IsHungAppWindow：窗口所属线程是否已停止处理消息（不会被目标窗口卡住）"""
+        return False
+
+    def get_window_text(self, hwnd):
+        raise NotImplementedError
+
+    def get_window_text_length(self, hwnd):
+        raise NotImplementedError
+
+    def get_class_name(self, hwnd):
+        """GetClassName"""
+        raise NotImplementedError
+
+    # --- 附属关系 / 进程 / 样式 --- #
+    def get_owner(self, hwnd):
+        """GetWindow(GW_OWNER)，没有所有者时返回 0"""
+        raise NotImplementedError
+
+    def get_window_pid(self, hwnd):
+        raise NotImplementedError
+
+    def get_window_long(self, hwnd, index):
+        """GetWindowLong(GWL_STYLE / GWL_EXSTYLE)"""
+        raise NotImplementedError
+
+    # --- Z 序 --- #
+    def get_top_window(self):
+        """Z 序最顶层的顶层窗口 (GetWindow(desktop, GW_CHILD))"""
+        raise NotImplementedError
+
+    def get_next_window(self, hwnd):
+        """GetWindow(GW_HWNDNEXT)，到底时返回 0"""
+        raise NotImplementedError
+
+    def set_window_pos(self, hwnd, insert_after, flags):
+        raise NotImplementedError
+
+    def begin_defer_window_pos(self, count):
+        raise NotImplementedError
+
+    def defer_window_pos(self, hdwp, hwnd, insert_after, flags):
+        """返回继续使用的事务句柄"""
+        raise NotImplementedError
+
+    def end_defer_window_pos(self, hdwp):
+        raise NotImplementedError
+
+    # --- 坐标 / 前台 --- #
+    def get_window_rect(self, hwnd):
+        """(left, top, right, bottom)，窗口不存在时抛出异常"""
+        raise NotImplementedError
+
+    def window_from_point(self, x, y):
+        raise NotImplementedError
+
+    def get_root_window(self, hwnd):
+        """GetAncestor(GA_ROOT)"""
+        raise NotImplementedError
+
+    def get_foreground_window(self):
+        raise NotImplementedError
+
+    # --- 图标 --- #
+    def get_window_icon(self, hwnd, timeout_ms=None):
+        """
+        窗口图标句柄 (HICON)，没有时返回 0。
+        给定 timeout_ms 时窗口消息带超时发送，目标窗口无响应时抛出 TimeoutError。
+        """
+        raise NotImplementedError
+
+    def icon_to_image(self, hicon):
+        """把图标句柄转成 QImage（QImage 不依赖界面线程，可在线程池里调用）"""
+        raise NotImplementedError
+
+    def get_process_image_path(self, pid):
+        """进程可执行文件的完整路径，取不到时返回空字符串"""
+        return ""
+
+    # --- 窗口事件 --- #
+    def add_win_event_hook(self, event_min, event_max, callback, pid=0):
+        """
+        订阅 [event_min, event_max] 范围内的 WinEvent，回调签名 callback(event, hwnd, id_object, id_child)。
+        pid 非 0 时只接收该进程产生的事件（系统在投递前就按进程过滤）。
+        回调在安装钩子的线程（需要消息循环）上执行。返回钩子句柄，不支持时返回 None。
+        """
+        return None
+
+    def remove_win_event_hook(self, handle):
+        pass
+
+    # --- 进程设置 --- #
+    def set_process_dpi_aware(self):
+        pass
+
+
+class Win32Backend(WindowBackend):
+    """基于 pywin32 的真实后端"""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        import win32gui, win32con, win32process, pywintypes
+
+        self._gui = win32gui
+        self._con = win32con
+        self._process = win32process
+        self._pywintypes = pywintypes
+
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._dwmapi = ctypes.WinDLL('dwmapi')
+        self._dwmapi.DwmGetWindowAttribute.argtypes = [
+            wintypes.HWND, wintypes.DWORD, ctypes.POINTER(wintypes.DWORD), wintypes.DWORD
+        ]
+        self._cloaked = wintypes.DWORD(0)
+
+        # QueryFullProcessImageNameW 只需要 PROCESS_QUERY_LIMITED_INFORMATION，提权进程也能查
+        self._kernel32 = ctypes.WinDLL('kernel32')
+        self._kernel32.OpenProcess.restype = wintypes.HANDLE
+        self._kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        self._kernel32.QueryFullProcessImageNameW.argtypes = [
+            wintypes.HANDLE, wintypes.DWORD, wintypes.LPWSTR, ctypes.POINTER(wintypes.DWORD)
+        ]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+        # SetWinEventHook 回调原型；ctypes 回调对象必须一直持有，否则会被回收
+        self._user32 = ctypes.WinDLL('user32')
+        self._WINEVENTPROC = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+        self._user32.SetWinEventHook.restype = wintypes.HANDLE
+        self._user32.SetWinEventHook.argtypes = [
+            wintypes.UINT, wintypes.UINT, wintypes.HMODULE, self._WINEVENTPROC,
+            wintypes.DWORD, wintypes.DWORD, wintypes.UINT
+        ]
+        self._user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        self._user32.IsHungAppWindow.argtypes = [wintypes.HWND]
+        self._hooks = {}
+
+    # --- 枚举 --- #
+    def enum_windows(self):
+        hwnds = []
+        self._gui.EnumWindows(lambda hwnd, extra: hwnds.append(hwnd) or True, None)
+        return hwnds
+
+    def is_window(self, hwnd):
+        return bool(self._gui.IsWindow(hwnd))
+
+    def is_window_visible(self, hwnd):
+        return bool(self._gui.IsWindowVisible(hwnd))
+
+    def is_iconic(self, hwnd):
+        return self._gui.IsIconic(hwnd) != 0
+
+    def is_cloaked(self, hwnd):
+        # DWMWA_CLOAKED = 14
+        cloaked = self._cloaked
+        cloaked.value = 0
+        hr = self._dwmapi.DwmGetWindowAttribute(
+            hwnd, 14, self._ctypes.byref(cloaked), self._ctypes.sizeof(cloaked)
+        )
+        return hr == 0 and cloaked.value != 0
+
+    def is_hung(self, hwnd):
+        return bool(self._user32.IsHungAppWindow(hwnd))
+
+    def get_window_text(self, hwnd):
+        return self._gui.GetWindowText(hwnd)
+
+    def get_window_text_length(self, hwnd):
+        return self._gui.GetWindowTextLength(hwnd)
+
+    def get_class_name(self, hwnd):
+        return self._gui.GetClassName(hwnd)
+
+    # --- 附属关系 / 进程 / 样式 --- #
+    def get_owner(self, hwnd):
+        return self._gui.GetWindow(hwnd, self._con.GW_OWNER)
+
+    def get_window_pid(self, hwnd):
+        _, pid = self._process.GetWindowThreadProcessId(hwnd)
+        return pid
+
+    def get_window_long(self, hwnd, index):
+        return self._gui.GetWindowLong(hwnd, index)
+
+    # --- Z 序 --- #
+    def get_top_window(self):
+        return self._gui.GetWindow(self._gui.GetDesktopWindow(), self._con.GW_CHILD)
+
+    def get_next_window(self, hwnd):
+        return self._gui.GetWindow(hwnd, self._con.GW_HWNDNEXT)
+
+    def set_window_pos(self, hwnd, insert_after, flags):
+        self._gui.SetWindowPos(hwnd, insert_after, 0, 0, 0, 0, flags)
+
+    def begin_defer_window_pos(self, count):
+        return self._gui.BeginDeferWindowPos(count)
+
+    def defer_window_pos(self, hdwp, hwnd, insert_after, flags):
+        return self._gui.DeferWindowPos(hdwp, hwnd, insert_after, 0, 0, 0, 0, flags)
+
+    def end_defer_window_pos(self, hdwp):
+        self._gui.EndDeferWindowPos(hdwp)
+
+    # --- 坐标 / 前台 --- #
+    def get_window_rect(self, hwnd):
+        return self._gui.GetWindowRect(hwnd)
+
+    def window_from_point(self, x, y):
+        return self._gui.WindowFromPoint((x, y))
+
+    def get_root_window(self, hwnd):
+        return self._gui.GetAncestor(hwnd, self._con.GA_ROOT)
+
+    def get_foreground_window(self):
+        return self._gui.GetForegroundWindow()
+
+    # --- 图标 --- #
+    def get_window_icon(self, hwnd, timeout_ms=None):
+        """依次尝试窗口小图标、大图标、类小图标、类大图标"""
+        gui, con = self._gui, self._con
+
+        hicon = self._send_message(hwnd, con.WM_GETICON, con.ICON_SMALL, 0, timeout_ms)
+        if hicon != 0:
+            return hicon
+
+        hicon = self._send_message(hwnd, con.WM_GETICON, con.ICON_BIG, 0, timeout_ms)
+        if hicon != 0:
+            return hicon
+
+        hicon = gui.GetClassLong(hwnd, con.GCL_HICONSM)
+        if hicon != 0:
+            return hicon
+
+        return gui.GetClassLong(hwnd, con.GCL_HICON)
+
+    def _send_message(self, hwnd, msg, wparam, lparam, timeout_ms):
+        if timeout_ms is None:
+            return self._gui.SendMessage(hwnd, msg, wparam, lparam)
+        try:
+            _, result = self._gui.SendMessageTimeout(
+                hwnd, msg, wparam, lparam, SMTO_ABORTIFHUNG | SMTO_BLOCK, timeout_ms
+            )
+        except self._pywintypes.error as e:
+            raise TimeoutError(f"窗口 {hwnd} 消息超时") from e
+        return result
+
+    def icon_to_image(self, hicon):
+        from PySide6.QtGui import QImage
+        return QImage.fromHICON(hicon)
+
+    def get_process_image_path(self, pid):
+        ctypes, wintypes = self._ctypes, self._wintypes
+        # PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        handle = self._kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return ""
+        try:
+            buf = ctypes.create_unicode_buffer(1024)
+            size = wintypes.DWORD(len(buf))
+            if self._kernel32.QueryFullProcessImageNameW(handle, 0, buf, ctypes.byref(size)):
+                return buf.value
+            return ""
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    # --- 窗口事件 --- #
+    def add_win_event_hook(self, event_min, event_max, callback, pid=0):
+        # WINEVENT_OUTOFCONTEXT (0) | WINEVENT_SKIPOWNPROCESS (2)
+        flags = 0x0000 | 0x0002
+
+        def proc(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+            try:
+                callback(event, hwnd or 0, id_object, id_child)
+            except Exception as e:
+                logger.error("[窗口事件] 回调异常: %s", e)
+
+        c_proc = self._WINEVENTPROC(proc)
+        handle = self._user32.SetWinEventHook(event_min, event_max, None, c_proc, pid, 0, flags)
+        if not handle:
+            return None
+        self._hooks[handle] = c_proc
+        return handle
+
+    def remove_win_event_hook(self, handle):
+        if self._hooks.pop(handle, None) is not None:
+            self._user32.UnhookWinEvent(handle)
+
+    # --- 进程设置 --- #
+    def set_process_dpi_aware(self):
+        try:
+            self._gui.SetProcessDPIAware()
+        except AttributeError:
+            pass
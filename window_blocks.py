@@ -0,0 +1,229 @@
+# window_blocks.py
+"""
+受管窗口的块结构：目标顺序是一个块的双向链表，每个块是一个主窗口和挂在它上面的工具窗口。
+
+工具窗口可以嵌套（工具窗口拥有的工具窗口挂在它下面），展开后的 Z 序（从上到下）为：
+    对每个节点：先依次展开它的子节点（先挂的在上），再是节点本身
+所以块的最后一个窗口总是主窗口，与原来 [子1, 子2, 主A, 子3, 主B] 的列表布局相同。
+
+块的追加、移除、与相邻块交换都是 O(1)，不切片、不移动其他元素；挂载工具窗口是 O(1) 的追加。
+
+引擎可以有多个互不相关的栈 (Stack)，每个栈是一个独立的块链表，有自己的序号，单独重排。
+"""
+
+
+class _Node:
+    __slots__ = ('record', 'parent', 'children', 'block')
+
+    def __init__(self, record, parent, block):
+        self.record = record
+        self.parent = parent
+        self.children = []
+        self.block = block
+
+    def flatten(self):
+        """按 Z 序（从上到下）展开以该节点为根的子树"""
+        for child in self.children:
+            # 大多数窗口没有子窗口，不为它们再套一层生成器
+            if child.children:
+                yield from child.flatten()
+            else:
+                yield child.record
+        yield self.record
+
+
+class Block:
+    """一个主窗口 (root) 及其工具窗口；prev / next 为链表中的相邻块（prev 在上）"""
+    __slots__ = ('root', 'prev', 'next')
+
+    def __init__(self):
+        self.root = None
+        self.prev = None
+        self.next = None
+
+    @property
+    def main(self):
+        return self.root.record
+
+    def records(self):
+        return self.root.flatten()
+
+
+class BlockList:
+    def __init__(self):
+        self._head = None
+        self._tail = None
+        self._nodes = {}  # hwnd -> _Node
+        self.block_count = 0
+
+    # === 查询 === #
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, hwnd):
+        return hwnd in self._nodes
+
+    def __iter__(self):
+        """展开后的 Z 序（从上到下）：所有块依次展开"""
+        block = self._head
+        while block is not None:
+            root = block.root
+            if root.children:
+                yield from root.flatten()
+            else:
+                yield root.record
+            block = block.next
+
+    def get(self, hwnd):
+        node = self._nodes.get(hwnd)
+        return node.record if node else None
+
+    def hwnds(self):
+        return self._nodes.keys()
+
+    def blocks(self):
+        block = self._head
+        while block is not None:
+            yield block
+            block = block.next
+
+    def block_of(self, hwnd):
+        node = self._nodes.get(hwnd)
+        return node.block if node else None
+
+    def is_last(self, block):
+        return block is self._tail
+
+    # === 修改 === #
+    def append(self, record):
+        """在末尾追加一个以 record 为主窗口的新块"""
+        block = Block()
+        block.root = self._nodes[record.hwnd] = _Node(record, None, block)
+        self._link_last(block)
+        return block
+
+    def insert_before(self, record, before):
+        """在块 before 之前（Z 序更高）插入一个以 record 为主窗口的新块；before 为 None 时追加到末尾"""
+        if before is None:
+            return self.append(record)
+        block = Block()
+        block.root = self._nodes[record.hwnd] = _Node(record, None, block)
+        block.prev, block.next = before.prev, before
+        if before.prev is None:
+            self._head = block
+        else:
+            before.prev.next = block
+        before.prev = block
+        self.block_count += 1
+        return block
+
+    def attach(self, record, parent_hwnd):
+        """把工具窗口挂到 parent_hwnd（主窗口或工具窗口）下面，位于父窗口之上、父窗口已有的子窗口之下"""
+        parent = self._nodes.get(parent_hwnd)
+        if parent is None:
+            return False
+        node = self._nodes[record.hwnd] = _Node(record, parent, parent.block)
+        parent.children.append(node)
+        return True
+
+    def remove(self, hwnd):
+        """
+        移除一个窗口，返回被移除的记录列表。
+        移除主窗口时整个块（含工具窗口）一起移除；移除工具窗口时，它的子窗口原位接到它的父窗口下。
+        """
+        node = self._nodes.get(hwnd)
+        if node is None:
+            return []
+
+        if node.parent is None:
+            removed = list(node.block.records())
+            for record in removed:
+                del self._nodes[record.hwnd]
+            self._unlink(node.block)
+            return removed
+
+        siblings = node.parent.children
+        position = siblings.index(node)
+        for child in node.children:
+            child.parent = node.parent
+            child.record.parent = node.parent.record.hwnd
+        siblings[position:position + 1] = node.children
+        del self._nodes[hwnd]
+        return [node.record]
+
+    def detach(self, block):
+        """把整块（含工具窗口）从链表中摘下，块内结构保持不变，可以再 adopt 到另一个栈"""
+        for record in block.records():
+            del self._nodes[record.hwnd]
+        self._unlink(block)
+        return block
+
+    def adopt(self, block):
+        """把另一个链表 detach 出来的块追加到末尾"""
+        pending = [block.root]
+        while pending:
+            node = pending.pop()
+            self._nodes[node.record.hwnd] = node
+            pending.extend(node.children)
+        self._link_last(block)
+        return block
+
+    def swap_with_prev(self, block):
+        """与上一个块交换位置，已在最上面时返回 False"""
+        prev = block.prev
+        if prev is None:
+            return False
+
+        # prev <-> block  变为  block <-> prev
+        before, after = prev.prev, block.next
+        block.prev, block.next = before, prev
+        prev.prev, prev.next = block, after
+        if before is None:
+            self._head = block
+        else:
+            before.next = block
+        if after is None:
+            self._tail = prev
+        else:
+            after.prev = prev
+        return True
+
+    def swap_with_next(self, block):
+        if block.next is None:
+            return False
+        return self.swap_with_prev(block.next)
+
+    def _link_last(self, block):
+        block.prev, block.next = self._tail, None
+        if self._tail is None:
+            self._head = block
+        else:
+            self._tail.next = block
+        self._tail = block
+        self.block_count += 1
+
+    def _unlink(self, block):
+        if block.prev is None:
+            self._head = block.next
+        else:
+            block.prev.next = block.next
+        if block.next is None:
+            self._tail = block.prev
+        else:
+            block.next.prev = block.prev
+        block.prev = block.next = None
+        self.block_count -= 1
+
+
+class Stack(BlockList):
+    """
+    一个独立排序的窗口栈：自己的块链表和序号（每个栈的 rank 都从 1 开始）。
+    ranks_dirty: 序号需要按块的位置重算
+    changed: 顺序或成员变化后还没有重排过，下一次增量重排会顺带处理它
+    """
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.ranks_dirty = False
+        self.changed = False
@@ -0,0 +1,133 @@
+# window_health.py
+import threading
+import time
+
+import win_api
+from logger import logger
+
+_health = None
+
+
+def get_health():
+    """全局窗口健康状态，重排线程、图标线程池共用"""
+    global _health
+    if _health is None:
+        _health = WindowHealth()
+    return _health
+
+
+class WindowHealth:
+    """
+    无响应窗口熔断器：会进入其他进程的调用（SetWindowPos、WM_GETICON）之前先问 allow(hwnd)。
+
+    - 用 IsHungAppWindow 探测（只读系统状态，不会被目标窗口卡住）
+    - 调用超时或耗时超过 SLOW_CALL 秒的窗口同样判为异常
+    - 异常窗口进入隔离期，期间直接跳过；期满后重新探测，仍异常则隔离期翻倍（最长 MAX_BACKOFF 秒）
+
+    saved_seconds 估算被跳过的调用本来会卡住的时间：按触发隔离时的实测耗时计，
+    只由 IsHungAppWindow 发现的窗口按系统判定挂起的阈值 HUNG_COST 秒计。
+    """
+
+    BASE_BACKOFF = 2.0
+    MAX_BACKOFF = 60.0
+    SLOW_CALL = 0.25
+    HUNG_COST = 5.0
+
+    def __init__(self, api=win_api, clock=time.monotonic):
+        self._api = api
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._quarantine = {}  # hwnd -> [解除时间, 隔离时长, 单次调用代价]
+
+        # 计数器
+        self.probes = 0
+        self.skipped = 0
+        self.quarantines = 0
+        self.releases = 0
+        self.saved_seconds = 0.0
+
+    # === 调用前检查 === #
+    def allow(self, hwnd):
+        """是否可以对这个窗口发起调用；隔离中的窗口直接返回 False"""
+        with self._lock:
+            entry = self._quarantine.get(hwnd)
+            if entry is not None and self._clock() < entry[0]:
+                self.skipped += 1
+                self.saved_seconds += entry[2]
+                return False
+
+        if self.check(hwnd):
+            return True
+
+        with self._lock:
+            entry = self._quarantine.get(hwnd)
+            self.skipped += 1
+            self.saved_seconds += entry[2] if entry else 0.0
+        return False
+
+    def check(self, hwnd):
+        """立即探测一次：挂起则隔离（或延长隔离），恢复则解除隔离。返回是否健康"""
+        try:
+            hung = self._api.is_window_hung(hwnd)
+        except Exception:
+            hung = False
+
+        with self._lock:
+            self.probes += 1
+            if hung:
+                self._trip(hwnd, self.HUNG_COST, "无响应")
+                return False
+            if self._quarantine.pop(hwnd, None) is not None:
+                self.releases += 1
+                logger.info("[熔断] 窗口恢复响应，解除隔离 (HWND: %s)", hwnd)
+            return True
+
+    # === 调用后反馈 === #
+    def record(self, hwnd, elapsed):
+        """记录一次调用的耗时，过慢的窗口进入隔离"""
+        if elapsed > self.SLOW_CALL:
+            with self._lock:
+                self._trip(hwnd, elapsed, f"响应缓慢 ({elapsed * 1000:.0f} ms)")
+
+    def report_timeout(self, hwnd, elapsed):
+        """带超时的窗口消息失败"""
+        with self._lock:
+            self._trip(hwnd, elapsed, "消息超时")
+
+    # === 查询 === #
+    def is_quarantined(self, hwnd):
+        """是否处于隔离中（隔离期满但尚未重新探测的也算）"""
+        return hwnd in self._quarantine
+
+    def blocked(self, hwnd):
+        """是否仍在隔离期内；期满的窗口返回 False，下一次 allow() 会重新探测"""
+        entry = self._quarantine.get(hwnd)
+        return entry is not None and self._clock() < entry[0]
+
+    def forget(self, hwnd):
+        """窗口已关闭"""
+        with self._lock:
+            self._quarantine.pop(hwnd, None)
+
+    def stats(self):
+        """熔断统计：探测次数、跳过的调用数、隔离 / 解除次数、当前隔离数、估算节省的秒数"""
+        return {
+            "probes": self.probes,
+            "skipped": self.skipped,
+            "quarantines": self.quarantines,
+            "releases": self.releases,
+            "quarantined": len(self._quarantine),
+            "saved_seconds": self.saved_seconds,
+        }
+
+    # === 内部（持锁调用） === #
+    def _trip(self, hwnd, cost, reason):
+        entry = self._quarantine.get(hwnd)
+        if entry is None:
+            backoff = self.BASE_BACKOFF
+            self.quarantines += 1
+            logger.warning("[熔断] 窗口%s，隔离 %.0f 秒 (HWND: %s)", reason, backoff, hwnd)
+        else:
+            backoff = min(entry[1] * 2, self.MAX_BACKOFF)
+            cost = max(cost, entry[2])
+        self._quarantine[hwnd] = [self._clock() + backoff, backoff, cost]
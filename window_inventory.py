@@ -0,0 +1,181 @@
+# window_inventory.py
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, Signal
+
+import win_api
+import win_backend
+from logger import logger
+from window_snapshot import WindowSnapshot, REAL_FIELDS, hwnd_array
+
+# 关注的 WinEvent 区间：创建/销毁/显示/隐藏、标题变化、DWM 遮蔽/取消遮蔽
+_HOOK_RANGES = (
+    (win_backend.EVENT_OBJECT_CREATE, win_backend.EVENT_OBJECT_HIDE),
+    (win_backend.EVENT_OBJECT_NAMECHANGE, win_backend.EVENT_OBJECT_NAMECHANGE),
+    (win_backend.EVENT_OBJECT_CLOAKED, win_backend.EVENT_OBJECT_UNCLOAKED),
+)
+
+
+class WindowInventory(QObject):
+    """
+    窗口清单服务：由 WinEvent 钩子增量维护当前所有真实窗口，
+    代替每秒一次的全量枚举；定时全量同步只作为兜底。
+
+    维护的集合与 get_all_windows(filter=False) 相同，并记录每个窗口是否为工具窗口：
+    - 源列表（filter=True）只包含非工具窗口，变化通过 window_added / window_removed 通知
+    - 所有新出现的窗口（包括工具窗口）都会记入待扫描集合，供子窗口扫描取用
+    """
+
+    # 源列表变化 (filter=True 的窗口)
+    window_added = Signal(int, str)
+    window_removed = Signal(int)
+    window_title_changed = Signal(int, str)
+    # 新出现的工具窗口（不进源列表，配置重新挂载用）
+    tool_window_added = Signal(int, str)
+    # 任意窗口被销毁（受管窗口清理用）
+    window_destroyed = Signal(int)
+
+    # 有钩子时的兜底全量同步间隔；钩子安装失败时退回原来的 1 秒轮询
+    RESYNC_INTERVAL_MS = 30000
+    POLL_INTERVAL_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._windows = {}      # hwnd -> (title, is_tool)
+        self._new_hwnds = {}    # 尚未被子窗口扫描取走的新窗口 hwnd -> title
+        self._ignored = set()
+        self._hooks = []
+        self._snapshot = WindowSnapshot()
+
+        self.resync_timer = QTimer(self)
+        self.resync_timer.timeout.connect(self.resync)
+
+    # === 启动 / 停止 === #
+    def start(self):
+        """安装事件钩子并做一次全量同步。返回是否成功安装了钩子。"""
+        backend = win_api.get_backend()
+        for event_min, event_max in _HOOK_RANGES:
+            handle = backend.add_win_event_hook(event_min, event_max, self.handle_event)
+            if handle is not None:
+                self._hooks.append(handle)
+
+        hooked = len(self._hooks) == len(_HOOK_RANGES)
+        if not hooked:
+            logger.warning("[窗口清单] 事件钩子安装失败，退回定时轮询")
+
+        self.resync()
+        self.resync_timer.setInterval(self.RESYNC_INTERVAL_MS if hooked else self.POLL_INTERVAL_MS)
+        self.resync_timer.start()
+        return hooked
+
+    def stop(self):
+        self.resync_timer.stop()
+        backend = win_api.get_backend()
+        for handle in self._hooks:
+            backend.remove_win_event_hook(handle)
+        self._hooks = []
+
+    def ignore(self, hwnd):
+        """不再跟踪某个窗口（例如本程序自己的主窗口）"""
+        self._ignored.add(hwnd)
+        self._drop(hwnd)
+
+    # === 查询 === #
+    def source_windows(self):
+        """源列表中的窗口 [(hwnd, title)]"""
+        return [(hwnd, title) for hwnd, (title, is_tool) in self._windows.items() if not is_tool]
+
+    def take_new_windows(self):
+        """取走自上次调用以来新出现的窗口 [(hwnd, title)]（包括工具窗口）"""
+        new_windows = [(hwnd, title) for hwnd, title in self._new_hwnds.items() if hwnd in self._windows]
+        self._new_hwnds = {}
+        return new_windows
+
+    def __contains__(self, hwnd):
+        return hwnd in self._windows
+
+    # === 事件处理 === #
+    def handle_event(self, event, hwnd, id_object=win_backend.OBJID_WINDOW, id_child=win_backend.CHILDID_SELF):
+        """
+        处理一个 WinEvent。钩子回调直接调用它，调试时也可以注入合成事件流。
+        """
+        if not hwnd or id_object != win_backend.OBJID_WINDOW or id_child != win_backend.CHILDID_SELF:
+            return
+        if hwnd in self._ignored:
+            return
+
+        if event == win_backend.EVENT_OBJECT_DESTROY:
+            self._drop(hwnd)
+            self.window_destroyed.emit(hwnd)
+            return
+
+        # 其余事件（创建、显示、隐藏、标题变化、遮蔽）统一重新检查这个窗口
+        try:
+            if not win_api.is_top_level(hwnd):
+                return
+            info = win_api.probe_window(hwnd)
+        except Exception:
+            # 窗口可能在检查过程中被关闭
+            info = None
+
+        if info is None:
+            self._drop(hwnd)
+        else:
+            self._put(hwnd, *info)
+
+    # === 全量同步 === #
+    def resync(self):
+        """全量枚举一次，与当前清单对比并发出差异通知（兜底 / 手动刷新）"""
+        self._snapshot.capture(fields=REAL_FIELDS)
+        current = self._snapshot.real_windows(filter=False)
+        current_hwnds = hwnd_array(hwnd for hwnd, _, _ in current)
+
+        if self._ignored:
+            keep = ~np.isin(current_hwnds, hwnd_array(self._ignored))
+            current = [window for window, k in zip(current, keep.tolist()) if k]
+            current_hwnds = current_hwnds[keep]
+
+        # 已消失的窗口
+        known = hwnd_array(self._windows)
+        for hwnd in np.setdiff1d(known, current_hwnds, assume_unique=True).tolist():
+            self._drop(hwnd)
+
+        # 新窗口和属性有变化的窗口（_put 内部会跳过没变的）
+        for hwnd, title, is_tool in current:
+            self._put(hwnd, title, is_tool)
+
+    # === 内部 === #
+    def _put(self, hwnd, title, is_tool):
+        old = self._windows.get(hwnd)
+        if old == (title, is_tool):
+            return
+
+        self._windows[hwnd] = (title, is_tool)
+
+        if old is None:
+            self._new_hwnds[hwnd] = title
+            if not is_tool:
+                logger.info("[列表同步] 发现新窗口: [%s] (HWND: %s)", title, hwnd)
+                self.window_added.emit(hwnd, title)
+            else:
+                self.tool_window_added.emit(hwnd, title)
+            return
+
+        old_title, old_is_tool = old
+        if old_is_tool != is_tool:
+            if is_tool:
+                self.window_removed.emit(hwnd)
+            else:
+                self.window_added.emit(hwnd, title)
+        elif not is_tool:
+            self.window_title_changed.emit(hwnd, title)
+
+    def _drop(self, hwnd):
+        old = self._windows.pop(hwnd, None)
+        if old is None:
+            return
+
+        title, is_tool = old
+        self._new_hwnds.pop(hwnd, None)
+        if not is_tool:
+            logger.info("[列表同步] 移除已关闭窗口: [%s] (HWND: %s)", title, hwnd)
+            self.window_removed.emit(hwnd)
@@ -0,0 +1,24 @@
+# window_records.py
+"""
+窗口记录：引擎和列表模型共用的纯数据类型，不依赖 Qt，可以在重排线程或无界面进程中使用。
+"""
+
+
+class WindowRecord:
+    """
+    一个窗口：hwnd、标题、rank（只有受管的主窗口有）、类型（STANDARD / TOOL），
+    以及工具窗口直接挂在其下的父节点的 hwnd (parent：主窗口或另一个工具窗口；主窗口为 0)。
+    嵌套的工具窗口的 parent 不是所在块的主窗口；父工具窗口被移除时改指向新的直接父节点。
+    用 __slots__ 存储，每条记录远小于原来带两个信号的 QObject。
+    """
+    __slots__ = ('hwnd', 'title', 'rank', 'window_type', 'parent')
+
+    def __init__(self, hwnd: int, title: str, rank: int = None, window_type: str = 'STANDARD', parent: int = 0):
+        self.hwnd = hwnd
+        self.title = title
+        self.rank = rank
+        self.window_type = window_type
+        self.parent = parent
+
+    def __repr__(self):
+        return f"WindowRecord(hwnd={self.hwnd}, title={self.title!r}, rank={self.rank}, type={self.window_type})"
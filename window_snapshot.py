@@ -0,0 +1,177 @@
+# window_snapshot.py
+"""
+列式窗口快照：一次枚举把顶层窗口的属性收集到 NumPy 结构化数组（每个属性一列），
+标题按需读取；新增 / 消失 / 失效窗口的差异用 np.setdiff1d / np.isin 计算。
+
+    snapshot = WindowSnapshot()
+    rows = snapshot.capture()                   # 全部顶层窗口
+    rows = snapshot.capture(hwnds, ('owner', 'pid'))  # 只采集给定窗口的部分列
+"""
+import numpy as np
+
+import win_backend
+
+WINDOW_DTYPE = np.dtype([
+    ('hwnd', np.int64),
+    ('pid', np.int64),
+    ('style', np.uint32),
+    ('ex_style', np.uint32),
+    ('owner', np.int64),
+    ('title_len', np.int32),
+    ('visible', np.bool_),
+    ('cloaked', np.bool_),
+    ('iconic', np.bool_),
+    ('valid', np.bool_),   # False 表示采集过程中窗口已关闭
+])
+
+ALL_FIELDS = ('visible', 'pid', 'style', 'ex_style', 'owner', 'title_len', 'cloaked', 'iconic')
+# real_mask / real_windows 需要的列
+REAL_FIELDS = ('visible', 'title_len', 'owner', 'cloaked', 'ex_style')
+
+# 筛选真实窗口时的采集顺序，以及能直接排除窗口的取值（bool(值) 等于它时排除）
+_GATE_ORDER = {'title_len': 0, 'owner': 1, 'cloaked': 2}
+_REJECT = {'title_len': False, 'owner': True, 'cloaked': True}
+
+# 这些标题的窗口不算真实窗口（桌面、本程序）
+EXCLUDED_TITLES = ("Program Manager", "窗口重排器")
+
+
+def hwnd_array(hwnds):
+    """hwnd 序列 -> int64 数组，用于 np.setdiff1d / np.isin"""
+    return np.fromiter(hwnds, dtype=np.int64)
+
+
+class WindowSnapshot:
+    """
+    backend: 窗口系统后端，默认在采集时取 win_api.get_backend()
+    capture 返回的 rows 是内部缓冲区的视图，下次 capture 后内容会被覆盖；缓冲区只增不减，跨调用复用。
+    """
+
+    def __init__(self, backend=None, capacity=512):
+        self._backend = backend
+        self._buffer = np.zeros(capacity, dtype=WINDOW_DTYPE)
+        self._titles = {}
+        self.rows = self._buffer[:0]
+
+    @property
+    def backend(self):
+        if self._backend is not None:
+            return self._backend
+        import win_api
+        return win_api.get_backend()
+
+    # === 采集 === #
+    def capture(self, hwnds=None, fields=ALL_FIELDS):
+        """
+        hwnds=None 时按 Z 序枚举全部顶层窗口。
+        fields 中包含 'visible' 时按 win_api.probe_window 的顺序逐项筛选：不可见、没有标题、有 Owner、
+        被遮蔽的窗口不会是真实窗口，一旦确定就不再采集它的其余列（保持默认值 0）；
+        这时 title_len 列通过读取标题得到，标题缓存下来供 real_windows / title 使用。
+        """
+        backend = self.backend
+        if hwnds is None:
+            hwnds = backend.enum_windows()
+
+        count = len(hwnds)
+        if count > len(self._buffer):
+            self._buffer = np.zeros(max(count, 2 * len(self._buffer)), dtype=WINDOW_DTYPE)
+        rows = self._buffer[:count]
+        rows[:] = 0
+        rows['hwnd'] = hwnds
+        self._titles = {}
+
+        gate = 'visible' in fields
+        names = [name for name in fields if name != 'visible']
+        if gate:
+            # 能排除窗口的列先采集
+            names.sort(key=lambda name: _GATE_ORDER.get(name, len(_GATE_ORDER)))
+        getters = self._getters(backend, names)
+        if gate and 'title_len' in names:
+            # 筛选真实窗口时直接读标题代替 GetWindowTextLength：真实窗口总要读标题，省一次调用
+            titles = self._titles
+            get_window_text = backend.get_window_text
+
+            def read_title(hwnd):
+                title = titles[hwnd] = get_window_text(hwnd)
+                return len(title)
+
+            getters = [(name, read_title if name == 'title_len' else getter) for name, getter in getters]
+        columns = [(getter, [0] * count, _REJECT.get(name) if gate else None) for name, getter in getters]
+        is_visible = backend.is_window_visible
+        visible = [False] * count
+        valid = [True] * count
+
+        for i, hwnd in enumerate(hwnds):
+            try:
+                if gate:
+                    if not is_visible(hwnd):
+                        continue
+                    visible[i] = True
+                for getter, values, reject in columns:
+                    value = values[i] = getter(hwnd)
+                    if reject is not None and bool(value) is reject:
+                        break
+            except Exception:
+                # 窗口可能在采集过程中被关闭
+                valid[i] = False
+
+        for name, (_, values, _) in zip(names, columns):
+            rows[name] = values
+        rows['visible'] = visible
+        rows['valid'] = valid
+
+        self.rows = rows
+        return rows
+
+    @staticmethod
+    def _getters(backend, fields):
+        get_window_long = backend.get_window_long
+        table = {
+            'pid': backend.get_window_pid,
+            'style': lambda hwnd: get_window_long(hwnd, win_backend.GWL_STYLE) & 0xFFFFFFFF,
+            'ex_style': lambda hwnd: get_window_long(hwnd, win_backend.GWL_EXSTYLE) & 0xFFFFFFFF,
+            'owner': backend.get_owner,
+            'title_len': backend.get_window_text_length,
+            'cloaked': backend.is_cloaked,
+            'iconic': backend.is_iconic,
+        }
+        return [(name, table[name]) for name in fields]
+
+    # === 查询 === #
+    @property
+    def hwnds(self):
+        return self.rows['hwnd']
+
+    def title(self, hwnd):
+        """按需读取标题，同一次快照内缓存"""
+        title = self._titles.get(hwnd)
+        if title is None:
+            try:
+                title = self.backend.get_window_text(hwnd)
+            except Exception:
+                title = ""
+            self._titles[hwnd] = title
+        return title
+
+    def real_mask(self, filter=True):
+        """与 win_api.is_real_window 相同的规则（标题排除项除外），capture 时需采集 REAL_FIELDS"""
+        rows = self.rows
+        mask = rows['valid'] & rows['visible'] & (rows['title_len'] > 0) & (rows['owner'] == 0) & ~rows['cloaked']
+        if filter:
+            mask &= (rows['ex_style'] & win_backend.WS_EX_TOOLWINDOW) == 0
+        return mask
+
+    def real_windows(self, filter=True):
+        """真实窗口 [(hwnd, title, is_tool)]，按 Z 序；标题用 capture 时读到的"""
+        rows = self.rows[self.real_mask(filter)]
+        is_tool = (rows['ex_style'] & win_backend.WS_EX_TOOLWINDOW) != 0
+
+        titles = self._titles
+        windows = []
+        for hwnd, tool in zip(rows['hwnd'].tolist(), is_tool.tolist()):
+            title = titles.get(hwnd)
+            if title is None:
+                title = self.title(hwnd)
+            if title not in EXCLUDED_TITLES:
+                windows.append((hwnd, title, tool))
+        return windows